@@ -0,0 +1,156 @@
+# file: benchmarks/bench_parse.py
+"""
+Offline microbenchmarks for WTODecisionsSpider's search-page hot path.
+
+Runs parse(), _extract_displaying_range() and _extract_total_count() over
+every page in benchmarks/fixtures/search and reports hits/sec, time per
+page and allocation figures per page. No network, no browser, no DB.
+
+    python -m benchmarks.bench_parse                      # print results
+    python -m benchmarks.bench_parse --save-baseline      # record baseline
+    python -m benchmarks.bench_parse --check              # exit 1 on regression
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from statistics import median
+
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+from wto.spiders.wto_docs import WTODecisionsSpider
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "search"
+BASELINE_FILE = Path(__file__).parent / "baseline_parse.json"
+SEARCH_URL = "https://docs.wto.org/dol2fe/Pages/FE_Search/FE_S_S006.aspx"
+
+
+def load_pages(directory: Path):
+    pages = {}
+    for path in sorted(directory.glob("*.html")):
+        request = Request(SEARCH_URL, meta={"page_number": 2})
+        pages[path.stem] = HtmlResponse(
+            url=SEARCH_URL, body=path.read_bytes(), encoding="utf-8", request=request
+        )
+    return pages
+
+
+def fresh_response(response):
+    # Selector caches on the response; benchmark cold pages like the crawler sees them
+    return response.replace(body=response.body)
+
+
+def make_spider():
+    crawler = get_crawler(WTODecisionsSpider, {"LOG_LEVEL": "WARNING"})
+    crawler.spider = spider = WTODecisionsSpider.from_crawler(crawler)
+    # The stats collector is opened by the engine in a real crawl
+    crawler.stats.open_spider(spider)
+    return spider
+
+
+def _time_per_call(fn, response, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        r = fresh_response(response)
+        t0 = time.perf_counter()
+        fn(r)
+        samples.append(time.perf_counter() - t0)
+    return median(samples)
+
+
+def _allocations(fn, response):
+    r = fresh_response(response)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    fn(r)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(s.count_diff for s in after.compare_to(before, "lineno") if s.count_diff > 0)
+    return peak, blocks
+
+
+def run(pages, repeat: int):
+    spider = make_spider()
+    spider._pagination = "sequential"
+
+    def parse(r):
+        # reset loop-guard state so every sample runs the full page
+        spider._last_page_sig = None
+        spider._repeat_guard = 0
+        spider._consecutive_no_items = 0
+        return list(spider.parse(r))
+
+    results = {}
+    for name, response in pages.items():
+        hits = len(response.xpath("//div[contains(@class,'hitContainer')]"))
+        parse_s = _time_per_call(parse, response, repeat)
+        peak, blocks = _allocations(parse, response)
+        results[name] = {
+            "hits": hits,
+            "parse_ms": round(parse_s * 1000, 3),
+            "hits_per_sec": round(hits / parse_s, 1) if hits else None,
+            "displaying_range_us": round(_time_per_call(spider._extract_displaying_range, response, repeat) * 1e6, 1),
+            "total_count_us": round(_time_per_call(spider._extract_total_count, response, repeat) * 1e6, 1),
+            "alloc_peak_kib": round(peak / 1024, 1),
+            "alloc_blocks": blocks,
+        }
+    return results
+
+
+def check(results, baseline, tolerance: float):
+    """Timing/allocation metrics that grew more than ``tolerance`` over the baseline."""
+    failures = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key in ("parse_ms", "displaying_range_us", "total_count_us", "alloc_peak_kib"):
+            old, new = base.get(key), metrics.get(key)
+            if old and new and new > old * (1 + tolerance):
+                failures.append(f"{name}.{key}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline parse() microbenchmarks")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit 1 if slower than the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    pages = load_pages(args.fixtures)
+    if not pages:
+        parser.error(f"no *.html fixtures in {args.fixtures}")
+
+    results = run(pages, args.repeat)
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"baseline saved to {args.baseline}")
+    elif args.check:
+        if not args.baseline.exists():
+            parser.error(f"no baseline at {args.baseline}; run with --save-baseline first")
+        failures = check(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
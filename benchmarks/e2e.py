@@ -0,0 +1,118 @@
+# file: benchmarks/e2e.py
+"""
+End-to-end throughput harness: runs the wto_docs spider against the fake
+WTO server (benchmarks/fakewto.py) and reports pages/sec, documents/sec,
+MB/sec and DB batch-write latency percentiles.
+
+The pipeline writes to the Postgres configured by the usual PG* variables
+(point them at a scratch database); pass --no-db to measure crawling only.
+Run from the repository root so the project settings (scrapy.cfg) load.
+
+    python -m benchmarks.e2e --total 1000 --pdf-size 500000 --pagination fanout
+    python -m benchmarks.e2e --no-db --render -s WTO_REUSE_SEARCH_PAGE=1
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from typing import List
+
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+
+from benchmarks.fakewto import FakeWtoServer, add_config_arguments, config_from_args
+from wto import signals as wto_signals
+from wto.spiders.wto_docs import WTODecisionsSpider
+
+
+class BatchLatencyRecorder:
+    def __init__(self):
+        self.seconds: List[float] = []
+        self.failed = 0
+
+    def db_batch_written(self, items, nbytes, seconds, ok):
+        self.seconds.append(seconds)
+        self.failed += 0 if ok else 1
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def parse_setting(value: str):
+    key, sep, raw = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError("expected KEY=VALUE")
+    try:
+        return key, json.loads(raw)
+    except ValueError:
+        return key, raw
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="wto_docs end-to-end benchmark against a fake WTO server")
+    add_config_arguments(parser)
+    parser.add_argument("--pagination", choices=("sequential", "fanout", "sharded"), default="sequential")
+    parser.add_argument("--render", action="store_true", help="render search pages in Chromium")
+    parser.add_argument("--no-db", action="store_true", help="disable item pipelines")
+    parser.add_argument("-s", dest="settings", action="append", type=parse_setting, default=[],
+                        metavar="KEY=VALUE", help="extra Scrapy setting (JSON values allowed)")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+
+    server = FakeWtoServer(("127.0.0.1", 0), config_from_args(args))
+    server.start_in_thread()
+
+    settings = get_project_settings()
+    settings.setdict({
+        "WTO_START_URL": server.search_url,
+        "WTO_RENDER_SEARCH_PAGES": args.render,
+        "WTO_REFRESH_MODE": "full",  # measure transfer, not the skip index
+        "DOWNLOAD_DELAY": 0,
+        "DOWNLOAD_SLOTS": {"wto-files": {"concurrency": 6, "delay": 0}},
+        "LOG_LEVEL": args.log_level,
+        "TELNETCONSOLE_ENABLED": False,
+    }, priority="cmdline")
+    if args.no_db:
+        settings.set("ITEM_PIPELINES", {}, priority="cmdline")
+    for key, value in args.settings:
+        settings.set(key, value, priority="cmdline")
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(WTODecisionsSpider)
+    recorder = BatchLatencyRecorder()
+    crawler.signals.connect(recorder.db_batch_written, signal=wto_signals.db_batch_written)
+    process.crawl(crawler, pagination=args.pagination)
+    process.start()
+    server.shutdown()
+
+    stats = crawler.stats.get_stats()
+    elapsed = stats.get("elapsed_time_seconds") or 1e-9
+    docs = stats.get("db/saved_items", 0) if not args.no_db else stats.get("item_scraped_count", 0)
+    report = {
+        "elapsed_s": round(elapsed, 2),
+        "pages": stats.get("wto/search_pages", 0),
+        "pages_per_sec": round(stats.get("wto/search_pages", 0) / elapsed, 2),
+        "documents": docs,
+        "documents_per_sec": round(docs / elapsed, 2),
+        "mb_per_sec": round(server.stats["file_bytes"] / elapsed / 1e6, 2),
+        "db_batches": len(recorder.seconds),
+        "db_failed_batches": recorder.failed,
+        "db_write_ms": {
+            f"p{q}": round(percentile(recorder.seconds, q) * 1000, 1) for q in (50, 90, 99, 100)
+        },
+        "server": server.stats,
+        "finish_reason": stats.get("finish_reason"),
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if stats.get("finish_reason") == "finished" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+# file: benchmarks/fakewto.py
+"""
+Local stand-in for the docs.wto.org FE_S_S006 search endpoint.
+
+- GET  /dol2fe/Pages/FE_Search/FE_S_S006.aspx   -> results page 1
+- POST same path with __EVENTTARGET=lnkNext     -> page after the one in __VIEWSTATE
+- POST same path with the pager target, Page$N  -> page N
+- GET  /dol2fe/Pages/SS/directdoc.aspx?filename=... -> synthetic PDF (ETag,
+  Last-Modified, 304 on a matching If-None-Match)
+
+The current page travels in __VIEWSTATE like a real ASP.NET postback, so
+the spider's FormRequest.from_response() flow works unchanged.
+
+    python -m benchmarks.fakewto --port 8070 --total 500 --pdf-size 2000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.markup import NEXT_TARGET, PAGER_TARGET, results_page
+
+SEARCH_PATH = "/dol2fe/Pages/FE_Search/FE_S_S006.aspx"
+FILE_PATH = "/dol2fe/Pages/SS/directdoc.aspx"
+# Padding keeps the view state close to the real page's size
+VIEWSTATE_PADDING = 6000
+
+
+class FakeWtoConfig:
+    def __init__(self, total=200, page_size=20, page_latency=0.0, pdf_size=200_000, pdf_latency=0.0):
+        self.total = total
+        self.page_size = page_size
+        self.page_latency = page_latency
+        self.pdf_size = pdf_size
+        self.pdf_latency = pdf_latency
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.total // self.page_size))
+
+
+def encode_viewstate(page: int) -> str:
+    return base64.b64encode(f"page={page}|".encode() + b"\0" * VIEWSTATE_PADDING).decode("ascii")
+
+
+def decode_viewstate(value: str) -> int:
+    try:
+        head = base64.b64decode(value)[:32].split(b"|", 1)[0]
+        return int(head.split(b"=", 1)[1])
+    except Exception:
+        return 1
+
+
+def synthetic_pdf(name: str, size: int) -> bytes:
+    """Deterministic PDF-looking bytes of ``size`` for file ``name``."""
+    rng = random.Random(name)
+    header = f"%PDF-1.4\n% {name}\n".encode()
+    body_len = max(0, size - len(header) - 6)
+    return header + rng.randbytes(body_len) + b"\n%%EOF"
+
+
+class FakeWtoHandler(BaseHTTPRequestHandler):
+    server_version = "FakeWTO/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def config(self) -> FakeWtoConfig:
+        return self.server.config
+
+    def log_message(self, format, *args):  # quiet by default
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == SEARCH_PATH:
+            return self._search_page(1)
+        if url.path == FILE_PATH:
+            return self._file(parse_qs(url.query).get("filename", ["doc.pdf"])[0])
+        self._send(404, b"not found", "text/plain")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != SEARCH_PATH:
+            return self._send(404, b"not found", "text/plain")
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True)
+        current = decode_viewstate(form.get("__VIEWSTATE", [""])[0])
+        target = form.get("__EVENTTARGET", [""])[0]
+        argument = form.get("__EVENTARGUMENT", [""])[0]
+        if target == NEXT_TARGET:
+            page = current + 1
+        elif target == PAGER_TARGET and argument.startswith("Page$"):
+            page = int(argument[5:])
+        else:
+            page = current
+        self._search_page(min(max(1, page), self.config.pages))
+
+    def _search_page(self, page: int):
+        if self.config.page_latency:
+            time.sleep(self.config.page_latency)
+        host = self.headers.get("Host") or "%s:%d" % self.server.server_address[:2]
+        body = results_page(
+            page,
+            self.config.total,
+            page_size=self.config.page_size,
+            base_url=f"http://{host}",
+            viewstate=encode_viewstate(page),
+            action=SEARCH_PATH,
+        ).encode("utf-8")
+        self.server.stats["pages"] += 1
+        self._send(200, body, "text/html; charset=utf-8")
+
+    def _file(self, name: str):
+        etag = '"%s"' % hashlib.sha1(f"{name}:{self.config.pdf_size}".encode()).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.server.stats["not_modified"] += 1
+            return self._send(304, b"", None, {"ETag": etag})
+        if self.config.pdf_latency:
+            time.sleep(self.config.pdf_latency)
+        body = synthetic_pdf(name, self.config.pdf_size)
+        self.server.stats["files"] += 1
+        self.server.stats["file_bytes"] += len(body)
+        self._send(200, body, "application/pdf", {
+            "ETag": etag,
+            "Last-Modified": formatdate(946684800, usegmt=True),
+        })
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+class FakeWtoServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config: FakeWtoConfig):
+        super().__init__(address, FakeWtoHandler)
+        self.config = config
+        self.stats = {"pages": 0, "files": 0, "file_bytes": 0, "not_modified": 0}
+
+    @property
+    def search_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{SEARCH_PATH}?MetaCollection=WTO&Language=ENGLISH"
+
+    def start_in_thread(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name="fakewto", daemon=True)
+        thread.start()
+        return thread
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--total", type=int, default=200, help="number of search hits")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--page-latency", type=float, default=0.0, help="seconds per search page")
+    parser.add_argument("--pdf-size", type=int, default=200_000, help="bytes per file")
+    parser.add_argument("--pdf-latency", type=float, default=0.0, help="seconds per file")
+
+
+def config_from_args(args) -> FakeWtoConfig:
+    return FakeWtoConfig(
+        total=args.total,
+        page_size=args.page_size,
+        page_latency=args.page_latency,
+        pdf_size=args.pdf_size,
+        pdf_latency=args.pdf_latency,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake docs.wto.org search server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8070)
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+    server = FakeWtoServer((args.host, args.port), config_from_args(args))
+    print(f"Serving {server.search_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# file: benchmarks/make_fixtures.py
+"""
+Regenerates the offline search-page corpus in benchmarks/fixtures/search.
+
+    python -m benchmarks.make_fixtures
+
+Pages saved from the live site (browser "Save page as", HTML only) can be
+dropped into the same directory; bench_parse picks up every *.html file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+from pathlib import Path
+
+from benchmarks.markup import results_page
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "search"
+BASE_URL = "https://docs.wto.org"
+TOTAL = 1234
+PAGE_SIZE = 20
+
+# name -> (page, total)
+PAGES = {
+    "page_first": (1, TOTAL),
+    "page_middle": (31, TOTAL),
+    "page_last": (-(-TOTAL // PAGE_SIZE), TOTAL),
+    "page_empty": (1, 0),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", type=Path, default=FIXTURES_DIR)
+    args = parser.parse_args(argv)
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    for name, (page, total) in PAGES.items():
+        # Realistic-sized opaque view state (the real one is several KB)
+        viewstate = base64.b64encode(bytes(range(256)) * 24).decode("ascii")
+        body = results_page(page, total, page_size=PAGE_SIZE, base_url=BASE_URL, viewstate=viewstate)
+        (args.out / f"{name}.html").write_text(body, encoding="utf-8")
+        print(f"wrote {args.out / name}.html")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# file: benchmarks/markup.py
+"""
+Renders FE_S_S006-style search result pages.
+
+The markup mirrors what WTODecisionsSpider's XPaths target on docs.wto.org:
+hitContainer blocks (title, symbol, detail line with a dd/mm/yyyy date,
+English file link), the lblInfo "Displaying X-Y of Z" label, the lnkNext
+postback link, numbered pager links and the ASP.NET hidden form fields.
+Used for the offline fixture corpus and by the fake WTO server.
+"""
+
+from __future__ import annotations
+
+import html
+import random
+from datetime import date, timedelta
+from typing import Optional
+
+NEXT_TARGET = "ctl00$MainPlaceHolder$lnkNext"
+PAGER_TARGET = "ctl00$MainPlaceHolder$dtlPager"
+
+SERIES = ["WT/L", "WT/MIN(22)", "G/C", "WT/GC/M", "IP/C", "S/L", "G/SPS/N", "WT/DSB/M"]
+TITLES = [
+    "Decision on the Extension of the Transition Period",
+    "Protocol Amending the Marrakesh Agreement",
+    "Accession of the Republic of {n} - Decision of {y}",
+    "Waiver Concerning Preferential Treatment for Least-Developed Countries",
+    "Understanding on Rules and Procedures Governing the Settlement of Disputes",
+    "Ministerial Declaration on the TRIPS Agreement and Public Health",
+]
+
+
+def hit(index: int, base_url: str = "", rng: Optional[random.Random] = None) -> dict:
+    """Deterministic metadata for the index-th hit (1-based) of the collection."""
+    rng = rng or random.Random(index)
+    series = SERIES[index % len(SERIES)]
+    day = date(1995, 1, 1) + timedelta(days=rng.randrange(0, 30 * 365))
+    return {
+        "title": TITLES[index % len(TITLES)].format(n=index, y=day.year),
+        "symbol": f"{series}/{index}",
+        "date": day.strftime("%d/%m/%Y"),
+        "url": f"{base_url}/dol2fe/Pages/SS/directdoc.aspx?filename=q:/{series.replace('/', '')}/{index}.pdf&Open=True",
+    }
+
+
+def _hit_html(h: dict) -> str:
+    e = html.escape
+    return f"""
+      <div class="hitContainer">
+        <div class="hitSymbol">{e(h['symbol'])}</div>
+        <div class="hitTitle"><span title="Document title">{e(h['title'])}</span></div>
+        <div class="hitDetail"><span>Document date: </span><span>{e(h['date'])}</span>
+          <span> | Restriction: Unrestricted</span></div>
+        <div class="hitFileLinks">
+          <div class="hitEnFileLink"><a class="FEFileNameLinkResultsCss" href="{e(h['url'])}">{e(h['symbol'])}.pdf</a></div>
+          <div class="hitFrFileLink"><a class="FEFileNameLinkResultsCss" href="{e(h['url'])}&amp;lang=F">F</a></div>
+        </div>
+      </div>"""
+
+
+def results_page(
+    page: int,
+    total: int,
+    page_size: int = 20,
+    base_url: str = "",
+    viewstate: str = "",
+    action: str = "FE_S_S006.aspx",
+    pager_window: int = 10,
+) -> str:
+    """Full HTML for result page ``page`` (1-based) of a ``total``-hit search."""
+    start = (page - 1) * page_size + 1
+    end = min(page * page_size, total)
+    hits = "".join(_hit_html(hit(i, base_url)) for i in range(start, end + 1)) if start <= total else ""
+    label = f"Displaying {start}-{end} of {total}" if total and start <= total else "No documents found"
+
+    pages = max(1, -(-total // page_size))
+    if end < total:
+        next_link = (
+            f"<a id=\"ctl00_MainPlaceHolder_lnkNext\" "
+            f"href=\"javascript:__doPostBack('{NEXT_TARGET}','')\">Next &gt;</a>"
+        )
+    else:
+        next_link = '<a id="ctl00_MainPlaceHolder_lnkNext" disabled="disabled">Next &gt;</a>'
+    first = max(1, page - pager_window // 2)
+    pager = "".join(
+        f"<a href=\"javascript:__doPostBack('{PAGER_TARGET}','Page${n}')\">{n}</a> "
+        if n != page
+        else f"<span>{n}</span> "
+        for n in range(first, min(pages, first + pager_window - 1) + 1)
+    )
+
+    return f"""<!DOCTYPE html>
+<html><head><title>Documents Online - Search results</title>
+<link rel="stylesheet" href="/dol2fe/Styles/site.css"/></head>
+<body>
+<form method="post" action="{html.escape(action)}" id="aspnetForm">
+  <input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value=""/>
+  <input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value=""/>
+  <input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{html.escape(viewstate)}"/>
+  <input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="0A1B2C3D"/>
+  <div id="resultsHeader">
+    <span id="ctl00_MainPlaceHolder_lblInfo">{label}</span>
+  </div>
+  <div id="results">{hits}
+  </div>
+  <div class="pager">{pager}{next_link}</div>
+</form>
+</body></html>
+"""
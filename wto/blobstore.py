@@ -0,0 +1,210 @@
+# file: wto/blobstore.py
+"""
+Content-addressed filesystem tier for document files (WTO_BLOB_STORE_DIR).
+
+With it configured, WtoPipeline writes each file here instead of into
+scraper_blob_store.source_file, which then keeps only the SHA-256, size and
+content type. Files live at
+
+    <root>/<sha256[:2]>/<sha256[2:4]>/<sha256>
+
+and are never modified: a file is written to a temp name in its shard and
+renamed into place, so readers only ever see complete files, and identical
+documents under different URLs are stored once. Spool files are hard-linked
+in when they sit on the same filesystem (no copy at all).
+
+Reads go through memory maps: MappedBlob.view is a memoryview over the page
+cache, so serving or hashing a file doesn't copy it into Python bytes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from typing import Iterator, Optional, Tuple
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+CHUNK_SIZE = 1024 * 1024
+
+
+def _read_umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# Every stored file gets this mode, whichever way it was written: linked spool
+# files are 0600 (mkstemp), and readers may run as another user
+FILE_MODE = 0o644 & ~_read_umask()
+
+
+class MappedBlob:
+    """Read-only memory map of one stored file; use as a context manager.
+
+    ``view`` (and slices of it) must be released before close(): mmap refuses
+    to unmap while a memoryview still points into it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = open(path, "rb")
+        size = os.fstat(self._fh.fileno()).st_size
+        # an empty file cannot be mapped
+        self._mmap = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.view = memoryview(self._mmap) if self._mmap is not None else memoryview(b"")
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+        if self._mmap is not None and hasattr(mmap, "MADV_SEQUENTIAL"):
+            self._mmap.madvise(mmap.MADV_SEQUENTIAL)
+        for start in range(0, len(self.view), chunk_size):
+            yield self.view[start:start + chunk_size]
+
+    def close(self) -> None:
+        self.view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+        self._fh.close()
+
+    def __enter__(self) -> "MappedBlob":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class FilesystemBlobStore:
+    """Write-once files keyed by SHA-256 under ``root``."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, sha256: str) -> str:
+        if not _SHA256.match(sha256 or ""):
+            raise ValueError(f"not a SHA-256 hex digest: {sha256!r}")
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def size(self, sha256: str) -> int:
+        return os.path.getsize(self.path(sha256))
+
+    def put(self, data, sha256: Optional[str] = None) -> Tuple[str, int, bool]:
+        """Store bytes-like ``data``; returns (sha256, size, created)."""
+        sha256 = sha256 or hashlib.sha256(data).hexdigest()
+        path = self.path(sha256)
+        if os.path.exists(path):
+            return sha256, len(data), False
+        write_bytes_durably(path, data)
+        return sha256, len(data), True
+
+    def put_file(self, source: str, sha256: Optional[str] = None) -> Tuple[str, int, bool]:
+        """Store the file at ``source`` (left in place); returns (sha256, size, created)."""
+        sha256 = sha256 or hash_file(source)
+        path = self.path(sha256)
+        size = os.path.getsize(source)
+        if os.path.exists(path):
+            return sha256, size, False
+        copy_file_durably(source, path)
+        return sha256, size, True
+
+    def open(self, sha256: str) -> MappedBlob:
+        """Memory-mapped, zero-copy access to a stored file (FileNotFoundError when missing)."""
+        return MappedBlob(self.path(sha256))
+
+    def read(self, sha256: str) -> bytes:
+        with self.open(sha256) as blob:
+            return bytes(blob.view)
+
+    def iter_chunks(self, sha256: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """The file in ``chunk_size`` pieces (copies; see MappedBlob.iter_chunks for views)."""
+        with self.open(sha256) as blob:
+            for chunk in blob.iter_chunks(chunk_size):
+                with chunk:
+                    yield bytes(chunk)
+
+    def remove(self, sha256: str) -> bool:
+        try:
+            os.remove(self.path(sha256))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+def write_bytes_durably(path: str, data) -> None:
+    """Atomically create ``path`` holding ``data``, fsynced along with its directory."""
+    tmp = _temp_name(path)
+    try:
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        _publish(tmp, path)
+    except BaseException:
+        _unlink(tmp)
+        raise
+
+
+def copy_file_durably(source: str, path: str) -> None:
+    """write_bytes_durably() for the file at ``source``: hard-linked when possible, else copied in chunks."""
+    tmp = _temp_name(path)
+    try:
+        try:
+            os.link(source, tmp)  # same filesystem: no copy, the spool file's inode lives on here
+            linked = True
+        except OSError:
+            linked = False
+        if linked:
+            with open(tmp, "rb") as fh:
+                os.fsync(fh.fileno())
+        else:
+            with open(source, "rb") as src, open(tmp, "wb") as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                dst.flush()
+                os.fsync(dst.fileno())
+        _publish(tmp, path)
+    except BaseException:
+        _unlink(tmp)
+        raise
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _temp_name(path: str) -> str:
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".part")
+    os.close(fd)
+    os.unlink(tmp)  # only the unique name is needed (os.link won't overwrite)
+    return tmp
+
+
+def _publish(tmp: str, path: str) -> None:
+    os.chmod(tmp, FILE_MODE)
+    os.replace(tmp, path)
+    # the rename itself only survives a power loss once the directory is synced
+    fd = os.open(os.path.dirname(path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
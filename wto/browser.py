@@ -0,0 +1,76 @@
+# file: wto/browser.py
+"""
+Playwright download handler with a settings-driven resource filter.
+
+Search pages only need their HTML; images, fonts, stylesheets and
+third-party trackers just cost render time and browser memory. The filter
+is plugged into scrapy-playwright's abort_request hook.
+
+The handler also launches Playwright (and the startup contexts) when the
+first playwright request is downloaded rather than at engine start, so runs
+and commands that never render a page don't pay for a browser.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+from typing import Iterable
+
+from scrapy_playwright.handler import ScrapyPlaywrightDownloadHandler
+
+
+class ResourceFilter:
+    """Decides which browser sub-requests to abort, by resource type or URL regex."""
+
+    def __init__(self, resource_types: Iterable[str] = (), url_patterns: Iterable[str] = (), stats=None):
+        self.resource_types = frozenset(resource_types)
+        self.url_patterns = [re.compile(p) for p in url_patterns]
+        self.stats = stats
+
+    @classmethod
+    def from_settings(cls, settings, stats=None) -> "ResourceFilter":
+        return cls(
+            resource_types=settings.getlist("WTO_BLOCKED_RESOURCE_TYPES"),
+            url_patterns=settings.getlist("WTO_BLOCKED_URL_PATTERNS"),
+            stats=stats,
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.resource_types or self.url_patterns)
+
+    def __call__(self, request) -> bool:
+        if request.resource_type in self.resource_types:
+            blocked = f"type/{request.resource_type}"
+        elif any(p.search(request.url) for p in self.url_patterns):
+            blocked = "url"
+        else:
+            return False
+        if self.stats is not None:
+            self.stats.inc_value(f"playwright/blocked/{blocked}")
+        return True
+
+
+class WtoPlaywrightDownloadHandler(ScrapyPlaywrightDownloadHandler):
+    """scrapy-playwright handler that applies ResourceFilter unless PLAYWRIGHT_ABORT_REQUEST is set."""
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        if self.abort_request is None:
+            resource_filter = ResourceFilter.from_settings(crawler.settings, crawler.stats)
+            if resource_filter:
+                self.abort_request = resource_filter
+        self._launched: asyncio.Future | None = None
+
+    async def _maybe_launch_in_thread(self) -> None:
+        """engine_started hook: nothing to do, see _download_request."""
+
+    def _engine_started(self):
+        """engine_started hook (Scrapy < 2.14): nothing to do, see _download_request."""
+        return None
+
+    async def _download_request(self, request, spider=None):
+        if self._launched is None:
+            self._launched = asyncio.ensure_future(self._launch())
+        await self._launched  # concurrent first requests share one launch
+        return await super()._download_request(request, spider)
@@ -0,0 +1,62 @@
+# file: wto/checkpoint.py
+"""
+Sequential pagination checkpoint (see WTODecisionsSpider).
+
+After every results page the spider rewrites one small JSON file with the
+page number, its "Displaying X-Y of Z" range and the page's ASP.NET form
+state (hidden inputs: __VIEWSTATE, __EVENTVALIDATION, ...). A restarted crawl
+reads it to jump straight back to the next page instead of replaying every
+postback from page 1.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+FILENAME = "wto_pagination.json"
+
+
+def checkpoint_path(settings) -> Optional[str]:
+    """WTO_PAGINATION_CHECKPOINT, else <JOBDIR>/wto_pagination.json, else None (disabled)."""
+    path = settings.get("WTO_PAGINATION_CHECKPOINT")
+    if path:
+        return path
+    jobdir = settings.get("JOBDIR")
+    return os.path.join(jobdir, FILENAME) if jobdir else None
+
+
+def hidden_form_fields(response) -> Dict[str, str]:
+    """Hidden inputs of the page's form: the state an ASP.NET postback needs."""
+    fields = {}
+    for field in response.xpath("//form//input[@type='hidden'][@name]"):
+        fields[field.attrib["name"]] = field.attrib.get("value", "")
+    return fields
+
+
+class PaginationCheckpoint:
+    """One JSON document, replaced atomically on every save."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            return None  # unreadable: behave as if there were none
+
+    def save(self, state: Dict[str, Any]) -> None:
+        state = dict(state, updated_at=datetime.now(timezone.utc).isoformat())
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(state, fh)
+        os.replace(tmp, self.path)  # a crash mid-write keeps the previous page's checkpoint
@@ -0,0 +1,90 @@
+# file: wto/commands/backfill_metadata.py
+"""
+scrapy backfill_metadata [--batch-size 1000] [--force]
+
+Fills documents.symbol / doc_date / doc_type for rows stored before those
+columns existed, from the raw strings kept in data->>'symbol' and
+data->>'date' (older rows hold the whole hitSymbol <div> fragment, which
+clean_symbol() strips). Walks the table by primary key, one transaction per
+batch, so it can be interrupted and re-run.
+"""
+
+import logging
+import time
+
+from scrapy.commands import ScrapyCommand
+from sqlalchemy import select, update
+
+from wto.utils.normalize import clean_symbol, doc_type, parse_doc_date
+
+logger = logging.getLogger(__name__)
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    requires_crawler_process = False
+
+    def syntax(self):
+        return "[options]"
+
+    def short_desc(self):
+        return "Backfill symbol, doc_date and doc_type columns from documents.data"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument("--batch-size", type=int, default=1000, help="rows per transaction")
+        parser.add_argument("--force", action="store_true", help="re-derive rows that already have a symbol")
+
+    def run(self, args, opts):
+        # imported here so `scrapy list` & co. don't need DB credentials
+        from wto.db.models import Document
+        from wto.db.schema import ensure_schema
+        from wto.db.session import get_engine, get_sessionmaker
+
+        with get_engine().begin() as conn:
+            ensure_schema(conn)  # adds the columns/indexes on older databases
+
+        batch_size = max(1, opts.batch_size)
+        last_id = None
+        scanned = updated = dated = 0
+        started = time.monotonic()
+        with get_sessionmaker()() as session:
+            while True:
+                query = (
+                    select(Document.document_id, Document.data["symbol"].astext, Document.data["date"].astext)
+                    .order_by(Document.document_id)
+                    .limit(batch_size)
+                )
+                if not opts.force:
+                    query = query.where(Document.symbol.is_(None), Document.doc_date.is_(None))
+                if last_id is not None:
+                    query = query.where(Document.document_id > last_id)
+                rows = session.execute(query).all()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                scanned += len(rows)
+
+                changes = []
+                for document_id, raw_symbol, raw_date in rows:
+                    symbol = clean_symbol(raw_symbol)
+                    doc_date = parse_doc_date(raw_date)
+                    if symbol is None and doc_date is None:
+                        continue
+                    changes.append({
+                        "document_id": document_id,
+                        "symbol": symbol,
+                        "doc_date": doc_date,
+                        "doc_type": doc_type(symbol),
+                    })
+                    dated += doc_date is not None
+                if changes:
+                    session.execute(update(Document), changes)  # bulk UPDATE by primary key
+                session.commit()
+                updated += len(changes)
+                logger.info("backfill_metadata: %d scanned, %d updated", scanned, updated)
+
+        print(
+            f"Backfilled {updated} of {scanned} document(s) ({dated} with a date) "
+            f"in {time.monotonic() - started:.1f}s"
+        )
@@ -0,0 +1,95 @@
+# file: wto/commands/export_documents.py
+"""
+scrapy export_documents -o OUT [--format jsonl|csv|parquet] [--blobs DIR]
+
+Streams documents (joined with their blob metadata) out of Postgres in
+fixed-size batches through a server-side cursor:
+
+    scrapy export_documents -o docs.jsonl
+    scrapy export_documents -o docs.parquet --blobs export/blobs --with-text
+    scrapy export_documents -o - --format csv --scraper wto_docs --since 2025-01-01
+"""
+
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from wto.export import FORMATS
+
+logger = logging.getLogger(__name__)
+
+# Blob bytes ride in each fetched batch, so keep those batches small
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_BLOB_BATCH_SIZE = 20
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    requires_crawler_process = False
+
+    def syntax(self):
+        return "-o OUTPUT [options]"
+
+    def short_desc(self):
+        return "Export stored documents to JSONL, CSV or Parquet"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument("-o", "--output", required=True, help="output file ('-' = stdout for jsonl/csv)")
+        parser.add_argument("--format", choices=FORMATS, default=None, help="default: from the output extension")
+        parser.add_argument("--blobs", metavar="DIR", help="also write blobs as content-addressed files under DIR")
+        parser.add_argument("--with-text", action="store_true", help="include extracted text (document_texts)")
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help=f"rows per fetch (default {DEFAULT_BATCH_SIZE}, {DEFAULT_BLOB_BATCH_SIZE} with --blobs)")
+        parser.add_argument("--scraper", help="only documents from this scraper")
+        parser.add_argument("--since", help="only documents with timestamp >= this ISO date/time")
+
+    def run(self, args, opts):
+        fmt = opts.format or os.path.splitext(opts.output)[1].lstrip(".").lower()
+        if fmt not in FORMATS:
+            raise UsageError(f"cannot tell the format from {opts.output!r}; pass --format {'/'.join(FORMATS)}")
+        since = None
+        if opts.since:
+            try:
+                since = datetime.fromisoformat(opts.since)
+            except ValueError:
+                raise UsageError(f"--since: not an ISO date/time: {opts.since!r}")
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+        batch_size = opts.batch_size or (DEFAULT_BLOB_BATCH_SIZE if opts.blobs else DEFAULT_BATCH_SIZE)
+
+        # imported here so `scrapy list` & co. don't need DB credentials
+        from wto.blobstore import FilesystemBlobStore
+        from wto.db.session import get_sessionmaker
+        from wto.export import export, export_fields, open_writer
+
+        try:
+            writer = open_writer(fmt, opts.output, export_fields(bool(opts.blobs), opts.with_text))
+        except (RuntimeError, ValueError) as exc:
+            raise UsageError(str(exc))
+
+        store_dir = self.settings.get("WTO_BLOB_STORE_DIR")
+        blob_store = FilesystemBlobStore(store_dir) if store_dir else None
+        started = time.monotonic()
+
+        def progress(counts):
+            logger.info("export_documents: %d row(s), %d blob(s)", counts["rows"], counts["blobs"])
+
+        with get_sessionmaker()() as session:
+            counts = export(
+                session, writer, batch_size=batch_size, blobs_dir=opts.blobs, with_text=opts.with_text,
+                scraper=opts.scraper, since=since, progress=progress, blob_store=blob_store,
+            )
+        summary = f"Exported {counts['rows']} document(s) as {fmt} to {opts.output}"
+        if opts.blobs:
+            summary += f", {counts['blobs']} blob(s) ({counts['blob_bytes'] / 1e6:.1f} MB) under {opts.blobs}"
+            if counts["blobs_missing"]:
+                summary += f" ({counts['blobs_missing']} filesystem-tier blob(s) missing)"
+        summary += f" in {time.monotonic() - started:.1f}s"
+        logger.info(summary)
+        if opts.output != "-":
+            print(summary)
@@ -0,0 +1,48 @@
+# file: wto/commands/migrate.py
+"""
+scrapy migrate [--check] [--force]
+
+Brings the database schema up to wto.db.schema.SCHEMA_VERSION (create
+missing tables, apply column/index patches) and records the version.
+Crawls do the same on open unless WTO_DB_MIGRATE = False; run this once per
+deploy when the crawl role has no DDL rights.
+
+    scrapy migrate           # apply pending changes
+    scrapy migrate --check   # exit 1 when the database is behind
+"""
+
+from scrapy.commands import ScrapyCommand
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    requires_crawler_process = False
+
+    def syntax(self):
+        return "[options]"
+
+    def short_desc(self):
+        return "Create or upgrade the database schema"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument("--check", action="store_true", help="only report the schema version")
+        parser.add_argument("--force", action="store_true", help="re-apply every patch even if current")
+
+    def run(self, args, opts):
+        # imported here so `scrapy list` & co. don't need DB credentials
+        from wto.db.schema import SCHEMA_VERSION, ensure_schema, schema_version
+        from wto.db.session import get_engine
+
+        with get_engine().begin() as conn:
+            current = schema_version(conn)
+            if opts.check:
+                print(f"Schema version {current} (code expects {SCHEMA_VERSION})")
+                if (current or 0) < SCHEMA_VERSION:
+                    self.exitcode = 1
+                return
+            applied = ensure_schema(conn, force=opts.force)
+        if applied:
+            print(f"Migrated schema from version {current} to {SCHEMA_VERSION}")
+        else:
+            print(f"Schema already at version {current}")
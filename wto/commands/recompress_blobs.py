@@ -0,0 +1,108 @@
+# file: wto/commands/recompress_blobs.py
+"""
+scrapy recompress_blobs [--codec zstd] [--batch-size 200] [--force]
+
+One-off migration: compress scraper_blob_store rows written before blob
+compression (codec IS NULL), a batch per transaction, walking the table by
+primary key so it can be stopped and re-run at any time. --force also
+re-encodes rows already stored with a different codec.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+from sqlalchemy import and_, or_, select, update
+
+from wto.compression import compress, decompress, resolve_codec
+
+logger = logging.getLogger(__name__)
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    requires_crawler_process = False
+
+    def syntax(self):
+        return "[options]"
+
+    def short_desc(self):
+        return "Compress existing scraper_blob_store rows in batches"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument("--codec", default=None, help="target codec (default: WTO_BLOB_CODEC)")
+        parser.add_argument("--level", type=int, default=None, help="compression level")
+        parser.add_argument("--batch-size", type=int, default=200, help="rows per transaction")
+        parser.add_argument("--workers", type=int, default=4, help="compression threads")
+        parser.add_argument("--limit", type=int, default=0, help="stop after N rows (0 = all)")
+        parser.add_argument("--force", action="store_true", help="also re-encode rows with another codec")
+        parser.add_argument("--dry-run", action="store_true", help="report savings without writing")
+
+    def run(self, args, opts):
+        # imported here so `scrapy list` & co. don't need DB credentials
+        from wto.db.models import ScraperBlobStore
+        from wto.db.schema import ensure_schema
+        from wto.db.session import get_engine, get_sessionmaker
+
+        try:
+            codec = resolve_codec(opts.codec or self.settings.get("WTO_BLOB_CODEC"))
+        except ValueError as exc:
+            raise UsageError(str(exc))
+        level = opts.level if opts.level is not None else (self.settings.getint("WTO_BLOB_COMPRESSION_LEVEL") or None)
+        batch_size = max(1, opts.batch_size)
+
+        with get_engine().begin() as conn:
+            ensure_schema(conn)
+
+        pending = ScraperBlobStore.codec.is_(None)
+        if opts.force:
+            pending = or_(pending, ScraperBlobStore.codec != codec)
+        pending = and_(pending, ScraperBlobStore.source_file.isnot(None))  # not filesystem-tier rows
+
+        def encode(row):
+            raw = decompress(row.source_file, row.codec)
+            new_codec, payload = compress(raw, codec, level)
+            return {"id": row.id, "source_file": payload, "codec": new_codec, "original_size": len(raw)}
+
+        rows_done = bytes_before = bytes_after = 0
+        last_id = None
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, opts.workers)) as pool, get_sessionmaker()() as session:
+            while not opts.limit or rows_done < opts.limit:
+                take = batch_size if not opts.limit else min(batch_size, opts.limit - rows_done)
+                query = (
+                    select(ScraperBlobStore.id, ScraperBlobStore.source_file, ScraperBlobStore.codec)
+                    .where(pending)
+                    .order_by(ScraperBlobStore.id)
+                    .limit(take)
+                )
+                if last_id is not None:
+                    query = query.where(ScraperBlobStore.id > last_id)
+                batch = session.execute(query).all()
+                if not batch:
+                    break
+                last_id = batch[-1].id
+
+                updates = list(pool.map(encode, batch))
+                bytes_before += sum(len(row.source_file) for row in batch)
+                bytes_after += sum(len(u["source_file"]) for u in updates)
+                rows_done += len(batch)
+                if opts.dry_run:
+                    session.rollback()
+                else:
+                    session.execute(update(ScraperBlobStore), updates)
+                    session.commit()
+                logger.info(
+                    "recompress_blobs: %d row(s), %.1f MB -> %.1f MB",
+                    rows_done, bytes_before / 1e6, bytes_after / 1e6,
+                )
+
+        ratio = bytes_after / bytes_before if bytes_before else 1.0
+        print(
+            f"{'Would recompress' if opts.dry_run else 'Recompressed'} {rows_done} blob(s) with {codec}: "
+            f"{bytes_before / 1e6:.1f} MB -> {bytes_after / 1e6:.1f} MB "
+            f"({ratio:.0%}) in {time.monotonic() - started:.1f}s"
+        )
@@ -0,0 +1,153 @@
+# file: wto/commands/replay_deadletter.py
+"""
+scrapy replay_deadletter [--dir DIR] [--batch-size 500] [--dry-run]
+
+Loads items WtoPipeline dead-lettered (WTO_DEADLETTER_DIR, see
+wto.deadletter) into Postgres once it is healthy again: multi-row upserts
+through the pipeline's own write path, one transaction per batch, with the
+same item-by-item fallback. Items that still fail go back to the live log
+with their new error; replayed blobs are deleted unless --keep-blobs.
+A connection error stops the replay and puts everything left back.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+logger = logging.getLogger(__name__)
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    requires_crawler_process = False
+
+    def syntax(self):
+        return "[options]"
+
+    def short_desc(self):
+        return "Write dead-lettered items back to the database"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument("--dir", default=None, help="dead-letter directory (default: WTO_DEADLETTER_DIR)")
+        parser.add_argument("--batch-size", type=int, default=500, help="items per transaction")
+        parser.add_argument("--batch-max-bytes", type=int, default=256 * 1024 * 1024,
+                            help="also cut a batch once its files add up to this many bytes")
+        parser.add_argument("--keep-blobs", action="store_true", help="keep blob files of replayed items")
+        parser.add_argument("--dry-run", action="store_true", help="only count what would be replayed")
+
+    def run(self, args, opts):
+        from wto.deadletter import DeadLetterSpool, iter_entries
+
+        directory = opts.dir or self.settings.get("WTO_DEADLETTER_DIR")
+        if not directory:
+            raise UsageError("no dead-letter directory: pass --dir or set WTO_DEADLETTER_DIR")
+        spool = DeadLetterSpool(directory)
+
+        if opts.dry_run:
+            logs = spool.claimed_logs() + [spool.log_path]
+            entries = [e for path in logs for e in iter_entries(path)]
+            print(f"{len(entries)} item(s), {sum(e.get('size') or 0 for e in entries) / 1e6:.1f} MB "
+                  f"of files in {directory}")
+            return
+
+        # logs of an interrupted replay first, then the live one
+        logs = spool.claimed_logs()
+        claimed = spool.claim()
+        if claimed:
+            logs.append(claimed)
+        if not logs:
+            print(f"Nothing to replay in {directory}")
+            return
+
+        started = time.monotonic()
+        counts = asyncio.run(self._replay(spool, logs, opts))
+        summary = (
+            f"Replayed {counts['written']} item(s) in {counts['batches']} batch(es); "
+            f"{counts['failed']} still failing, {counts['restored']} back in {spool.log_path}"
+        )
+        if counts["blobs_removed"]:
+            summary += f"; removed {counts['blobs_removed']} blob file(s)"
+        print(f"{summary} ({time.monotonic() - started:.1f}s)")
+
+    async def _replay(self, spool, logs, opts):
+        # imported here so `scrapy list` & co. don't need DB credentials
+        from sqlalchemy.exc import OperationalError
+
+        from wto.db.schema import ensure_schema
+        from wto.db.session import get_async_engine, get_async_sessionmaker
+        from wto.deadletter import iter_entries
+        from wto.pipelines import WtoPipeline
+
+        pipeline = WtoPipeline(
+            blob_codec=self.settings.get("WTO_BLOB_CODEC"),
+            blob_level=self.settings.getint("WTO_BLOB_COMPRESSION_LEVEL") or None,
+            blob_store_dir=self.settings.get("WTO_BLOB_STORE_DIR"),
+        )
+        sessions = get_async_sessionmaker()
+        counts = {"written": 0, "failed": 0, "batches": 0, "restored": 0, "blobs_removed": 0}
+        entries = [e for path in logs for e in iter_entries(path)]
+        done_blobs, retry, batch = [], [], []
+        position = 0
+        try:
+            async with get_async_engine().begin() as conn:
+                await conn.run_sync(ensure_schema)
+            while position < len(entries):
+                batch, nbytes = [], 0
+                while position < len(entries) and len(batch) < max(1, opts.batch_size) and (
+                    not batch or nbytes < opts.batch_max_bytes
+                ):
+                    batch.append(entries[position])
+                    nbytes += entries[position].get("size") or 0
+                    position += 1
+                written, failed = await self._write(pipeline, sessions, spool, batch)
+                batch = []
+                counts["batches"] += 1
+                counts["written"] += len(written)
+                counts["failed"] += len(failed)
+                done_blobs += [e["blob_path"] for e in written if e.get("blob_path")]
+                retry += failed
+                logger.info("replay_deadletter: %d/%d item(s) processed", position, len(entries))
+        except OperationalError as exc:
+            logger.error("replay_deadletter: database unavailable (%s); keeping the rest for later", exc)
+        finally:
+            retry += batch + entries[position:]  # an interrupted batch is simply upserted again later
+            counts["restored"] = spool.restore(retry)
+            for path in logs:
+                os.remove(path)
+            await get_async_engine().dispose()
+        if done_blobs and not opts.keep_blobs:
+            counts["blobs_removed"] = spool.remove_blobs(done_blobs)
+        return counts
+
+    async def _write(self, pipeline, sessions, spool, batch):
+        """(written, failed) entries of one batch; falls back to one transaction per item."""
+        from sqlalchemy.exc import OperationalError
+
+        async with sessions() as session:
+            try:
+                await pipeline.write_batch(session, [spool.pending_from_entry(e) for e in batch])
+                await session.commit()
+                return batch, []
+            except OperationalError:
+                raise
+            except Exception as exc:
+                await session.rollback()
+                logger.warning("replay_deadletter: batch of %d failed (%s); retrying item by item", len(batch), exc)
+            written, failed = [], []
+            for entry in batch:
+                try:
+                    await pipeline.write_batch(session, [spool.pending_from_entry(entry)])
+                    await session.commit()
+                    written.append(entry)
+                except OperationalError:
+                    raise
+                except Exception as exc:
+                    await session.rollback()
+                    logger.error("replay_deadletter: %s still fails: %s", entry.get("url"), exc)
+                    failed.append(dict(entry, error=f"{type(exc).__name__}: {exc}"))
+            return written, failed
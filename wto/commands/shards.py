@@ -0,0 +1,78 @@
+# file: wto/commands/shards.py
+"""
+scrapy shards <status|plan|reset> --crawl ID [options]
+
+Manage the crawl_shards work queue used by `-a pagination=sharded`:
+
+    scrapy shards plan --crawl weekly --start-url URL [--start-url URL2 ...]
+    scrapy shards plan --crawl weekly --start-url URL --pages 480 --per-shard 10
+    scrapy shards status --crawl weekly
+    scrapy shards reset --crawl weekly [--all]
+
+Without --pages, plan only seeds one unplanned shard per URL (e.g. one per
+document-type or date facet of the search) and the first worker to claim
+it splits it into page ranges. Workers then run
+`scrapy crawl wto_docs -a pagination=sharded -a crawl=weekly`.
+"""
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+ACTIONS = ("status", "plan", "reset")
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    requires_crawler_process = False
+
+    def syntax(self):
+        return "<status|plan|reset> --crawl ID [options]"
+
+    def short_desc(self):
+        return "Plan, inspect or requeue shards of a sharded crawl"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument("--crawl", help="crawl id (-a crawl=... / WTO_CRAWL_ID of the workers)")
+        parser.add_argument("--start-url", action="append", default=[], help="search URL to shard (repeatable)")
+        parser.add_argument("--pages", type=int, default=0, help="result pages per URL (0 = let a worker plan)")
+        parser.add_argument("--per-shard", type=int, default=None, help="pages per shard (default: WTO_SHARD_PAGES)")
+        parser.add_argument("--all", action="store_true", help="reset: requeue every shard, not only failed ones")
+
+    def run(self, args, opts):
+        if len(args) != 1 or args[0] not in ACTIONS:
+            raise UsageError(f"expected one of: {', '.join(ACTIONS)}")
+        crawl = opts.crawl or self.settings.get("WTO_CRAWL_ID")
+        if not crawl:
+            raise UsageError("--crawl is required")
+
+        # imported here so `scrapy list` & co. don't need DB credentials
+        from wto.db.schema import ensure_schema
+        from wto.db.session import get_engine, get_sessionmaker
+        from wto.db.shards import ShardQueue
+
+        with get_engine().begin() as conn:
+            ensure_schema(conn)
+        queue = ShardQueue(get_sessionmaker(), crawl, worker="cli")
+
+        action = args[0]
+        if action == "plan":
+            if not opts.start_url:
+                raise UsageError("plan needs at least one --start-url")
+            per_shard = opts.per_shard or self.settings.getint("WTO_SHARD_PAGES", 10)
+            for url in opts.start_url:
+                if opts.pages:
+                    added = queue.plan(url, opts.pages, per_shard)
+                    print(f"{url}: {added} shard(s) of {per_shard} page(s) planned")
+                else:
+                    added = queue.seed(url)
+                    print(f"{url}: {'seeded' if added else 'already in the crawl'}")
+        elif action == "reset":
+            count = queue.reset(failed_only=not opts.all)
+            print(f"Requeued {count} shard(s)")
+
+        summary = queue.summary()
+        total = sum(summary.values())
+        print(f"Crawl {crawl!r}: {total} shard(s)" + "".join(
+            f", {status}={count}" for status, count in sorted(summary.items())
+        ))
@@ -0,0 +1,96 @@
+# file: wto/compression.py
+"""
+Codecs for scraper_blob_store.source_file.
+
+Blobs are stored as (codec, payload, original_size). codec is NULL for rows
+written before compression existed and "identity" when compressing did not
+pay off (already-compressed PDFs often don't shrink); both hold raw bytes.
+zstd needs the optional ``zstandard`` package and falls back to zlib.
+"""
+
+from __future__ import annotations
+
+import logging
+import zlib
+from typing import Iterable, Iterator, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+IDENTITY = "identity"
+CODECS = (IDENTITY, "zlib", "zstd")
+DEFAULT_LEVELS = {"zlib": 6, "zstd": 3}
+# Keep the raw bytes unless compression saves at least this fraction
+MIN_SAVINGS = 0.05
+# What decompress() raises on a damaged payload
+DECOMPRESS_ERRORS = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+def resolve_codec(codec: Optional[str]) -> str:
+    """Normalise a WTO_BLOB_CODEC value; "zstd" degrades to "zlib" without zstandard."""
+    codec = (codec or IDENTITY).lower()
+    if codec in ("none", "raw", ""):
+        codec = IDENTITY
+    if codec not in CODECS:
+        raise ValueError(f"unknown blob codec {codec!r} (expected one of {', '.join(CODECS)})")
+    if codec == "zstd" and zstandard is None:
+        logger.warning("zstandard is not installed; compressing blobs with zlib instead.")
+        return "zlib"
+    return codec
+
+
+def compress(data: bytes, codec: str, level: Optional[int] = None) -> Tuple[str, bytes]:
+    """Return (codec actually used, payload). CPU-bound: call it off the event loop."""
+    if codec == IDENTITY or not data:
+        return IDENTITY, data
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    if codec == "zstd":
+        payload = zstandard.ZstdCompressor(level=level).compress(data)
+    elif codec == "zlib":
+        payload = zlib.compress(data, level)
+    else:
+        raise ValueError(f"unknown blob codec {codec!r}")
+    if len(payload) > len(data) * (1 - MIN_SAVINGS):
+        return IDENTITY, data
+    return codec, payload
+
+
+def decompress(payload: Optional[bytes], codec: Optional[str]) -> Optional[bytes]:
+    """Inverse of compress(); NULL/identity rows are returned unchanged."""
+    if payload is None or codec in (None, IDENTITY):
+        return payload
+    payload = bytes(payload)  # psycopg hands back memoryview for bytea
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("blob is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if codec == "zlib":
+        return zlib.decompress(payload)
+    raise ValueError(f"unknown blob codec {codec!r}")
+
+
+def iter_decompress(chunks: Iterable[bytes], codec: Optional[str]) -> Iterator[bytes]:
+    """decompress() for a payload arriving in pieces (wto.db.reader streams blobs this way)."""
+    if codec in (None, IDENTITY):
+        for chunk in chunks:
+            yield bytes(chunk)
+        return
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("blob is zstd-compressed but zstandard is not installed")
+        decoder = zstandard.ZstdDecompressor().decompressobj()
+    elif codec == "zlib":
+        decoder = zlib.decompressobj()
+    else:
+        raise ValueError(f"unknown blob codec {codec!r}")
+    for chunk in chunks:
+        out = decoder.decompress(bytes(chunk))
+        if out:
+            yield out
+    tail = decoder.flush()
+    if tail:
+        yield tail
@@ -1,3 +1,29 @@
 # wto/db/__init__.py
-from .session import SessionLocal as SA, engine
-__all__ = ["SA", "engine", "SessionLocal"]
+# Names resolve on first access so importing the package builds no engine.
+from importlib import import_module
+
+_EXPORTS = {
+    "SA": ("session", "SessionLocal"),
+    "engine": ("session", "engine"),
+    "SessionLocal": ("session", "SessionLocal"),
+    "AsyncSessionLocal": ("session", "AsyncSessionLocal"),
+    "async_engine": ("session", "async_engine"),
+    "get_engine": ("session", "get_engine"),
+    "get_sessionmaker": ("session", "get_sessionmaker"),
+    "get_async_engine": ("session", "get_async_engine"),
+    "get_async_sessionmaker": ("session", "get_async_sessionmaker"),
+    "ensure_schema": ("schema", "ensure_schema"),
+    "schema_version": ("schema", "schema_version"),
+    "SCHEMA_VERSION": ("schema", "SCHEMA_VERSION"),
+    "DocumentReader": ("reader", "DocumentReader"),
+    "DocumentCache": ("reader", "DocumentCache"),
+}
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    try:
+        module, attr = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    return getattr(import_module(f".{module}", __name__), attr)
@@ -0,0 +1,55 @@
+# file: wto/db/index.py
+"""
+Compact in-memory index of documents already stored in Postgres.
+
+The spider loads it once at startup so it can skip downloading files that
+the pipeline would only dedupe after the fact, or revalidate them with
+conditional requests built from the stored HTTP validators.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+
+from wto.db.models import Document
+
+# Validators kept per document (stored under Document.data["http"])
+VALIDATOR_KEYS = ("etag", "last_modified", "content_length")
+
+
+class KnownDocuments:
+    """url -> (document_id, http validators) for every stored document."""
+
+    def __init__(self, by_url: Optional[Dict[str, Tuple[str, Optional[dict]]]] = None):
+        self._by_url: Dict[str, Tuple[str, Optional[dict]]] = by_url or {}
+
+    @classmethod
+    def load(cls, session, with_validators: bool = False, batch_size: int = 10_000) -> "KnownDocuments":
+        columns = [Document.url, Document.document_id]
+        if with_validators:
+            columns.append(Document.data["http"])
+        stmt = select(*columns).where(Document.url.isnot(None)).execution_options(yield_per=batch_size)
+
+        by_url: Dict[str, Tuple[str, Optional[dict]]] = {}
+        for row in session.execute(stmt):
+            validators = None
+            if with_validators and isinstance(row[2], dict):
+                validators = {k: row[2][k] for k in VALIDATOR_KEYS if row[2].get(k)} or None
+            by_url[row[0]] = (row[1], validators)
+        return cls(by_url)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._by_url
+
+    def __len__(self) -> int:
+        return len(self._by_url)
+
+    def document_id(self, url: str) -> Optional[str]:
+        entry = self._by_url.get(url)
+        return entry[0] if entry else None
+
+    def validators(self, url: str) -> Optional[dict]:
+        entry = self._by_url.get(url)
+        return entry[1] if entry else None
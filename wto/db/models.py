@@ -1,10 +1,12 @@
 # file: wto/db/models.py
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, LargeBinary, Text, UniqueConstraint
+from sqlalchemy import BigInteger, Column, Computed, Date, String, DateTime, ForeignKey, Index, Integer, LargeBinary, Text, UniqueConstraint
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.sql import func, text
 
+from wto.compression import decompress
+
 Base = declarative_base()
 
 class Document(Base):
@@ -20,6 +22,10 @@ class Document(Base):
     path = Column(Text)
     timestamp = Column(DateTime(timezone=True))
     ingested_at = Column(DateTime(timezone=True))
+    # Normalised search metadata (wto.utils.normalize); raw strings stay in data
+    symbol = Column(String(255))
+    doc_date = Column(Date)
+    doc_type = Column(String(100))
 
     # 1:1 relationship with the blob
     blob = relationship(
@@ -30,6 +36,13 @@ class Document(Base):
         foreign_keys="ScraperBlobStore.document_id",
     )
 
+    __table_args__ = (
+        Index("documents_url_idx", "url"),
+        Index("documents_symbol_idx", "symbol"),
+        Index("documents_doc_date_idx", "doc_date"),
+        Index("documents_doc_type_doc_date_idx", "doc_type", "doc_date"),
+    )
+
 class ScraperBlobStore(Base):
     __tablename__ = "scraper_blob_store"
 
@@ -42,7 +55,13 @@ class ScraperBlobStore(Base):
     )
     timestamp = Column(DateTime(timezone=True))
     file_content_type = Column(String(255), nullable=False)
-    source_file = Column(LargeBinary, nullable=False)
+    # NULL when the file lives in the filesystem tier (wto.blobstore, keyed by sha256)
+    source_file = Column(LargeBinary)
+    # NULL/"identity" = raw bytes, otherwise "zlib"/"zstd" (see wto.compression)
+    codec = Column(String(16))
+    original_size = Column(BigInteger)
+    # SHA-256 of the raw file (hex)
+    sha256 = Column(String(64))
 
     # document_id varchar(64) UNIQUE, FK -> documents.document_id
     document_id = Column(
@@ -56,4 +75,71 @@ class ScraperBlobStore(Base):
 
     __table_args__ = (
         UniqueConstraint("document_id", name="scraper_blob_store_document_id_unique"),
-    )
\ No newline at end of file
+        Index("scraper_blob_store_sha256_idx", "sha256"),
+    )
+
+    @property
+    def content(self):
+        """source_file decompressed (raw document bytes); None for filesystem-tier rows."""
+        if self.source_file is None:
+            return None
+        return decompress(self.source_file, self.codec)
+
+
+class CrawlShard(Base):
+    """One slice of a search crawl (a page range of one search URL), claimed by a worker."""
+
+    __tablename__ = "crawl_shards"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    crawl = Column(String(100), nullable=False)
+    start_url = Column(Text, nullable=False)
+    first_page = Column(Integer, nullable=False)
+    # NULL = not planned yet: the first worker to claim it splits it from page 1
+    last_page = Column(Integer)
+    # pending -> claimed -> done | failed (claimed with an expired lease counts as pending)
+    status = Column(String(16), nullable=False, server_default=text("'pending'"))
+    worker = Column(String(100))
+    lease_expires = Column(DateTime(timezone=True))
+    attempts = Column(Integer, nullable=False, server_default=text("0"))
+    pages_done = Column(Integer, nullable=False, server_default=text("0"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        UniqueConstraint("crawl", "start_url", "first_page", name="crawl_shards_range_unique"),
+        Index("crawl_shards_crawl_status_idx", "crawl", "status"),
+    )
+
+
+class DocumentText(Base):
+    """Plain text extracted from a document's file, with a full-text search vector."""
+
+    __tablename__ = "document_texts"
+
+    document_id = Column(
+        String(64),
+        ForeignKey("documents.document_id", onupdate="CASCADE", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    text = Column(Text)
+    # Maintained by Postgres from `text`; query with tsv @@ websearch_to_tsquery('english', ...)
+    tsv = Column(postgresql.TSVECTOR, Computed("to_tsvector('english', coalesce(text, ''))", persisted=True))
+    pages = Column(Integer)
+    extractor = Column(String(50))
+    error = Column(Text)
+    extracted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("document_texts_tsv_idx", "tsv", postgresql_using="gin"),
+    )
+
+
+class SchemaVersion(Base):
+    """Single row recording the schema version last applied by wto.db.schema.ensure_schema."""
+
+    __tablename__ = "wto_schema_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,264 @@
+# file: wto/db/reader.py
+"""
+Read API for consumers of documents / scraper_blob_store.
+
+    from wto.db.reader import DocumentReader
+
+    reader = DocumentReader()
+    rows, after = reader.list_documents(limit=500, doc_type="WT/DS/AB/R")
+    while rows:
+        ...
+        rows, after = reader.list_documents(limit=500, after=after, doc_type="WT/DS/AB/R")
+    doc = reader.get_by_url("https://docs.wto.org/...")
+    with open("out.pdf", "wb") as fh:
+        for chunk in reader.iter_blob(doc["document_id"]):
+            fh.write(chunk)
+
+Rows are plain dicts of the document columns plus blob metadata
+(file_content_type, size, sha256, codec, storage), never the file itself.
+
+- Listing is keyset-paginated on document_id (WHERE document_id > :after
+  ORDER BY document_id LIMIT n), so page 10,000 costs the same as page 1;
+  ``after`` is the last document_id of the previous page, None at the end.
+- Lookups by document_id and URL go through a DocumentCache, an LRU bounded
+  by the approximate size of the rows it holds. Entries expire after
+  ``max_age`` seconds (5 minutes by default, 0 keeps them until evicted), so
+  re-scraped documents show up without a restart; call
+  ``reader.cache.invalidate()`` to drop them sooner.
+- get_many() fetches ids in batches of IN (...) queries, cache hits first.
+- Files stream in chunks: rows in Postgres with substring() over
+  source_file (decompressed on the fly), one REPEATABLE READ transaction per
+  file; filesystem-tier rows (wto.blobstore) through mmap.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import case, func, select
+
+from wto.compression import iter_decompress
+from wto.utils.normalize import clean_symbol
+
+from .models import Document, ScraperBlobStore
+from .session import get_sessionmaker
+
+CHUNK_SIZE = 1024 * 1024
+
+METADATA_COLUMNS = (
+    Document.document_id, Document.name, Document.url, Document.symbol, Document.doc_date,
+    Document.doc_type, Document.scraper, Document.version, Document.path, Document.timestamp,
+    Document.ingested_at, Document.data,
+    ScraperBlobStore.file_content_type,
+    func.coalesce(ScraperBlobStore.original_size, func.octet_length(ScraperBlobStore.source_file)).label("size"),
+    ScraperBlobStore.sha256,
+    ScraperBlobStore.codec,
+    # IS NULL doesn't detoast the file
+    case(
+        (ScraperBlobStore.id.is_(None), None),
+        (ScraperBlobStore.source_file.is_(None), "filesystem"),
+        else_="postgres",
+    ).label("storage"),
+)
+
+
+def metadata_query():
+    """SELECT of METADATA_COLUMNS over documents LEFT JOIN scraper_blob_store."""
+    return select(*METADATA_COLUMNS).outerjoin(
+        ScraperBlobStore, ScraperBlobStore.document_id == Document.document_id
+    )
+
+
+class DocumentCache:
+    """LRU of metadata rows, evicted by approximate size rather than count.
+
+    Rows older than ``max_age`` seconds are refetched; 0 disables expiry.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_age: float = 300.0):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # key -> (row, size, stored_at), least recently used first
+        self._entries: "OrderedDict[Any, Tuple[Dict[str, Any], int, float]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None or (self.max_age and time.monotonic() - entry[2] > self.max_age):
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, row: Dict[str, Any]) -> None:
+        size = self.row_size(row)
+        if size > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (row, size, time.monotonic())
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate(self, key=None) -> None:
+        """Forget ``key``, or everything."""
+        if key is None:
+            self._entries.clear()
+            self.bytes = 0
+        else:
+            self._drop(key)
+
+    @staticmethod
+    def row_size(row: Dict[str, Any]) -> int:
+        # JSON length tracks the payload (data dominates); 200 covers dict/object overhead
+        return len(json.dumps(row, default=str)) + 200
+
+    def _drop(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+
+class DocumentReader:
+    """Queries for downstream consumers; short-lived sessions from ``sessionmaker`` (default SessionLocal)."""
+
+    def __init__(self, sessionmaker=None, blob_store=None, cache: Optional[DocumentCache] = None):
+        self._sessionmaker = sessionmaker
+        # wto.blobstore.FilesystemBlobStore, for rows written with WTO_BLOB_STORE_DIR
+        self.blob_store = blob_store
+        self.cache = cache if cache is not None else DocumentCache()
+
+    def session(self):
+        if self._sessionmaker is None:
+            self._sessionmaker = get_sessionmaker()
+        return self._sessionmaker()
+
+    # listing
+    def list_documents(self, limit: int = 500, after: Optional[str] = None, scraper: Optional[str] = None,
+                       doc_type: Optional[str] = None, symbol: Optional[str] = None, date_from=None,
+                       date_to=None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page in document_id order; returns (rows, ``after`` for the next page or None)."""
+        stmt = metadata_query()
+        if after is not None:
+            stmt = stmt.where(Document.document_id > after)
+        if scraper:
+            stmt = stmt.where(Document.scraper == scraper)
+        if doc_type:
+            stmt = stmt.where(Document.doc_type == doc_type)
+        if symbol:
+            stmt = stmt.where(Document.symbol == clean_symbol(symbol))
+        if date_from is not None:
+            stmt = stmt.where(Document.doc_date >= date_from)
+        if date_to is not None:
+            stmt = stmt.where(Document.doc_date <= date_to)
+        stmt = stmt.order_by(Document.document_id).limit(limit)
+        with self.session() as session:
+            rows = [dict(m) for m in session.execute(stmt).mappings()]
+        return rows, (rows[-1]["document_id"] if len(rows) == limit else None)
+
+    def iter_documents(self, page_size: int = 500, **filters) -> Iterator[Dict[str, Any]]:
+        """Every matching row, fetched ``page_size`` at a time (filters as for list_documents)."""
+        after = None
+        while True:
+            rows, after = self.list_documents(limit=page_size, after=after, **filters)
+            yield from rows
+            if after is None:
+                return
+
+    # lookups
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        return self.get_many([document_id]).get(document_id)
+
+    def get_by_url(self, url: str) -> Optional[Dict[str, Any]]:
+        row = self.cache.get(("url", url))
+        if row is not None:
+            return row
+        with self.session() as session:
+            mapping = session.execute(
+                metadata_query().where(Document.url == url).order_by(Document.document_id).limit(1)
+            ).mappings().first()
+        if mapping is None:
+            return None
+        row = dict(mapping)
+        self.cache.put(("url", url), row)
+        self.cache.put(("id", row["document_id"]), row)
+        return row
+
+    def get_many(self, document_ids: Iterable[str], batch_size: int = 1000) -> Dict[str, Dict[str, Any]]:
+        """document_id -> row for the ids that exist; misses are fetched ``batch_size`` per query."""
+        found: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for document_id in dict.fromkeys(document_ids):
+            row = self.cache.get(("id", document_id))
+            if row is not None:
+                found[document_id] = row
+            else:
+                missing.append(document_id)
+        if missing:
+            with self.session() as session:
+                for start in range(0, len(missing), batch_size):
+                    chunk = missing[start:start + batch_size]
+                    for mapping in session.execute(metadata_query().where(Document.document_id.in_(chunk))).mappings():
+                        row = dict(mapping)
+                        found[row["document_id"]] = row
+                        self.cache.put(("id", row["document_id"]), row)
+        return found
+
+    def find_by_symbol(self, symbol: str, limit: int = 100) -> List[Dict[str, Any]]:
+        rows, _ = self.list_documents(limit=limit, symbol=symbol)
+        return rows
+
+    def find_by_sha256(self, sha256: str) -> List[Dict[str, Any]]:
+        """Documents whose file has this SHA-256 (the same file under several URLs)."""
+        with self.session() as session:
+            stmt = metadata_query().where(ScraperBlobStore.sha256 == sha256.lower()).order_by(Document.document_id)
+            return [dict(m) for m in session.execute(stmt).mappings()]
+
+    # files
+    def iter_blob(self, document_id: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """The document's raw file in pieces of about ``chunk_size`` bytes; KeyError when it has none."""
+        with self.session() as session:
+            # every substring() read sees the same version of the row
+            session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            info = session.execute(
+                select(
+                    ScraperBlobStore.codec,
+                    ScraperBlobStore.sha256,
+                    func.octet_length(ScraperBlobStore.source_file).label("stored_size"),
+                ).where(ScraperBlobStore.document_id == document_id)
+            ).one_or_none()
+            if info is None:
+                raise KeyError(document_id)
+            if info.stored_size is None:
+                session.rollback()  # nothing left to read from Postgres
+                if self.blob_store is None:
+                    raise RuntimeError(
+                        f"{document_id} is in the filesystem blob tier; pass blob_store=FilesystemBlobStore(...)"
+                    )
+                yield from self.blob_store.iter_chunks(info.sha256, chunk_size)
+                return
+            yield from iter_decompress(
+                self._iter_stored_chunks(session, document_id, info.stored_size, chunk_size), info.codec
+            )
+
+    def read_blob(self, document_id: str) -> bytes:
+        return b"".join(self.iter_blob(document_id))
+
+    @staticmethod
+    def _iter_stored_chunks(session, document_id: str, stored_size: int, chunk_size: int) -> Iterator[bytes]:
+        for offset in range(0, stored_size, chunk_size):
+            yield session.execute(
+                select(func.substring(ScraperBlobStore.source_file, offset + 1, chunk_size))
+                .where(ScraperBlobStore.document_id == document_id)
+            ).scalar_one()
@@ -0,0 +1,70 @@
+# file: wto/db/schema.py
+"""
+Versioned schema bootstrap.
+
+create_all() only creates missing tables; columns and indexes added to
+existing tables are patched in here (ADD COLUMN / CREATE INDEX IF NOT
+EXISTS) so older databases pick them up. The version applied last is kept in
+wto_schema_version, so once a database is current, ensure_schema() costs a
+single SELECT instead of a full metadata reflection. Bump SCHEMA_VERSION
+whenever a model or SCHEMA_PATCHES changes.
+"""
+
+from typing import Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from .models import Base, SchemaVersion
+
+SCHEMA_VERSION = 3
+
+SCHEMA_PATCHES = (
+    "ALTER TABLE scraper_blob_store ADD COLUMN IF NOT EXISTS codec varchar(16)",
+    "ALTER TABLE scraper_blob_store ADD COLUMN IF NOT EXISTS original_size bigint",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS symbol varchar(255)",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS doc_date date",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS doc_type varchar(100)",
+    "CREATE INDEX IF NOT EXISTS documents_symbol_idx ON documents (symbol)",
+    "CREATE INDEX IF NOT EXISTS documents_doc_date_idx ON documents (doc_date)",
+    "CREATE INDEX IF NOT EXISTS documents_doc_type_doc_date_idx ON documents (doc_type, doc_date)",
+    # 2: filesystem blob tier
+    "ALTER TABLE scraper_blob_store ALTER COLUMN source_file DROP NOT NULL",
+    "ALTER TABLE scraper_blob_store ADD COLUMN IF NOT EXISTS sha256 varchar(64)",
+    "CREATE INDEX IF NOT EXISTS scraper_blob_store_sha256_idx ON scraper_blob_store (sha256)",
+    # 3: reader API (wto.db.reader). Files are compressed by the pipeline already;
+    # EXTERNAL skips pglz so substring() reads only the TOAST chunks it needs.
+    "CREATE INDEX IF NOT EXISTS documents_url_idx ON documents (url)",
+    "ALTER TABLE scraper_blob_store ALTER COLUMN source_file SET STORAGE EXTERNAL",
+)
+
+# pg_advisory_xact_lock key serialising concurrent migrations (several crawl workers)
+_MIGRATION_LOCK = 0x77746F5F73636D  # "wto_scm"
+
+
+def schema_version(conn) -> Optional[int]:
+    """Version recorded in the database, or None when it was never migrated."""
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": SchemaVersion.__tablename__}).scalar() is None:
+        return None
+    return conn.execute(select(SchemaVersion.version).where(SchemaVersion.id == 1)).scalar()
+
+
+def ensure_schema(conn, force: bool = False) -> bool:
+    """
+    Bring the schema up to SCHEMA_VERSION (sync connection, inside a transaction).
+    Returns True when anything was applied, False when it was already current.
+    """
+    if not force and (schema_version(conn) or 0) >= SCHEMA_VERSION:
+        return False
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MIGRATION_LOCK})
+    if not force and (schema_version(conn) or 0) >= SCHEMA_VERSION:
+        return False  # another worker migrated while we waited for the lock
+    Base.metadata.create_all(conn)
+    for statement in SCHEMA_PATCHES:
+        conn.execute(text(statement))
+    stmt = insert(SchemaVersion).values(id=1, version=SCHEMA_VERSION)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=[SchemaVersion.id],
+        set_={"version": stmt.excluded.version, "applied_at": text("now()")},
+    ))
+    return True
@@ -1,30 +1,27 @@
 # file: wto/db/session.py
+"""
+Engines and session factories, built on first use and cached.
+
+Nothing here touches the environment or the database at import time, so
+`scrapy list`, `scrapy check` and other commands that never write work
+without DB credentials. The old module attributes (engine, SessionLocal,
+async_engine, AsyncSessionLocal, DB_URL) still resolve, lazily.
+"""
 
 import os
-from dotenv import load_dotenv
+from functools import lru_cache
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-load_dotenv()
-
-PGUSER = os.getenv("PGUSER")
-PGPASSWORD = os.getenv("PGPASSWORD")
-PGDATABASE = os.getenv("PGDATABASE")
-PGHOST = os.getenv("PGHOST", "localhost")
-PGPORT = os.getenv("PGPORT", "5432")
-
-# Connection string: SQLAlchemy + Postgres + psycopg2
-DB_URL = f"postgresql+psycopg2://{PGUSER}:{PGPASSWORD}@{PGHOST}:{PGPORT}/{PGDATABASE}"
-
-# Engine = connection to DB (resilient pool)
-engine = create_engine(
-    DB_URL,
+ENGINE_OPTIONS = dict(
     pool_pre_ping=True,
     pool_size=5,
     max_overflow=10,
     pool_recycle=1800,
     connect_args={
-        # TCP keepalives (psycopg2)
+        # TCP keepalives (libpq connection parameters)
         "keepalives": 1,
         "keepalives_idle": 30,
         "keepalives_interval": 10,
@@ -32,5 +29,56 @@ engine = create_engine(
     },
 )
 
-# SessionLocal = short-lived session factory
-SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+@lru_cache(maxsize=None)
+def get_db_url() -> str:
+    """Connection string from PG* variables (and .env): SQLAlchemy + psycopg 3, sync and async."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    user = os.getenv("PGUSER")
+    password = os.getenv("PGPASSWORD")
+    database = os.getenv("PGDATABASE")
+    host = os.getenv("PGHOST", "localhost")
+    port = os.getenv("PGPORT", "5432")
+    return f"postgresql+psycopg://{user}:{password}@{host}:{port}/{database}"
+
+
+@lru_cache(maxsize=None)
+def get_engine():
+    """Engine = connection to DB (resilient pool)."""
+    return create_engine(get_db_url(), **ENGINE_OPTIONS)
+
+
+@lru_cache(maxsize=None)
+def get_sessionmaker():
+    """Short-lived session factory bound to get_engine()."""
+    return sessionmaker(bind=get_engine(), autoflush=False, expire_on_commit=False)
+
+
+@lru_cache(maxsize=None)
+def get_async_engine():
+    """Async engine for code running on the crawler's asyncio reactor."""
+    return create_async_engine(get_db_url(), **ENGINE_OPTIONS)
+
+
+@lru_cache(maxsize=None)
+def get_async_sessionmaker():
+    return async_sessionmaker(bind=get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
+_LAZY = {
+    "DB_URL": get_db_url,
+    "engine": get_engine,
+    "SessionLocal": get_sessionmaker,
+    "async_engine": get_async_engine,
+    "AsyncSessionLocal": get_async_sessionmaker,
+}
+
+
+def __getattr__(name):
+    # why: keeps `from wto.db.session import SessionLocal` working without import-time cost
+    try:
+        return _LAZY[name]()
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
@@ -0,0 +1,203 @@
+# file: wto/db/shards.py
+"""
+Postgres-backed work queue of crawl shards (page ranges of a search URL).
+
+Workers claim one shard at a time with SELECT ... FOR UPDATE SKIP LOCKED,
+so any number of spider processes on any number of machines can share a
+crawl without handing out the same range twice. A claim is a lease: the
+worker renews it as pages complete, and a shard whose lease expired (the
+worker crashed or was killed) is claimable again, up to max_attempts.
+
+A crawl starts from one unplanned shard per search URL (last_page NULL);
+whoever claims it reads the total from page 1 and splits it into ranges.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+from datetime import timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from .models import CrawlShard
+
+PENDING, CLAIMED, DONE, FAILED = "pending", "claimed", "done", "failed"
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ShardQueue:
+    """Claim/renew/complete shards of one crawl (sync sessions; run off the reactor)."""
+
+    def __init__(self, session_factory, crawl: str, worker: Optional[str] = None,
+                 lease_seconds: float = 300, max_attempts: int = 3):
+        self.session_factory = session_factory
+        self.crawl = crawl
+        self.worker = worker or default_worker_id()
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max(1, int(max_attempts))
+
+    def seed(self, start_url: str) -> bool:
+        """Add the unplanned shard for ``start_url`` unless the crawl already has it."""
+        with self.session_factory() as session:
+            result = session.execute(
+                insert(CrawlShard)
+                .values(crawl=self.crawl, start_url=start_url, first_page=1, last_page=None)
+                .on_conflict_do_nothing(constraint="crawl_shards_range_unique")
+            )
+            session.commit()
+            return bool(result.rowcount)
+
+    def plan(self, start_url: str, total_pages: int, pages_per_shard: int) -> int:
+        """Insert page-range shards 1..total_pages; existing ranges are left alone."""
+        rows = self._ranges(start_url, 1, total_pages, pages_per_shard)
+        if not rows:
+            return 0
+        stmt = insert(CrawlShard).values(rows)
+        # an unplanned shard for the same URL becomes the first range
+        stmt = stmt.on_conflict_do_update(
+            constraint="crawl_shards_range_unique",
+            set_={"last_page": stmt.excluded.last_page},
+            where=CrawlShard.last_page.is_(None),
+        )
+        with self.session_factory() as session:
+            result = session.execute(stmt)
+            session.commit()
+            return result.rowcount
+
+    def claim(self) -> Optional[Dict]:
+        """Lease the next free shard (unplanned ones first), or None."""
+        now = func.now()
+        claimable = and_(
+            CrawlShard.crawl == self.crawl,
+            or_(
+                CrawlShard.status == PENDING,
+                and_(CrawlShard.status == CLAIMED, CrawlShard.lease_expires < now),
+            ),
+        )
+        with self.session_factory() as session:
+            # Shards that used up their attempts are parked so they stop counting as open work
+            session.execute(
+                update(CrawlShard)
+                .where(claimable, CrawlShard.attempts >= self.max_attempts)
+                .values(status=FAILED, worker=None, lease_expires=None)
+                .execution_options(synchronize_session=False)
+            )
+            candidate = (
+                select(CrawlShard.id)
+                .where(claimable, CrawlShard.attempts < self.max_attempts)
+                .order_by(CrawlShard.last_page.is_(None).desc(), CrawlShard.first_page, CrawlShard.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            row = session.execute(
+                update(CrawlShard)
+                .where(CrawlShard.id == candidate)
+                .values(
+                    status=CLAIMED,
+                    worker=self.worker,
+                    lease_expires=now + self.lease,
+                    attempts=CrawlShard.attempts + 1,
+                )
+                .returning(
+                    CrawlShard.id, CrawlShard.start_url, CrawlShard.first_page,
+                    CrawlShard.last_page, CrawlShard.attempts,
+                )
+                .execution_options(synchronize_session=False)
+            ).first()
+            session.commit()
+        return dict(row._mapping) if row is not None else None
+
+    def split(self, shard_id: int, total_pages: int, pages_per_shard: int) -> int:
+        """Turn the unplanned shard into pages 1..k and queue the remaining ranges; returns k."""
+        last_page = max(1, min(pages_per_shard, total_pages))
+        with self.session_factory() as session:
+            start_url = session.execute(
+                update(CrawlShard)
+                .where(CrawlShard.id == shard_id, CrawlShard.worker == self.worker)
+                .values(last_page=last_page, lease_expires=func.now() + self.lease)
+                .returning(CrawlShard.start_url)
+                .execution_options(synchronize_session=False)
+            ).scalar_one()
+            rows = self._ranges(start_url, last_page + 1, total_pages, pages_per_shard)
+            if rows:
+                session.execute(
+                    insert(CrawlShard).values(rows).on_conflict_do_nothing(constraint="crawl_shards_range_unique")
+                )
+            session.commit()
+        return last_page
+
+    def renew(self, shard_id: int, pages_done: int = 0) -> None:
+        """Extend the lease (heartbeat) and count finished pages."""
+        self._update(shard_id, lease_expires=func.now() + self.lease,
+                     pages_done=CrawlShard.pages_done + pages_done)
+
+    def complete(self, shard_id: int) -> None:
+        self._update(shard_id, status=DONE, lease_expires=None, finished_at=func.now())
+
+    def release(self, shard_id: int) -> None:
+        """Give the shard back (failed pages, shutdown) so another claim retries it."""
+        self._update(shard_id, status=PENDING, worker=None, lease_expires=None)
+
+    def unfinished(self) -> int:
+        """Shards still pending or leased by someone."""
+        with self.session_factory() as session:
+            return session.execute(
+                select(func.count())
+                .select_from(CrawlShard)
+                .where(CrawlShard.crawl == self.crawl, CrawlShard.status.in_((PENDING, CLAIMED)))
+            ).scalar_one()
+
+    def summary(self) -> Dict[str, int]:
+        """status -> number of shards for this crawl."""
+        with self.session_factory() as session:
+            rows = session.execute(
+                select(CrawlShard.status, func.count())
+                .where(CrawlShard.crawl == self.crawl)
+                .group_by(CrawlShard.status)
+            ).all()
+        return dict(rows)
+
+    def reset(self, failed_only: bool = True) -> int:
+        """Requeue failed shards (or every shard) with a fresh attempt budget."""
+        where = [CrawlShard.crawl == self.crawl]
+        if failed_only:
+            where.append(CrawlShard.status == FAILED)
+        with self.session_factory() as session:
+            result = session.execute(
+                update(CrawlShard)
+                .where(*where)
+                .values(status=PENDING, worker=None, lease_expires=None, attempts=0,
+                        pages_done=0, finished_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+            return result.rowcount
+
+    def _update(self, shard_id: int, **values) -> None:
+        with self.session_factory() as session:
+            session.execute(
+                update(CrawlShard)
+                .where(CrawlShard.id == shard_id, CrawlShard.worker == self.worker)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+
+    def _ranges(self, start_url: str, first: int, total_pages: int, pages_per_shard: int):
+        pages_per_shard = max(1, int(pages_per_shard))
+        return [
+            {
+                "crawl": self.crawl,
+                "start_url": start_url,
+                "first_page": page,
+                "last_page": min(page + pages_per_shard - 1, total_pages),
+            }
+            for page in range(first, total_pages + 1, pages_per_shard)
+        ]
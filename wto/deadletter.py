@@ -0,0 +1,192 @@
+# file: wto/deadletter.py
+"""
+Local dead-letter spool for items WtoPipeline could not write.
+
+Instead of dropping an item (and the file it downloaded) when Postgres
+rejects it or is unreachable, the pipeline appends it here:
+
+    <dir>/items.jsonl                      one JSON line per failed item
+    <dir>/blobs/<sha256[:2]>/<sha256><ext> raw document bytes, written once
+
+The blob is written and fsynced (file and directory) before its line, so
+every durable line points at a complete file; spool files are hard-linked or
+copied in chunks, never read into memory. `scrapy replay_deadletter` claims the log (renames it, so a running
+crawl keeps appending to a fresh one), bulk-loads it through the pipeline's
+upsert path and appends whatever still fails back to items.jsonl.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from wto.blobstore import copy_file_durably, hash_file, write_bytes_durably
+from wto.export import blob_relpath
+
+LOG_NAME = "items.jsonl"
+BLOBS_DIR = "blobs"
+
+
+class DeadLetterSpool:
+    """Append-only JSONL log plus content-addressed blobs under ``directory``."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.log_path = os.path.join(directory, LOG_NAME)
+        self.blobs_dir = os.path.join(directory, BLOBS_DIR)
+        self._lock = threading.Lock()
+
+    def append(self, pending: Dict[str, Any], error: str) -> int:
+        """Record one WtoPipeline pending row; returns the blob bytes written (worker thread)."""
+        entry = {
+            "kind": pending["kind"],
+            "url": pending.get("url"),
+            "name": pending.get("name"),
+            "error": error,
+            "failed_at": datetime.now(timezone.utc),
+        }
+        nbytes = 0
+        if pending["kind"] == "touch":
+            entry.update(document_id=pending["document_id"], timestamp=pending.get("timestamp"))
+        else:
+            content_type = pending["blob"]["file_content_type"]
+            entry["blob_path"], entry["blob_sha256"], nbytes = self._store_blob(pending, content_type)
+            entry.update(
+                candidate_id=pending["candidate_id"],
+                doc=pending["doc"],
+                file_content_type=content_type,
+                size=nbytes,
+            )
+        line = json.dumps(entry, default=_json_default, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as fh:
+                fh.write(line)
+                fh.flush()
+                os.fsync(fh.fileno())
+        return nbytes
+
+    def _store_blob(self, pending: Dict[str, Any], content_type: Optional[str]) -> tuple:
+        """Durably store the pending row's file; returns (relative path, sha256, size)."""
+        raw = pending["blob"]["source_file"]
+        source = pending.get("source_path") if raw is None else None
+        sha256 = pending["blob"].get("sha256")
+        if source is not None:
+            sha256 = sha256 or hash_file(source)
+            size = os.path.getsize(source)
+        else:
+            sha256 = sha256 or hashlib.sha256(raw).hexdigest()
+            size = len(raw)
+        rel = blob_relpath(sha256, content_type)
+        path = os.path.join(self.blobs_dir, rel)
+        if not os.path.exists(path):
+            if source is not None:
+                copy_file_durably(source, path)
+            else:
+                write_bytes_durably(path, raw)
+        return rel, sha256, size
+
+    def claim(self) -> Optional[str]:
+        """Move the current log aside for replay; None when there is nothing to replay."""
+        if not os.path.exists(self.log_path) or not os.path.getsize(self.log_path):
+            return None
+        claimed = os.path.join(self.directory, f"items.{int(time.time())}.replaying.jsonl")
+        os.replace(self.log_path, claimed)
+        return claimed
+
+    def claimed_logs(self) -> List[str]:
+        """Logs left behind by an interrupted replay, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".replaying.jsonl")
+        )
+
+    def restore(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Append ``entries`` (parsed lines) back to the live log."""
+        lines = [json.dumps(e, default=_json_default, ensure_ascii=False) + "\n" for e in entries]
+        if lines:
+            with self._lock:
+                with open(self.log_path, "a", encoding="utf-8") as fh:
+                    fh.writelines(lines)
+                    fh.flush()
+                    os.fsync(fh.fileno())
+        return len(lines)
+
+    def referenced_blobs(self) -> Set[str]:
+        return {e["blob_path"] for e in iter_entries(self.log_path) if e.get("blob_path")}
+
+    def remove_blobs(self, paths: Iterable[str]) -> int:
+        """Delete blob files (relative paths) that no line of the live log still references."""
+        keep = self.referenced_blobs()
+        removed = 0
+        for rel in set(paths) - keep:
+            try:
+                os.remove(os.path.join(self.blobs_dir, rel))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def pending_from_entry(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Inverse of append(): a pending row for WtoPipeline.write_batch()."""
+        if entry["kind"] == "touch":
+            return {
+                "kind": "touch",
+                "name": entry.get("name"),
+                "url": entry.get("url") or "",
+                "document_id": entry["document_id"],
+                "timestamp": _parse_datetime(entry.get("timestamp")),
+            }
+        doc = dict(entry["doc"])
+        doc["timestamp"] = _parse_datetime(doc.get("timestamp"))
+        doc["doc_date"] = date.fromisoformat(doc["doc_date"]) if doc.get("doc_date") else None
+        return {
+            "kind": "upsert",
+            "name": entry.get("name"),
+            "url": entry.get("url") or "",
+            "candidate_id": entry["candidate_id"],
+            # the blob file stands in for the spool file; read at write time
+            "source_path": os.path.join(self.blobs_dir, entry["blob_path"]),
+            "size": entry.get("size") or 0,
+            "doc": doc,
+            "blob": {
+                "file_content_type": entry["file_content_type"],
+                "source_file": None,
+                "sha256": entry.get("blob_sha256"),
+            },
+        }
+
+
+def iter_entries(path: str) -> Iterator[Dict[str, Any]]:
+    """Parsed lines of a dead-letter log (a torn last line from a crash is skipped)."""
+    try:
+        fh = open(path, encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
@@ -0,0 +1,245 @@
+# file: wto/export.py
+"""
+Streaming export of stored documents (used by `scrapy export_documents`).
+
+Rows come from documents LEFT JOIN scraper_blob_store through a server-side
+cursor, a fixed number at a time, and are written before the next batch is
+fetched, so memory stays flat regardless of corpus size. Blob bytes are only
+selected when they are exported, as content-addressed files
+(<blobs>/<sha256[:2]>/<sha256><ext>) written once and referenced by path;
+rows kept in the filesystem tier are read from ``blob_store`` (wto.blobstore).
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import sys
+import tempfile
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import func, select
+
+from wto.blobstore import FILE_MODE
+from wto.compression import decompress
+from wto.db.models import Document, DocumentText, ScraperBlobStore
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional dependency
+    pyarrow = None
+
+FORMATS = ("jsonl", "csv", "parquet")
+BASE_FIELDS = (
+    "document_id", "name", "url", "symbol", "doc_date", "doc_type", "scraper", "version",
+    "path", "timestamp", "ingested_at", "data", "file_content_type", "size",
+)
+BLOB_FIELDS = ("blob_path", "blob_sha256")
+TEXT_FIELDS = ("text",)
+
+
+def export_fields(with_blobs: bool = False, with_text: bool = False) -> List[str]:
+    return list(BASE_FIELDS) + (list(BLOB_FIELDS) if with_blobs else []) + (list(TEXT_FIELDS) if with_text else [])
+
+
+def iter_batches(session, batch_size: int = 1000, with_blobs: bool = False, with_text: bool = False,
+                 scraper: Optional[str] = None, since: Optional[datetime] = None) -> Iterator[list]:
+    """Yield lists of row mappings from a server-side cursor, ``batch_size`` at a time."""
+    columns = [
+        Document.document_id, Document.name, Document.url, Document.symbol, Document.doc_date,
+        Document.doc_type, Document.scraper, Document.version,
+        Document.path, Document.timestamp, Document.ingested_at, Document.data,
+        ScraperBlobStore.file_content_type,
+        func.coalesce(ScraperBlobStore.original_size, func.octet_length(ScraperBlobStore.source_file)).label("size"),
+    ]
+    if with_blobs:
+        columns += [ScraperBlobStore.source_file, ScraperBlobStore.codec, ScraperBlobStore.sha256]
+    stmt = select(*columns).outerjoin(ScraperBlobStore, ScraperBlobStore.document_id == Document.document_id)
+    if with_text:
+        stmt = stmt.add_columns(DocumentText.text).outerjoin(
+            DocumentText, DocumentText.document_id == Document.document_id
+        )
+    if scraper:
+        stmt = stmt.where(Document.scraper == scraper)
+    if since is not None:
+        stmt = stmt.where(Document.timestamp >= since)
+    stmt = stmt.order_by(Document.document_id).execution_options(stream_results=True, yield_per=batch_size)
+    for partition in session.execute(stmt).mappings().partitions():
+        yield partition
+
+
+def blob_relpath(digest: str, content_type: Optional[str]) -> str:
+    """<sha256[:2]>/<sha256><ext>, the layout of exported (and dead-lettered) blobs."""
+    ext = mimetypes.guess_extension((content_type or "").split(";")[0].strip()) or ".bin"
+    return os.path.join(digest[:2], digest + ext)
+
+
+def write_blob(root: str, content, content_type: Optional[str], digest: Optional[str] = None) -> tuple:
+    """Store bytes-like ``content`` under its SHA-256 (once); returns (relative path, sha256)."""
+    digest = digest or hashlib.sha256(content).hexdigest()
+    rel = blob_relpath(digest, content_type)
+    path = os.path.join(root, rel)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        os.fchmod(fd, FILE_MODE)  # mkstemp's 0600 would hide the blob from other readers
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(content)
+        os.replace(tmp, path)  # atomic: a crashed export never leaves half a blob
+    return rel, digest
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+class JsonLinesWriter:
+    def __init__(self, stream, fields, owns_stream: bool = False):
+        self.stream = stream
+        self.fields = fields
+        self.owns_stream = owns_stream
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.stream.write(json.dumps({f: row.get(f) for f in self.fields}, default=_json_default,
+                                         ensure_ascii=False))
+            self.stream.write("\n")
+
+    def close(self) -> None:
+        # closing (not just flushing) surfaces write errors such as a full disk
+        if self.owns_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+
+class CsvWriter:
+    def __init__(self, stream, fields, owns_stream: bool = False):
+        self.stream = stream
+        self.fields = fields
+        self.owns_stream = owns_stream
+        self.writer = csv.DictWriter(stream, fieldnames=fields, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            row = dict(row)
+            row["data"] = json.dumps(row.get("data"), default=_json_default, ensure_ascii=False)
+            for key in ("doc_date", "timestamp", "ingested_at"):
+                if isinstance(row.get(key), (date, datetime)):
+                    row[key] = row[key].isoformat()
+            self.writer.writerow(row)
+
+    def close(self) -> None:
+        # closing (not just flushing) surfaces write errors such as a full disk
+        if self.owns_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+
+class ParquetWriter:
+    def __init__(self, path, fields):
+        if pyarrow is None:
+            raise RuntimeError("Parquet export needs the pyarrow package")
+        types = {
+            "timestamp": pyarrow.timestamp("us", tz="UTC"),
+            "ingested_at": pyarrow.timestamp("us", tz="UTC"),
+            "size": pyarrow.int64(),
+            "doc_date": pyarrow.date32(),
+        }
+        self.fields = fields
+        self.schema = pyarrow.schema([(f, types.get(f, pyarrow.string())) for f in fields])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        columns = {f: [row.get(f) for row in rows] for f in self.fields}
+        columns["data"] = [json.dumps(d, default=_json_default, ensure_ascii=False) if d is not None else None
+                           for d in columns["data"]]
+        # one row group per batch keeps the writer's buffer bounded
+        self.writer.write_table(pyarrow.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def open_writer(fmt: str, output: str, fields: List[str]):
+    """Writer for ``fmt``; ``output`` "-" writes JSONL/CSV to stdout."""
+    if fmt == "parquet":
+        if output == "-":
+            raise ValueError("Parquet cannot be written to stdout")
+        return ParquetWriter(output, fields)
+    if output == "-":
+        return (CsvWriter if fmt == "csv" else JsonLinesWriter)(sys.stdout, fields)
+    stream = open(output, "w", encoding="utf-8", newline="")
+    return (CsvWriter if fmt == "csv" else JsonLinesWriter)(stream, fields, owns_stream=True)
+
+
+def export(session, writer, batch_size: int = 1000, blobs_dir: Optional[str] = None,
+           with_text: bool = False, scraper: Optional[str] = None, since: Optional[datetime] = None,
+           progress=None, blob_store=None) -> Dict[str, int]:
+    """Stream every matching document into ``writer``; returns row/blob counters.
+
+    ``blobs_missing`` counts filesystem-tier rows whose file couldn't be
+    exported (no ``blob_store`` given, or the file isn't in it); they are
+    written without blob_path.
+    """
+    counts = {"rows": 0, "blobs": 0, "blob_bytes": 0, "blobs_missing": 0}
+    try:
+        for batch in iter_batches(session, batch_size, with_blobs=bool(blobs_dir), with_text=with_text,
+                                  scraper=scraper, since=since):
+            rows = []
+            for mapping in batch:
+                row = dict(mapping)
+                if blobs_dir:
+                    _export_blob(row, blobs_dir, blob_store, counts)
+                rows.append(row)
+            writer.write(rows)
+            counts["rows"] += len(rows)
+            if progress is not None:
+                progress(counts)
+    finally:
+        writer.close()
+    if counts["blobs_missing"]:
+        logger.warning(
+            "export: %d filesystem-tier blob(s) not exported (%s)", counts["blobs_missing"],
+            "set WTO_BLOB_STORE_DIR" if blob_store is None else f"missing under {blob_store.root}",
+        )
+    return counts
+
+
+def _export_blob(row: Dict[str, Any], blobs_dir: str, blob_store, counts: Dict[str, int]) -> None:
+    payload = row.pop("source_file", None)
+    codec = row.pop("codec", None)
+    sha256 = row.pop("sha256", None)
+    if payload is not None:
+        content = decompress(payload, codec)
+        row["blob_path"], row["blob_sha256"] = write_blob(blobs_dir, content, row["file_content_type"])
+        counts["blobs"] += 1
+        counts["blob_bytes"] += len(content)
+    elif sha256:
+        if blob_store is None:
+            counts["blobs_missing"] += 1
+            return
+        try:
+            blob = blob_store.open(sha256)
+        except FileNotFoundError:
+            logger.warning("export: %s: blob %s not in %s", row.get("document_id"), sha256, blob_store.root)
+            counts["blobs_missing"] += 1
+            return
+        with blob:
+            row["blob_path"], row["blob_sha256"] = write_blob(
+                blobs_dir, blob.view, row["file_content_type"], digest=sha256
+            )
+            counts["blobs"] += 1
+            counts["blob_bytes"] += len(blob)
@@ -0,0 +1,474 @@
+# Define here your custom extensions
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/extensions.html
+
+import bisect
+import cProfile
+import functools
+import inspect
+import io
+import json
+import logging
+import os
+import pstats
+import signal
+import time
+import tracemalloc
+import types
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+from wto import signals as wto_signals
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class StageHistogram:
+    """Cumulative-style latency histogram plus byte counter for one crawl stage."""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.bytes = 0
+
+    def observe(self, seconds, nbytes=0):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.bytes += nbytes or 0
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (coarse, like Prometheus)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return float("inf")
+
+
+class StageMetrics:
+    """Per-stage latency/throughput metrics dumped periodically to a file.
+
+    Stages are reported through the wto.signals.stage_observed signal, sent
+    by WtoDownloaderMiddleware (render, download), WtoSpiderMiddleware
+    (callback), FileSpoolMiddleware and parse_document (sha256) and
+    WtoPipeline (db_upsert, db_commit, compress). Queue depths (scheduler, downloader,
+    scraper, pipeline buffer) are sampled at every dump.
+
+    Settings: WTO_METRICS_ENABLED, WTO_METRICS_FILE, WTO_METRICS_FORMAT
+    ("prometheus" or "json") and WTO_METRICS_INTERVAL (seconds).
+    """
+
+    def __init__(self, crawler, path, fmt="prometheus", interval=15.0):
+        self.crawler = crawler
+        self.path = path
+        self.fmt = fmt
+        self.interval = interval
+        self.stages = {}
+        self.queues = {}
+        self.pipeline_buffered = 0
+        self._loop = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("WTO_METRICS_ENABLED"):
+            raise NotConfigured
+        fmt = crawler.settings.get("WTO_METRICS_FORMAT", "prometheus")
+        default_file = "wto_metrics.prom" if fmt == "prometheus" else "wto_metrics.json"
+        ext = cls(
+            crawler,
+            path=crawler.settings.get("WTO_METRICS_FILE") or default_file,
+            fmt=fmt,
+            interval=crawler.settings.getfloat("WTO_METRICS_INTERVAL", 15.0),
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.stage_observed, signal=wto_signals.stage_observed)
+        return ext
+
+    def spider_opened(self, spider):
+        self._loop = task.LoopingCall(self.dump)
+        self._loop.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+        self.dump()
+        stats = self.crawler.stats
+        for stage, hist in self.stages.items():
+            stats.set_value(f"metrics/{stage}/count", hist.count)
+            stats.set_value(f"metrics/{stage}/seconds_sum", round(hist.sum, 3))
+            stats.set_value(f"metrics/{stage}/p50_le", hist.quantile(0.5))
+            stats.set_value(f"metrics/{stage}/p99_le", hist.quantile(0.99))
+            if hist.bytes:
+                stats.set_value(f"metrics/{stage}/bytes", hist.bytes)
+
+    def stage_observed(self, stage, seconds, nbytes=0):
+        hist = self.stages.get(stage)
+        if hist is None:
+            hist = self.stages[stage] = StageHistogram()
+        hist.observe(seconds, nbytes)
+
+    def sample_queues(self):
+        engine = self.crawler.engine
+        if engine is None:
+            return
+        slot = getattr(engine, "_slot", None) or getattr(engine, "slot", None)
+        scheduler = getattr(slot, "scheduler", None)
+        if scheduler is not None and hasattr(scheduler, "__len__"):
+            self.queues["scheduler"] = len(scheduler)
+        self.queues["downloader_active"] = len(engine.downloader.active)
+        scraper_slot = getattr(engine.scraper, "slot", None)
+        if scraper_slot is not None:
+            self.queues["scraper_active"] = len(scraper_slot.active)
+            self.queues["scraper_active_bytes"] = scraper_slot.active_size
+        for pipe in getattr(engine.scraper.itemproc, "middlewares", ()):
+            if hasattr(pipe, "_buffer"):
+                self.queues["pipeline_buffered"] = len(pipe._buffer)
+
+    def dump(self):
+        self.sample_queues()
+        body = self.render_prometheus() if self.fmt == "prometheus" else self.render_json()
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(body)
+        os.replace(tmp, self.path)  # atomic for textfile collectors
+
+    def render_json(self):
+        return json.dumps({
+            "timestamp": time.time(),
+            "stages": {
+                stage: {
+                    "count": h.count,
+                    "seconds_sum": h.sum,
+                    "bytes": h.bytes,
+                    "p50_le": h.quantile(0.5),
+                    "p90_le": h.quantile(0.9),
+                    "p99_le": h.quantile(0.99),
+                    "buckets": {str(bound): total for bound, total in h.cumulative()},
+                }
+                for stage, h in self.stages.items()
+            },
+            "queues": self.queues,
+        }, indent=2)
+
+    def render_prometheus(self):
+        lines = ["# TYPE wto_stage_seconds histogram"]
+        for stage, h in sorted(self.stages.items()):
+            for bound, total in h.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'wto_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {total}')
+            lines.append(f'wto_stage_seconds_sum{{stage="{stage}"}} {h.sum:.6f}')
+            lines.append(f'wto_stage_seconds_count{{stage="{stage}"}} {h.count}')
+        lines.append("# TYPE wto_stage_bytes_total counter")
+        for stage, h in sorted(self.stages.items()):
+            lines.append(f'wto_stage_bytes_total{{stage="{stage}"}} {h.bytes}')
+        lines.append("# TYPE wto_queue_depth gauge")
+        for queue, depth in sorted(self.queues.items()):
+            lines.append(f'wto_queue_depth{{queue="{queue}"}} {depth}')
+        return "\n".join(lines) + "\n"
+
+
+class ProfileTarget:
+    """Timings of one profiled callback or pipeline method, plus its sampled cProfile data."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.profiled_calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.profile = None
+
+    def get_profile(self):
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+        return self.profile
+
+
+class _SteppedAwaitable:
+    """Awaits ``awaitable`` slice by slice, so only its own work between awaits is measured."""
+
+    def __init__(self, profiler, target, sampled, awaitable):
+        self.profiler = profiler
+        self.target = target
+        self.sampled = sampled
+        self.iterator = awaitable.__await__()
+
+    def __await__(self):
+        send, value = self.iterator.send, None
+        while True:
+            try:
+                future = self.profiler._step(self.target, self.sampled, send, value)
+            except StopIteration as exc:
+                return exc.value
+            try:
+                value, send = (yield future), self.iterator.send
+            except BaseException as exc:  # thrown into the awaiting task: hand it on
+                value, send = exc, self.iterator.throw
+
+
+class CallbackProfiler:
+    """Wall/CPU time and sampled cProfile data for spider callbacks and pipelines.
+
+    Wraps every ``parse*`` method of the spider (or WTO_PROFILE_CALLBACKS) and
+    the WTO_PROFILE_PIPELINE_METHODS of each item pipeline. Every call is timed
+    (wall and reactor-thread CPU; generators and coroutines only between
+    yields/awaits, so other tasks' work is not counted). While collecting, every
+    WTO_PROFILE_EVERY-th call also runs under that target's cProfile;
+    WTO_PROFILE_TOGGLE_SIGNAL (SIGUSR2) switches collection on and off and
+    writes the dumps gathered so far. With WTO_PROFILE_TRACEMALLOC_INTERVAL
+    set, the top allocation sites are written every that many seconds.
+
+    Output goes to WTO_PROFILE_DIR/<start time>-<spider>/: one .prof per target
+    (``python -m pstats``, snakeviz) and report.txt with the timing table and
+    the top WTO_PROFILE_TOP_N functions. Work done in worker threads (blob
+    compression, spool reads) is not seen.
+    """
+
+    def __init__(self, crawler, directory, every=10, cprofile=True, toggle_signal="SIGUSR2",
+                 tracemalloc_interval=0.0, tracemalloc_frames=1, top_n=30, callbacks=None,
+                 pipeline_methods=("process_item", "write_batch")):
+        self.crawler = crawler
+        self.directory = directory
+        self.every = max(1, int(every))
+        self.collecting = cprofile
+        self.toggle_signal = toggle_signal
+        self.tracemalloc_interval = tracemalloc_interval
+        self.tracemalloc_frames = tracemalloc_frames
+        self.top_n = top_n
+        self.callbacks = callbacks
+        self.pipeline_methods = tuple(pipeline_methods or ())
+        self.targets = {}
+        self.out = None
+        # cProfile hooks can't nest (a nested call is only timed)
+        self._active = False
+        self._snapshots = 0
+        self._first_snapshot = None
+        self._previous_handler = None
+        self._loop = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("WTO_PROFILE_ENABLED"):
+            raise NotConfigured
+        ext = cls(
+            crawler,
+            directory=settings.get("WTO_PROFILE_DIR") or "profiles",
+            every=settings.getint("WTO_PROFILE_EVERY", 10),
+            cprofile=settings.getbool("WTO_PROFILE_CPROFILE", True),
+            toggle_signal=settings.get("WTO_PROFILE_TOGGLE_SIGNAL"),
+            tracemalloc_interval=settings.getfloat("WTO_PROFILE_TRACEMALLOC_INTERVAL", 0.0),
+            tracemalloc_frames=settings.getint("WTO_PROFILE_TRACEMALLOC_FRAMES", 1),
+            top_n=settings.getint("WTO_PROFILE_TOP_N", 30),
+            callbacks=settings.getlist("WTO_PROFILE_CALLBACKS") or None,
+            pipeline_methods=settings.getlist("WTO_PROFILE_PIPELINE_METHODS"),
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        self.out = os.path.join(self.directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{spider.name}")
+        os.makedirs(self.out, exist_ok=True)
+        for name, method in inspect.getmembers(spider, inspect.ismethod):
+            if name in (self.callbacks or ()) or (self.callbacks is None and name.startswith("parse")):
+                # an instance attribute bound to the spider, so JOBDIR still serializes it by name
+                setattr(spider, name, types.MethodType(self._wrap(f"callback.{name}", method.__func__), spider))
+        self._wrap_pipelines()
+        sig = getattr(signal, self.toggle_signal or "", None)
+        if sig is not None:
+            self._previous_handler = signal.signal(sig, self._on_signal)
+        if self.tracemalloc_interval > 0:
+            tracemalloc.start(self.tracemalloc_frames)
+            self._loop = task.LoopingCall(self.snapshot)
+            self._loop.start(self.tracemalloc_interval, now=True)
+        logger.info(
+            "Profiling %d target(s) into %s (cProfile %s, every %d call(s))",
+            len(self.targets), self.out, "on" if self.collecting else "off", self.every,
+        )
+
+    def spider_closed(self, spider, reason):
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+        if self._previous_handler is not None:
+            signal.signal(getattr(signal, self.toggle_signal), self._previous_handler)
+        self.write_profiles()
+        lines = self.render_report()
+        if tracemalloc.is_tracing():
+            lines += self.render_tracemalloc(tracemalloc.take_snapshot())
+            tracemalloc.stop()
+        with open(os.path.join(self.out, "report.txt"), "w", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+        stats = self.crawler.stats
+        for target in self.targets.values():
+            if target.calls:
+                stats.set_value(f"profile/{target.name}/calls", target.calls)
+                stats.set_value(f"profile/{target.name}/wall_seconds", round(target.wall, 3))
+                stats.set_value(f"profile/{target.name}/cpu_seconds", round(target.cpu, 3))
+        logger.info("Profile report written to %s", os.path.join(self.out, "report.txt"))
+
+    def _wrap_pipelines(self):
+        itemproc = self.crawler.engine.scraper.itemproc
+        for pipe in getattr(itemproc, "middlewares", ()):
+            for method in self.pipeline_methods:
+                original = getattr(pipe, method, None)
+                if not inspect.ismethod(original):
+                    continue
+                wrapped = types.MethodType(
+                    self._wrap(f"pipeline.{type(pipe).__name__}.{method}", original.__func__), pipe
+                )
+                setattr(pipe, method, wrapped)
+                if method == "process_item":
+                    # ItemPipelineManager registered the bound method when it was built
+                    registered = itemproc.methods["process_item"]
+                    for i, m in enumerate(registered):
+                        if m == original:
+                            registered[i] = wrapped
+                    requiring = getattr(itemproc, "_mw_methods_requiring_spider", None)
+                    if requiring is not None and original in requiring:
+                        requiring.add(wrapped)
+
+    def _wrap(self, name, func):
+        target = self.targets.setdefault(name, ProfileTarget(name))
+
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                agen = func(*args, **kwargs)
+                sampled = self._start_call(target)
+                while True:
+                    try:
+                        result = await _SteppedAwaitable(self, target, sampled, agen.__anext__())
+                    except StopAsyncIteration:
+                        return
+                    yield result
+        elif inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                sampled = self._start_call(target)
+                return await _SteppedAwaitable(self, target, sampled, func(*args, **kwargs))
+        elif inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                gen = func(*args, **kwargs)
+                sampled = self._start_call(target)
+                try:
+                    while True:
+                        try:
+                            result = self._step(target, sampled, next, gen)
+                        except StopIteration:
+                            return
+                        yield result
+                finally:
+                    gen.close()
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                sampled = self._start_call(target)
+                return self._step(target, sampled, functools.partial(func, *args, **kwargs))
+        return wrapper
+
+    def _start_call(self, target):
+        target.calls += 1
+        sampled = self.collecting and target.calls % self.every == 0
+        if sampled:
+            target.profiled_calls += 1
+        return sampled
+
+    def _step(self, target, sampled, fn, *args):
+        """Runs one synchronous slice of a call: timed, and under cProfile when sampled."""
+        profile = None
+        wall, cpu = time.perf_counter(), time.thread_time()
+        if sampled and self.collecting and not self._active:
+            profile = target.get_profile()
+            self._active = True
+            profile.enable()
+        try:
+            return fn(*args)
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._active = False
+            target.wall += time.perf_counter() - wall
+            target.cpu += time.thread_time() - cpu
+
+    def _on_signal(self, signum, frame):
+        # Off the signal handler: a profile may be enabled mid-slice right now
+        from twisted.internet import reactor
+
+        reactor.callFromThread(self.toggle)
+
+    def toggle(self):
+        self.collecting = not self.collecting
+        logger.info("cProfile collection %s", "resumed" if self.collecting else "paused")
+        if not self.collecting:
+            self.write_profiles()
+
+    def write_profiles(self):
+        for target in self.targets.values():
+            if target.profile is not None:
+                target.profile.dump_stats(os.path.join(self.out, f"{target.name}.prof"))
+
+    def render_report(self):
+        lines = [
+            f"{'target':<48} {'calls':>8} {'profiled':>8} {'wall s':>10} {'cpu s':>10} {'cpu ms/call':>12}"
+        ]
+        for target in sorted(self.targets.values(), key=lambda t: t.cpu, reverse=True):
+            if target.calls:
+                lines.append(
+                    f"{target.name:<48} {target.calls:>8} {target.profiled_calls:>8} {target.wall:>10.3f} "
+                    f"{target.cpu:>10.3f} {1000 * target.cpu / target.calls:>12.3f}"
+                )
+        for target in self.targets.values():
+            if target.profile is None:
+                continue
+            for sort in ("tottime", "cumulative"):
+                buf = io.StringIO()
+                pstats.Stats(target.profile, stream=buf).strip_dirs().sort_stats(sort).print_stats(self.top_n)
+                lines += ["", f"=== {target.name} ({target.profiled_calls} profiled call(s)), by {sort} ===",
+                          buf.getvalue().strip()]
+        return lines
+
+    def snapshot(self):
+        """Writes the top allocation sites (and growth since the first snapshot) to tracemalloc-NNNN.txt."""
+        snap = tracemalloc.take_snapshot()
+        self._snapshots += 1
+        path = os.path.join(self.out, f"tracemalloc-{self._snapshots:04d}.txt")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write("\n".join(self.render_tracemalloc(snap)) + "\n")
+        if self._first_snapshot is None:
+            self._first_snapshot = snap
+        current, peak = tracemalloc.get_traced_memory()
+        self.crawler.stats.set_value("profile/tracemalloc_current_bytes", current)
+        self.crawler.stats.max_value("profile/tracemalloc_peak_bytes", peak)
+
+    def render_tracemalloc(self, snap):
+        snap = snap.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        lines = ["", f"=== tracemalloc: {current / 1e6:.1f} MB traced, peak {peak / 1e6:.1f} MB ==="]
+        lines += [str(stat) for stat in snap.statistics("lineno")[:self.top_n]]
+        if self._first_snapshot is not None:
+            lines += ["", "=== growth since the first snapshot ==="]
+            lines += [str(stat) for stat in snap.compare_to(self._first_snapshot, "lineno")[:self.top_n]]
+        return lines
@@ -0,0 +1,212 @@
+# file: wto/httpcache.py
+"""
+Replay cache for Playwright-rendered search pages (HTTPCACHE_STORAGE/POLICY).
+
+Rendering a results page costs seconds of browser time; replaying it from
+disk costs milliseconds, which makes tuning parse() and reprocessing a
+pagination sequence cheap. Only `playwright: True` responses are cached
+(document files and in-page pagination are not).
+
+Entries are keyed on the search URL plus the ASP.NET postback state that
+selects the page (__EVENTTARGET, __EVENTARGUMENT, meta["page_number"]), not
+on the request body: __VIEWSTATE changes between sessions, so a body
+fingerprint would never hit twice. Each entry is one file
+
+    <HTTPCACHE_DIR>/<spider>/<key[:2]>/<key>.wtc
+    = b"WTC1" + uint32 header length + JSON header + body (wto.compression codec)
+
+Expiry uses the stored timestamp (HTTPCACHE_EXPIRATION_SECS, 0 = never);
+file mtimes track last use, and once WTO_SEARCH_CACHE_MAX_BYTES is exceeded
+the least recently used entries are evicted. Entries that fail to parse or
+decompress (a crash mid-write, a damaged disk) are deleted and refetched.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import parse_qs
+
+from scrapy.extensions.httpcache import DummyPolicy
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+from w3lib.url import canonicalize_url
+
+from wto.compression import DECOMPRESS_ERRORS, compress, decompress, resolve_codec
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WTC1"
+SUFFIX = ".wtc"
+_HEADER_LEN = struct.Struct(">I")
+# Evict down to this fraction of the budget so every store doesn't evict again
+_EVICT_TO = 0.9
+
+
+def cache_key(request) -> str:
+    """SHA-1 of method, canonical URL and the postback fields that pick the results page."""
+    form = {}
+    if request.method == "POST" and request.body:
+        form = parse_qs(request.body.decode("latin-1"), keep_blank_values=True)
+    parts = [
+        request.method,
+        canonicalize_url(request.url),
+        form.get("__EVENTTARGET", [""])[0],
+        form.get("__EVENTARGUMENT", [""])[0],
+        str(request.meta.get("page_number", "")),
+    ]
+    return hashlib.sha1("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+class SearchPageCachePolicy(DummyPolicy):
+    """Caches rendered search pages (200s only); everything else bypasses the cache."""
+
+    def should_cache_request(self, request) -> bool:
+        if not request.meta.get("playwright") or request.meta.get("playwright_include_page"):
+            return False  # a replayed response has no live page for parse_in_page
+        return super().should_cache_request(request)
+
+    def should_cache_response(self, response, request) -> bool:
+        return response.status == 200 and super().should_cache_response(response, request)
+
+
+class CompressedSearchCacheStorage:
+    """Single-file, compressed cache entries with TTL and an LRU size budget."""
+
+    def __init__(self, settings):
+        self.cachedir = data_path(settings["HTTPCACHE_DIR"])
+        self.expiration_secs = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.max_bytes = settings.getint("WTO_SEARCH_CACHE_MAX_BYTES", 0)
+        self.codec = resolve_codec(settings.get("WTO_SEARCH_CACHE_CODEC", "zstd"))
+        self.level = settings.getint("WTO_SEARCH_CACHE_COMPRESSION_LEVEL") or None
+        self.stats = None
+        self._root: Optional[str] = None
+        # path -> size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+
+    def open_spider(self, spider) -> None:
+        self.stats = spider.crawler.stats
+        self._root = os.path.join(self.cachedir, spider.name)
+        found = []
+        for dirpath, _, filenames in os.walk(self._root):
+            for filename in filenames:
+                if filename.endswith(SUFFIX):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    found.append((st.st_mtime, path, st.st_size))
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+        self._bytes = sum(self._entries.values())
+        logger.info(
+            "Search page cache in %s: %d entries, %.1f MB (codec=%s, ttl=%ss, budget=%.0f MB)",
+            self._root, len(self._entries), self._bytes / 1e6, self.codec,
+            self.expiration_secs or "none", self.max_bytes / 1e6,
+        )
+        self._evict()
+
+    def close_spider(self, spider) -> None:
+        if self.stats is not None:
+            self.stats.set_value("httpcache/entries", len(self._entries))
+            self.stats.set_value("httpcache/bytes", self._bytes)
+
+    def retrieve_response(self, spider, request):
+        """Cached response for ``request``, or None when missing or expired."""
+        path = self._path(request)
+        try:
+            with open(path, "rb") as fh:
+                raw = fh.read()
+        except FileNotFoundError:
+            return None
+        try:
+            header, payload = self._unpack(raw)
+            expired = 0 < self.expiration_secs < time.time() - header["stored_at"]
+            body = None if expired else decompress(payload, header["codec"])
+        except (ValueError, KeyError, TypeError, struct.error) + DECOMPRESS_ERRORS as exc:
+            # truncated or garbled entry (json.JSONDecodeError is a ValueError): refetch
+            logger.warning("Discarding corrupt cache entry %s for %s: %r", path, request.url, exc)
+            self._inc("httpcache/corrupt")
+            self._remove(path)
+            return None
+        if expired:
+            self._inc("httpcache/expired")
+            self._remove(path)
+            return None
+        os.utime(path)  # last use, for LRU across runs
+        if path in self._entries:
+            self._entries.move_to_end(path)
+        headers = Headers({k: [v.encode("latin-1") for v in vs] for k, vs in header["headers"].items()})
+        respcls = responsetypes.from_args(headers=headers, url=header["url"], body=body)
+        request.meta["cache_timestamp"] = header["stored_at"]
+        return respcls(url=header["url"], status=header["status"], headers=headers, body=body)
+
+    def store_response(self, spider, request, response) -> None:
+        codec, payload = compress(response.body, self.codec, self.level)
+        header = json.dumps({
+            "url": response.url,
+            "status": response.status,
+            "headers": {
+                k.decode("latin-1"): [v.decode("latin-1") for v in vs] for k, vs in response.headers.items()
+            },
+            "stored_at": time.time(),
+            "codec": codec,
+            "size": len(response.body),
+            "request_url": request.url,
+            "page_number": request.meta.get("page_number"),
+        }).encode("utf-8")
+        path = self._path(request)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(MAGIC)
+            fh.write(_HEADER_LEN.pack(len(header)))
+            fh.write(header)
+            fh.write(payload)
+        os.replace(tmp, path)  # atomic: readers never see half an entry
+        size = len(MAGIC) + _HEADER_LEN.size + len(header) + len(payload)
+        self._bytes += size - self._entries.pop(path, 0)
+        self._entries[path] = size
+        self._inc("httpcache/stored_bytes", size)
+        self._evict()
+
+    def _path(self, request) -> str:
+        key = cache_key(request)
+        return os.path.join(self._root, key[:2], key + SUFFIX)
+
+    @staticmethod
+    def _unpack(raw: bytes):
+        if raw[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a search page cache entry")
+        start = len(MAGIC) + _HEADER_LEN.size
+        (length,) = _HEADER_LEN.unpack_from(raw, len(MAGIC))
+        return json.loads(raw[start:start + length]), raw[start + length:]
+
+    def _evict(self) -> None:
+        if not self.max_bytes or self._bytes <= self.max_bytes:
+            return
+        while self._entries and self._bytes > self.max_bytes * _EVICT_TO:
+            path, _ = next(iter(self._entries.items()))
+            self._remove(path)
+            self._inc("httpcache/evicted")
+
+    def _remove(self, path: str) -> None:
+        self._bytes -= self._entries.pop(path, 0)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _inc(self, key: str, count: int = 1) -> None:
+        if self.stats is not None:
+            self.stats.inc_value(key, count)
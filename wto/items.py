@@ -11,7 +11,13 @@ class WtoDocumentItem(scrapy.Item):
     version = scrapy.Field()           # package/spider version string
     timestamp = scrapy.Field()         # optional, DB default also fine
     data = scrapy.Field()              # dict/jsonb; include sha256 here
+    symbol = scrapy.Field()            # clean document symbol, e.g. "WT/L/1234"
+    doc_date = scrapy.Field()          # datetime.date parsed from the hit details
+    doc_type = scrapy.Field()          # symbol series, e.g. "WT/L"
+    not_modified = scrapy.Field()      # True when a conditional request got 304
 
     # Fields for the 'scraper_blob_store' table
     source_file = scrapy.Field()       # bytes (the PDF)
+    source_path = scrapy.Field()       # spool file holding the PDF instead of source_file
+    source_size = scrapy.Field()       # body size in bytes
     file_content_type = scrapy.Field() # e.g. "application/pdf"
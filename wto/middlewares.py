@@ -3,21 +3,44 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.utils.conf import build_component_list
+from scrapy.utils.misc import load_object
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+from wto import signals as wto_signals
+from wto.spool import SpoolFile
+
+
+def observe_stage(crawler, stage, seconds, nbytes=0):
+    """Report one timed unit of work to StageMetrics (wto.extensions)."""
+    crawler.signals.send_catch_log(
+        signal=wto_signals.stage_observed, stage=stage, seconds=seconds, nbytes=nbytes
+    )
+
 
 class WtoSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
     # scrapy acts as if the spider middleware does not modify the
     # passed objects.
 
+    def __init__(self, crawler=None):
+        self.crawler = crawler
+
     @classmethod
     def from_crawler(cls, crawler):
         # This method is used by Scrapy to create your spiders.
-        s = cls()
+        s = cls(crawler)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
         return s
 
@@ -33,8 +56,41 @@ class WtoSpiderMiddleware:
         # it has processed the response.
 
         # Must return an iterable of Request, or item objects.
-        for i in result:
+        # Times only the callback's own work (between yields), per callback name.
+        elapsed = 0.0
+        results = iter(result)
+        while True:
+            started = time.perf_counter()
+            try:
+                i = next(results)
+            except StopIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - started
             yield i
+        self._observe_callback(response, elapsed)
+
+    async def process_spider_output_async(self, response, result, spider):
+        # Same as process_spider_output, for async generator callbacks.
+        elapsed = 0.0
+        results = result.__aiter__()
+        while True:
+            started = time.perf_counter()
+            try:
+                i = await results.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - started
+            yield i
+        self._observe_callback(response, elapsed)
+
+    def _observe_callback(self, response, elapsed):
+        if self.crawler is None:
+            return
+        callback = getattr(response.request, "callback", None) if response.request else None
+        name = getattr(callback, "__name__", None) or "parse"
+        observe_stage(self.crawler, f"callback.{name}", elapsed)
 
     def process_spider_exception(self, response, exception, spider):
         # Called when a spider or process_spider_input() method
@@ -57,11 +113,18 @@ class WtoDownloaderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
     # scrapy acts as if the downloader middleware does not modify the
     # passed objects.
+    #
+    # Times each download as "render" (Playwright) or "download" (plain HTTP).
+    # Installed right above the downloader, so the figure covers the slot
+    # delay plus the transfer, not the other middlewares.
+
+    def __init__(self, crawler=None):
+        self.crawler = crawler
 
     @classmethod
     def from_crawler(cls, crawler):
         # This method is used by Scrapy to create your spiders.
-        s = cls()
+        s = cls(crawler)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
         return s
 
@@ -75,6 +138,7 @@ class WtoDownloaderMiddleware:
         # - or return a Request object
         # - or raise IgnoreRequest: process_exception() methods of
         #   installed downloader middleware will be called
+        request.meta["wto_download_started"] = time.perf_counter()
         return None
 
     def process_response(self, request, response, spider):
@@ -84,6 +148,10 @@ class WtoDownloaderMiddleware:
         # - return a Response object
         # - return a Request object
         # - or raise IgnoreRequest
+        started = request.meta.pop("wto_download_started", None)
+        if started is not None and self.crawler is not None:
+            stage = "render" if request.meta.get("playwright") else "download"
+            observe_stage(self.crawler, stage, time.perf_counter() - started, len(response.body))
         return response
 
     def process_exception(self, request, exception, spider):
@@ -98,3 +166,396 @@ class WtoDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class FileSpoolMiddleware:
+    """Spools document downloads to disk and caps the bytes in flight.
+
+    Requests with meta["spool"] get a SpoolFile fed from the bytes_received
+    signal, so the body is hashed while it streams and the item can carry a
+    file path instead of the bytes. New spooled downloads wait in
+    process_request while WTO_MAX_INFLIGHT_BYTES are already committed
+    (Content-Length when announced, bytes received otherwise).
+
+    Installed near the downloader (high order number) so it sees every attempt,
+    including ones RetryMiddleware turns into new requests.
+    """
+
+    def __init__(self, crawler, spool_dir=None, max_inflight_bytes=0):
+        self.crawler = crawler
+        self.spool_root = spool_dir or None
+        self.spool_dir = None
+        self.max_inflight_bytes = max_inflight_bytes
+        self.inflight_bytes = 0
+        self._reserved = {}  # id(request) -> bytes counted for that request
+        self._released = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = cls(
+            crawler,
+            spool_dir=crawler.settings.get("WTO_SPOOL_DIR"),
+            max_inflight_bytes=crawler.settings.getint("WTO_MAX_INFLIGHT_BYTES", 0),
+        )
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(s.headers_received, signal=signals.headers_received)
+        crawler.signals.connect(s.bytes_received, signal=signals.bytes_received)
+        return s
+
+    def spider_opened(self, spider):
+        if self.spool_root:
+            os.makedirs(self.spool_root, exist_ok=True)
+        self.spool_dir = tempfile.mkdtemp(prefix="wto-spool-", dir=self.spool_root)
+        spider.logger.info("Spooling document downloads to %s" % self.spool_dir)
+
+    def spider_closed(self, spider):
+        # Pipelines have closed by now; anything left is from failed/dropped items.
+        if self.spool_dir:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    async def process_request(self, request, spider):
+        if not request.meta.get("spool"):
+            return None
+        if self.max_inflight_bytes > 0:
+            while self.inflight_bytes >= self.max_inflight_bytes and self._reserved:
+                self.crawler.stats.inc_value("spool/budget_waits")
+                if self._released is None or self._released.is_set():
+                    self._released = asyncio.Event()
+                await self._released.wait()
+        self._reserved[id(request)] = 0
+        return None
+
+    def headers_received(self, headers, body_length, request, spider):
+        if not request.meta.get("spool"):
+            return
+        previous = request.meta.get("spool_file")
+        if previous is not None:
+            previous.discard()  # stale attempt of a retried request
+        request.meta["spool_file"] = SpoolFile(self.spool_dir)
+        if isinstance(body_length, int) and body_length > 0:  # may be UNKNOWN_LENGTH
+            self._reserve(request, body_length)
+
+    def bytes_received(self, data, request, spider):
+        spool = request.meta.get("spool_file") if request.meta.get("spool") else None
+        if spool is None:
+            return
+        spool.write(data)
+        if spool.size > self._reserved.get(id(request), 0):
+            self._reserve(request, spool.size)
+
+    def process_response(self, request, response, spider):
+        if not request.meta.get("spool"):
+            return response
+        self._release(request)
+        spool = request.meta.get("spool_file")
+        if spool is not None:
+            spool.close()
+            if not 200 <= response.status < 300 or response.headers.get("Content-Encoding"):
+                # Error pages (retried or dropped) never reach the pipeline, and an
+                # encoded spool holds the wrong bytes; the callback uses the body.
+                spool.discard()
+                request.meta["spool_file"] = None
+            else:
+                self.crawler.stats.inc_value("spool/files")
+                self.crawler.stats.inc_value("spool/bytes", spool.size)
+                observe_stage(self.crawler, "sha256", spool.hash_seconds, spool.size)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if request.meta.get("spool"):
+            self._release(request)
+            spool = request.meta.pop("spool_file", None)
+            if spool is not None:
+                spool.discard()
+        return None
+
+    def _reserve(self, request, total):
+        key = id(request)
+        self.inflight_bytes += total - self._reserved.get(key, 0)
+        self._reserved[key] = total
+        self.crawler.stats.max_value("spool/max_inflight_bytes", self.inflight_bytes)
+
+    def _release(self, request):
+        self.inflight_bytes -= self._reserved.pop(id(request), 0)
+        if self._released is not None:
+            self._released.set()
+
+
+class ItemByteBudgetMiddleware:
+    """Caps the bytes of downloaded documents that are not persisted yet.
+
+    A document's bytes (spool size or body length) count from its 2xx
+    response until WtoPipeline reports the item written, failed or skipped
+    (wto.signals.items_released), the item is dropped or errors, or its
+    callback fails; without a pipeline that reports, until item_scraped. New
+    document downloads (requests with meta["item"]) wait in process_request
+    while WTO_ITEM_BYTES_BUDGET is held, and resume as batches are written
+    (downloads already running when the budget fills still land, so the peak
+    can overshoot by about one round of concurrent downloads).
+    FileSpoolMiddleware's WTO_MAX_INFLIGHT_BYTES covers the download itself.
+
+    Stats: budget/held_bytes and budget/held_items (current),
+    budget/max_held_bytes (peak), budget/waits and budget/wait_seconds.
+    """
+
+    def __init__(self, crawler, budget, pipeline_releases=True):
+        self.crawler = crawler
+        self.budget = budget
+        self.pipeline_releases = pipeline_releases
+        self.held = 0
+        self.held_items = 0
+        self._holds = {}  # item url -> sizes held for it (one per response)
+        self._released = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        budget = crawler.settings.getint("WTO_ITEM_BYTES_BUDGET", 0)
+        if budget <= 0:
+            raise NotConfigured
+        pipelines = build_component_list(crawler.settings.getwithbase("ITEM_PIPELINES"))
+        s = cls(
+            crawler,
+            budget,
+            pipeline_releases=any(getattr(load_object(p), "releases_item_bytes", False) for p in pipelines),
+        )
+        if s.pipeline_releases:
+            crawler.signals.connect(s.items_released, signal=wto_signals.items_released)
+        else:
+            crawler.signals.connect(s.item_done, signal=signals.item_scraped)
+        crawler.signals.connect(s.item_done, signal=signals.item_dropped)
+        crawler.signals.connect(s.item_done, signal=signals.item_error)
+        crawler.signals.connect(s.spider_error, signal=signals.spider_error)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    async def process_request(self, request, spider):
+        if request.meta.get("item") is None or self.held < self.budget:
+            return None
+        self.crawler.stats.inc_value("budget/waits")
+        started = time.monotonic()
+        while self.held >= self.budget and self._holds:
+            if self._released is None or self._released.is_set():
+                self._released = asyncio.Event()
+            await self._released.wait()
+        self.crawler.stats.inc_value("budget/wait_seconds", round(time.monotonic() - started, 3))
+        return None
+
+    def process_response(self, request, response, spider):
+        item = request.meta.get("item")
+        if item is not None and 200 <= response.status < 300:
+            spool = request.meta.get("spool_file")
+            self._hold(item.get("url"), spool.size if spool is not None else len(response.body))
+        return response
+
+    def items_released(self, urls):
+        for url in urls:
+            self._release(url)
+
+    def item_done(self, item, spider, **kwargs):
+        self._release(item.get("url"))
+
+    def spider_error(self, failure, response, spider):
+        item = response.meta.get("item") if response is not None else None
+        if item is not None:
+            self._release(item.get("url"))
+
+    def spider_closed(self, spider):
+        if self._holds:
+            spider.logger.info(
+                "%d item(s) (%d bytes) were never reported persisted" % (self.held_items, self.held)
+            )
+
+    def _hold(self, url, size):
+        self._holds.setdefault(url, []).append(size)
+        self.held += size
+        self.held_items += 1
+        self._update_stats()
+
+    def _release(self, url):
+        sizes = self._holds.get(url)
+        if not sizes:
+            return
+        self.held -= sizes.pop()
+        self.held_items -= 1
+        if not sizes:
+            del self._holds[url]
+        self._update_stats()
+        if self._released is not None:
+            self._released.set()
+
+    def _update_stats(self):
+        stats = self.crawler.stats
+        stats.set_value("budget/held_bytes", self.held)
+        stats.set_value("budget/held_items", self.held_items)
+        stats.max_value("budget/max_held_bytes", self.held)
+
+
+class ConcurrencyController:
+    """AIMD controller for one request class (concurrency and delay of its slot).
+
+    Concurrency grows by one after a full window of healthy responses (one
+    per slot of concurrency, all under target_latency) and is halved on a
+    backoff signal (429/5xx, timeouts, latency far over target), at most once
+    per cooldown so one burst of errors counts once. The delay moves the
+    other way: doubled on backoff, eased by a quarter on growth.
+    """
+
+    def __init__(self, name, concurrency, delay, min_concurrency=1, max_concurrency=8,
+                 target_latency=5.0, min_delay=0.0, max_delay=30.0, cooldown=None):
+        self.name = name
+        self.min_concurrency = max(1, int(min_concurrency))
+        self.max_concurrency = max(self.min_concurrency, int(max_concurrency))
+        self.concurrency = min(max(int(concurrency), self.min_concurrency), self.max_concurrency)
+        self.min_delay = float(min_delay)
+        self.max_delay = float(max_delay)
+        self.delay = min(max(float(delay), self.min_delay), self.max_delay)
+        self.target_latency = float(target_latency)
+        self.cooldown = float(cooldown if cooldown is not None else target_latency)
+        self._healthy = 0
+        self._last_backoff = float("-inf")
+
+    def on_response(self, latency):
+        """Returns "increase", "backoff" or None."""
+        if latency is None or latency <= self.target_latency:
+            self._healthy += 1
+            if self._healthy >= self.concurrency:
+                self._healthy = 0
+                if self.concurrency < self.max_concurrency or self.delay > self.min_delay:
+                    self.concurrency = min(self.concurrency + 1, self.max_concurrency)
+                    self.delay = max(self.min_delay, self.delay * 0.75)
+                    return "increase"
+            return None
+        self._healthy = 0
+        if latency > 2 * self.target_latency:
+            return self.on_error()
+        return None
+
+    def on_error(self):
+        """Multiplicative decrease; returns "backoff" unless still cooling down."""
+        self._healthy = 0
+        now = time.monotonic()
+        if now - self._last_backoff < self.cooldown:
+            return None
+        self._last_backoff = now
+        self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+        self.delay = min(self.max_delay, max(self.delay * 2, self.min_delay, 0.25))
+        return "backoff"
+
+
+class AdaptiveConcurrencyMiddleware:
+    """Latency/error-aware throttle with one controller per request class.
+
+    Document files (meta download_slot == WTO_FILES_DOWNLOAD_SLOT) are the
+    "files" class and everything else (browser-rendered search pages) is
+    "search"; each has its own bounds in WTO_ADAPTIVE_CONCURRENCY. A
+    controller starts from its slot's static settings (DOWNLOAD_SLOTS,
+    CONCURRENT_REQUESTS_PER_DOMAIN, DOWNLOAD_DELAY) and writes its decisions
+    back to the live downloader slot and to per-slot settings, so slots
+    recreated after idling keep them.
+
+    Stats: throttle/<class>/{concurrency,delay,increases,backoffs,max_concurrency}
+    and throttle/<class>/backoff/<reason>.
+    """
+
+    def __init__(self, crawler, classes, backoff_http_codes, files_slot=None):
+        self.crawler = crawler
+        self.classes = classes
+        self.backoff_http_codes = set(backoff_http_codes)
+        self.files_slot = files_slot
+        self.controllers = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("WTO_ADAPTIVE_CONCURRENCY_ENABLED"):
+            raise NotConfigured
+        return cls(
+            crawler,
+            classes=settings.getdict("WTO_ADAPTIVE_CONCURRENCY"),
+            backoff_http_codes=[int(c) for c in settings.getlist("WTO_BACKOFF_HTTP_CODES")],
+            files_slot=settings.get("WTO_FILES_DOWNLOAD_SLOT"),
+        )
+
+    def request_class(self, request):
+        if self.files_slot and request.meta.get("download_slot") == self.files_slot:
+            return "files"
+        return "search"
+
+    def process_request(self, request, spider):
+        controller = self._controller(request)
+        if controller is not None:
+            self._apply(controller, request)
+        return None
+
+    def process_response(self, request, response, spider):
+        if "cached" in response.flags:
+            return response  # replayed from HTTPCACHE: says nothing about the server
+        controller = self._controller(request)
+        if controller is None:
+            return response
+        if response.status in self.backoff_http_codes:
+            decision = controller.on_error()
+            reason = f"http_{response.status}"
+        else:
+            decision = controller.on_response(request.meta.get("download_latency"))
+            reason = "latency"
+        self._record(controller, request, decision, reason)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if isinstance(exception, IgnoreRequest):
+            return None
+        controller = self._controller(request)
+        if controller is not None:
+            reason = "timeout" if "timeout" in type(exception).__name__.lower() else "error"
+            self._record(controller, request, controller.on_error(), reason)
+        return None
+
+    def _controller(self, request):
+        name = self.request_class(request)
+        controller = self.controllers.get(name)
+        if controller is None and name in self.classes:
+            downloader = self.crawler.engine.downloader
+            _, slot = downloader._get_slot(request)
+            controller = self.controllers[name] = ConcurrencyController(
+                name, slot.concurrency, slot.delay, **self.classes[name]
+            )
+            self._set_stats(controller)
+        return controller
+
+    def _apply(self, controller, request):
+        downloader = self.crawler.engine.downloader
+        key = downloader.get_slot_key(request)
+        slot = downloader.slots.get(key)
+        if slot is not None:
+            slot.concurrency = controller.concurrency
+            slot.delay = controller.delay
+        downloader.per_slot_settings.setdefault(key, {}).update(
+            concurrency=controller.concurrency, delay=controller.delay
+        )
+
+    def _record(self, controller, request, decision, reason):
+        if decision is None:
+            return
+        stats = self.crawler.stats
+        if decision == "backoff":
+            stats.inc_value(f"throttle/{controller.name}/backoffs")
+            stats.inc_value(f"throttle/{controller.name}/backoff/{reason}")
+        else:
+            stats.inc_value(f"throttle/{controller.name}/increases")
+        self._set_stats(controller)
+        self._apply(controller, request)
+        logger = self.crawler.spider.logger if self.crawler.spider is not None else None
+        if logger is not None:
+            logger.log(
+                logging.INFO if decision == "backoff" else logging.DEBUG,
+                "Throttle %s: %s (%s) -> concurrency=%d delay=%.2fs",
+                controller.name, decision, reason, controller.concurrency, controller.delay,
+            )
+
+    def _set_stats(self, controller):
+        stats = self.crawler.stats
+        stats.set_value(f"throttle/{controller.name}/concurrency", controller.concurrency)
+        stats.set_value(f"throttle/{controller.name}/delay", round(controller.delay, 3))
+        stats.max_value(f"throttle/{controller.name}/max_concurrency", controller.concurrency)
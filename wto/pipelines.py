@@ -3,8 +3,29 @@
 Upsert pipeline with:
 - strict UUID coercion (avoids invalid UUID errors),
 - one transaction for Document + Blob (so they succeed/fail together),
+- buffered writes: items are collected into batches of WTO_DB_BATCH_SIZE
+  (or whatever arrived within WTO_DB_BATCH_INTERVAL seconds) and written
+  with one multi-row upsert per table in a single transaction,
+- non-blocking writes: batches go through the async engine (psycopg 3) on
+  the crawler's asyncio loop, at most WTO_DB_WRITE_CONCURRENCY at a time;
+  process_item only waits when every write slot is busy (backpressure),
+- per-item fallback when a batch fails, so one bad row only costs itself;
+  items that still fail go to a local dead-letter spool (WTO_DEADLETTER_DIR,
+  wto.deadletter) with their file, for `scrapy replay_deadletter`,
+- 304 "not modified" items only refresh the document timestamp (no blob write),
+- spooled bodies (item["source_path"]) are read from disk once, at write time;
+  batches also flush early once WTO_DB_BATCH_MAX_BYTES of bodies are buffered,
+- blobs compressed with WTO_BLOB_CODEC (zstd/zlib) in a worker thread; the
+  codec and original size are stored next to source_file,
+- or, with WTO_BLOB_STORE_DIR set, files written once per SHA-256 to the
+  filesystem tier (wto.blobstore) and only hash/size/content type stored,
+- documents_stored signal after each commit (TextExtractionPipeline below
+  extracts PDF text from there, in a process pool, into document_texts),
+- items_released signal once each item is written, failed or skipped, so
+  ItemByteBudgetMiddleware can let more document downloads through,
 - detailed exception logging,
-- optional schema bootstrap (create_all) for first run safety.
+- versioned schema check at open: create_all + column patches only run when
+  wto_schema_version is behind (WTO_DB_MIGRATE = False only checks and warns).
 
 If you still see db/save_errors > 0, the log will now print the exact
 constraint/typing error from PostgreSQL so we can fix fast.
@@ -12,35 +33,131 @@ constraint/typing error from PostgreSQL so we can fix fast.
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
+import multiprocessing
+import time
 import uuid
-from typing import Any, Dict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, DataError
-from sqlalchemy import select
+from scrapy.exceptions import NotConfigured
+from sqlalchemy import func, select, update
 from sqlalchemy.dialects.postgresql import insert
 
-from wto.db.session import SessionLocal, engine
-from wto.db.models import Document, ScraperBlobStore, Base
+from wto.blobstore import FilesystemBlobStore
+from wto.compression import compress, resolve_codec
+from wto.deadletter import DeadLetterSpool
+from wto.db.session import get_async_engine, get_async_sessionmaker
+from wto.db.models import Document, DocumentText, ScraperBlobStore
+from wto.db.schema import SCHEMA_VERSION, ensure_schema, schema_version
+from wto import signals as wto_signals
+from wto.middlewares import observe_stage
+from wto import textextract
+from wto.spool import discard_spooled, read_spooled, retain_spooled
 
 logger = logging.getLogger(__name__)
 
+# Columns refreshed when a document row already exists (document_id is the key).
+DOCUMENT_UPDATE_COLUMNS = ("url", "name", "data", "timestamp", "version", "scraper", "symbol", "doc_date", "doc_type")
+BLOB_UPDATE_COLUMNS = ("file_content_type", "source_file", "codec", "original_size", "sha256")
+
 
 class WtoPipeline:
-    def open_spider(self, spider):
-        # Safety: idempotent schema bootstrap (OK when tables already exist)
+    # Sends items_released once an item is written, failed or skipped (ItemByteBudgetMiddleware)
+    releases_item_bytes = True
+
+    def __init__(
+        self,
+        batch_size: int = 50,
+        batch_interval: float = 2.0,
+        batch_max_bytes: int = 0,
+        write_concurrency: int = 2,
+        blob_codec: Optional[str] = None,
+        blob_level: Optional[int] = None,
+        migrate: bool = True,
+        deadletter_dir: Optional[str] = None,
+        blob_store_dir: Optional[str] = None,
+        crawler=None,
+    ):
+        self.crawler = crawler
+        self.blob_store = FilesystemBlobStore(blob_store_dir) if blob_store_dir else None
+        self.migrate = migrate
+        self.deadletter = DeadLetterSpool(deadletter_dir) if deadletter_dir else None
+        self.batch_size = max(1, int(batch_size))
+        self.batch_max_bytes = int(batch_max_bytes)
+        self.write_concurrency = max(1, int(write_concurrency))
+        self.blob_codec = resolve_codec(blob_codec)
+        self.blob_level = blob_level
+        # why: a zero interval would leave a half-full batch waiting for close_spider
+        self.batch_interval = max(0.1, float(batch_interval))
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_bytes = 0
+        self._buffer_started: Optional[float] = None
+        self._flush_loop: Optional[asyncio.Task] = None
+        self._write_slots: Optional[asyncio.Semaphore] = None
+        self._writes: Set[asyncio.Task] = set()
+        self.spider = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            batch_size=crawler.settings.getint("WTO_DB_BATCH_SIZE", 50),
+            batch_interval=crawler.settings.getfloat("WTO_DB_BATCH_INTERVAL", 2.0),
+            batch_max_bytes=crawler.settings.getint("WTO_DB_BATCH_MAX_BYTES", 0),
+            write_concurrency=crawler.settings.getint("WTO_DB_WRITE_CONCURRENCY", 2),
+            blob_codec=crawler.settings.get("WTO_BLOB_CODEC"),
+            blob_level=crawler.settings.getint("WTO_BLOB_COMPRESSION_LEVEL") or None,
+            migrate=crawler.settings.getbool("WTO_DB_MIGRATE", True),
+            deadletter_dir=crawler.settings.get("WTO_DEADLETTER_DIR"),
+            blob_store_dir=crawler.settings.get("WTO_BLOB_STORE_DIR"),
+            crawler=crawler,
+        )
+
+    async def open_spider(self, spider):
+        self.spider = spider
+        # One SELECT when the schema is current; migrates (once) when it is behind
         try:
-            Base.metadata.create_all(bind=engine)
-            spider.logger.info("DB schema ensured (create_all).")
+            async with get_async_engine().begin() as conn:
+                if self.migrate:
+                    if await conn.run_sync(ensure_schema):
+                        spider.logger.info("DB schema migrated to version %d.", SCHEMA_VERSION)
+                else:
+                    current = await conn.run_sync(schema_version)
+                    if (current or 0) < SCHEMA_VERSION:
+                        spider.logger.warning(
+                            "DB schema is at version %s, expected %d: run `scrapy migrate`.", current, SCHEMA_VERSION
+                        )
         except Exception as exc:  # why: aids first-run, ignore if restricted env
-            spider.logger.warning("create_all skipped/failed: %s", exc)
+            spider.logger.warning("Schema check skipped/failed: %s", exc)
 
-        spider.logger.info("SQLAlchemy pipeline ready (per-item DB sessions).")
+        self._write_slots = asyncio.Semaphore(self.write_concurrency)
+        self._flush_loop = asyncio.ensure_future(self._flush_periodically())
+        spider.logger.info(
+            "SQLAlchemy pipeline ready (batch_size=%d, batch_interval=%.1fs, write slots=%d, blobs: %s).",
+            self.batch_size,
+            self.batch_interval,
+            self.write_concurrency,
+            f"files in {self.blob_store.root}" if self.blob_store is not None else f"{self.blob_codec} in Postgres",
+        )
 
-    def close_spider(self, spider):
+    async def close_spider(self, spider):
+        try:
+            if self._flush_loop is not None:
+                self._flush_loop.cancel()
+            await self.flush()
+            if self._writes:
+                await asyncio.gather(*self._writes, return_exceptions=True)
+        finally:
+            # pipelines close in parallel; TextExtractionPipeline waits for this
+            if self.crawler is not None:
+                self.crawler.signals.send_catch_log(signal=wto_signals.writes_drained)
         spider.logger.info("SQLAlchemy pipeline closed.")
 
-    #utils 
+    #utils
     def _coerce_uuid(self, value: Any) -> uuid.UUID:
         if isinstance(value, uuid.UUID):
             return value
@@ -57,34 +174,99 @@ class WtoPipeline:
             # Re-raise as ValueError for consistent handling upstream
             raise ValueError("badly formed UUID or hex digest for UUID derivation")
 
-    # main pipeline 
-    def process_item(self, item, spider):
-        required = ("source_file", "file_content_type", "name", "url", "doc_uuid")
-        if not all(k in item and item[k] for k in required):
-            spider.logger.warning("Skipping item: missing required fields %s", required)
+    def _inc_stat(self, key: str, count: int = 1) -> None:
+        if self.spider is not None and hasattr(self.spider, "crawler"):
+            self.spider.crawler.stats.inc_value(key, count)
+
+    def _count_blob_bytes(self, batch: List[Dict[str, Any]]) -> None:
+        sizes = [p["stored_sizes"] for p in batch if p.get("stored_sizes")]
+        if sizes:
+            self._inc_stat("db/blob_bytes_raw", sum(raw for raw, _ in sizes))
+            self._inc_stat("db/blob_bytes_stored", sum(stored for _, stored in sizes))
+
+    def _announce_stored(self, batch: List[Dict[str, Any]]) -> None:
+        """Send documents_stored for the committed upserts (before spool files are discarded)."""
+        documents = [
+            {
+                "document_id": p["document_id"],
+                "url": p["url"],
+                "file_content_type": p["blob"]["file_content_type"],
+                "source_path": p.get("source_path"),
+                "body": p["blob"]["source_file"],
+            }
+            for p in batch
+            if p["kind"] == "upsert" and p.get("document_id")
+        ]
+        if documents and self.crawler is not None:
+            self.crawler.signals.send_catch_log(signal=wto_signals.documents_stored, documents=documents)
+
+    def _release_items(self, urls: List[str]) -> None:
+        if self.crawler is not None:
+            self.crawler.signals.send_catch_log(signal=wto_signals.items_released, urls=urls)
+
+    # main pipeline
+    async def process_item(self, item, spider):
+        if item.get("not_modified"):
+            if not item.get("doc_uuid"):
+                spider.logger.warning("Skipping not-modified item without doc_uuid: %s", item.get("url"))
+                return item
+            await self._enqueue({
+                "kind": "touch",
+                "name": item.get("name"),
+                "url": str(item.get("url") or ""),
+                "document_id": str(item["doc_uuid"]),
+                "timestamp": item.get("timestamp"),
+            })
+            return item
+
+        required = ("file_content_type", "name", "url", "doc_uuid")
+        if not all(k in item and item[k] for k in required) or not (
+            item.get("source_file") or item.get("source_path")
+        ):
+            spider.logger.warning("Skipping item: missing required fields %s", required + ("source_file",))
+            discard_spooled(item.get("source_path"))
+            self._release_items([item.get("url")])
             return item
-        if not isinstance(item["source_file"], (bytes, bytearray, memoryview)):
+        if not item.get("source_path") and not isinstance(item["source_file"], (bytes, bytearray, memoryview)):
             spider.logger.warning("Skipping item: source_file not bytes-like")
+            self._release_items([item.get("url")])
             return item
 
-        session = SessionLocal()
         try:
-            doc_id = self._coerce_uuid(item["doc_uuid"])  # strict UUID type
-
-            incoming_url = str(item["url"]) if item.get("url") else ""
+            pending = self._pending_from_item(item, spider)
+        except Exception as exc:
+            logger.exception("Unexpected DB error for %s: %s", item.get("url"), exc)
+            self._inc_stat("db/save_errors")
+            discard_spooled(item.get("source_path"))
+            self._release_items([item.get("url")])
+            return item
 
-            # Application-level dedupe by URL: if URL exists, reuse its document_id
-            try:
-                existing_id = session.execute(
-                    select(Document.document_id).where(Document.url == incoming_url)
-                ).scalar_one_or_none()
-            except Exception:
-                existing_id = None
+        await self._enqueue(pending)
+        return item
 
-            effective_doc_id = str(existing_id) if existing_id else str(doc_id)
+    async def _enqueue(self, pending: Dict[str, Any]) -> None:
+        if not self._buffer:
+            self._buffer_started = time.monotonic()
+        self._buffer.append(pending)
+        self._buffer_bytes += pending.get("size") or 0
+        if len(self._buffer) >= self.batch_size or (
+            self.batch_max_bytes and self._buffer_bytes >= self.batch_max_bytes
+        ):
+            await self.flush()
 
-            doc_data: Dict[str, Any] = {
-                "document_id": effective_doc_id,
+    def _pending_from_item(self, item, spider) -> Dict[str, Any]:
+        """Build the document and blob rows for one item (document_id resolved at flush)."""
+        doc_id = self._coerce_uuid(item["doc_uuid"])  # strict UUID type
+        incoming_url = str(item["url"]) if item.get("url") else ""
+        source_path = item.get("source_path")
+        return {
+            "kind": "upsert",
+            "name": item.get("name"),
+            "url": incoming_url,
+            "candidate_id": str(doc_id),
+            "source_path": source_path,
+            "size": item.get("source_size") or 0,
+            "doc": {
                 "url": incoming_url,
                 "name": item.get("name") or "",
                 "path": item.get("path"),
@@ -92,69 +274,379 @@ class WtoPipeline:
                 "timestamp": item.get("timestamp"),
                 "version": item.get("version") or "1.0",
                 "data": item.get("data") or {},
-            }
+                "symbol": item.get("symbol"),
+                "doc_date": item.get("doc_date"),
+                "doc_type": item.get("doc_type"),
+            },
+            # source_file stays None for spooled items; read in write_batch
+            "blob": {
+                "file_content_type": item["file_content_type"],
+                "source_file": None if source_path else bytes(item["source_file"]),
+                "sha256": (item.get("data") or {}).get("sha256"),
+            },
+        }
 
-            # Implicit transaction begins on first execute; no explicit begin needed
-
-            upsert_doc = (
-                insert(Document)
-                .values(doc_data)
-                .on_conflict_do_update(
-                    index_elements=[Document.document_id],
-                    set_={
-                        "url": doc_data["url"],
-                        "name": doc_data["name"],
-                        "data": doc_data["data"],
-                        "timestamp": doc_data["timestamp"],
-                        "version": doc_data["version"],
-                        "scraper": doc_data["scraper"],
-                    },
-                )
-            )
-            session.execute(upsert_doc)
-
-            upsert_blob = (
-                insert(ScraperBlobStore)
-                .values(
-                    {
-                        "document_id": effective_doc_id,
-                        "file_content_type": item["file_content_type"],
-                        "source_file": bytes(item["source_file"]),
-                    }
-                )
-                .on_conflict_do_update(
-                    index_elements=[ScraperBlobStore.document_id],
-                    set_={
-                        "file_content_type": item["file_content_type"],
-                        "source_file": bytes(item["source_file"]),
-                    },
-                )
+    def _encode_blob(self, pending: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        """source_file/codec/original_size/sha256 for one blob row, plus compression or file write time (worker thread)."""
+        raw = pending["blob"]["source_file"]
+        sha256 = pending["blob"].get("sha256")
+        if self.blob_store is not None:
+            started = time.perf_counter()
+            if raw is None:
+                sha256, size, created = self.blob_store.put_file(pending["source_path"], sha256)
+            else:
+                sha256, size, created = self.blob_store.put(raw, sha256)
+            pending["blob_file_created"] = created
+            encoded = {"source_file": None, "codec": None, "original_size": size, "sha256": sha256}
+            return encoded, time.perf_counter() - started
+        if raw is None:
+            raw = read_spooled(pending["source_path"])
+        started = time.perf_counter()
+        codec, payload = compress(raw, self.blob_codec, self.blob_level)
+        seconds = time.perf_counter() - started
+        sha256 = sha256 or hashlib.sha256(raw).hexdigest()
+        return {"source_file": payload, "codec": codec, "original_size": len(raw), "sha256": sha256}, seconds
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.batch_interval)
+            if self._buffer and time.monotonic() - (self._buffer_started or 0) >= self.batch_interval:
+                await self.flush()
+
+    async def flush(self) -> None:
+        """Hand everything buffered so far to a write slot; waits only while all slots are busy."""
+        if not self._buffer:
+            return
+        # Take the batch only once a slot is ours, so a cancelled wait loses nothing
+        await self._write_slots.acquire()
+        if not self._buffer:
+            self._write_slots.release()
+            return
+        batch, self._buffer = self._buffer, []
+        self._buffer_started = None
+        self._buffer_bytes = 0
+
+        write = asyncio.ensure_future(self._write(batch))
+        self._writes.add(write)
+        write.add_done_callback(self._writes.discard)
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        session = get_async_sessionmaker()()
+        started = time.perf_counter()
+        ok = False
+        try:
+            await self.write_batch(session, batch)
+            executed = time.perf_counter()
+            await session.commit()
+            ok = True
+            if self.crawler is not None:
+                nbytes = sum(p.get("size") or 0 for p in batch)
+                observe_stage(self.crawler, "db_upsert", executed - started, nbytes)
+                observe_stage(self.crawler, "db_commit", time.perf_counter() - executed)
+            touched = sum(1 for p in batch if p["kind"] == "touch")
+            self._inc_stat("db/batches")
+            if len(batch) - touched:
+                self._inc_stat("db/saved_items", len(batch) - touched)
+            if touched:
+                self._inc_stat("db/touched_items", touched)
+            self._count_blob_bytes(batch)
+            self._announce_stored(batch)
+            logger.info("DB OK: batch of %d item(s), %d unchanged", len(batch), touched)
+        except Exception as exc:
+            await session.rollback()
+            self._inc_stat("db/batch_fallbacks")
+            logger.warning(
+                "Batch upsert of %d item(s) failed (%s); retrying item by item.", len(batch), exc
             )
-            session.execute(upsert_blob)
-
-            session.commit()
-            spider.logger.info("DB OK: %s", item.get("name"))
-            if hasattr(spider, "crawler"):
-                spider.crawler.stats.inc_value("db/saved_items")
-
-        except (IntegrityError, DataError) as exc:  # NOT NULL, FK, UUID, etc.
-            session.rollback()
-            logger.exception("DB constraint error for %s: %s", item.get("url"), exc)
-            if hasattr(spider, "crawler"):
-                spider.crawler.stats.inc_value("db/save_errors")
-        except SQLAlchemyError as exc:
-            session.rollback()
-            logger.exception("SQLAlchemy insert failed for %s: %s", item.get("url"), exc)
-            if hasattr(spider, "crawler"):
-                spider.crawler.stats.inc_value("db/save_errors")
-        except Exception as exc:  # last resort
-            session.rollback()
-            logger.exception("Unexpected DB error for %s: %s", item.get("url"), exc)
-            if hasattr(spider, "crawler"):
-                spider.crawler.stats.inc_value("db/save_errors")
+            await self._write_one_by_one(session, batch)
         finally:
             try:
-                session.close()
+                await session.close()
             except Exception:
                 pass
+            for pending in batch:
+                discard_spooled(pending.get("source_path"))
+            self._release_items([p["url"] for p in batch])
+            self._write_slots.release()
+            if self.crawler is not None:
+                self.crawler.signals.send_catch_log(
+                    signal=wto_signals.db_batch_written,
+                    items=len(batch),
+                    nbytes=sum(p.get("size") or 0 for p in batch),
+                    seconds=time.perf_counter() - started,
+                    ok=ok,
+                )
+
+    async def _write_one_by_one(self, session, batch: List[Dict[str, Any]]) -> None:
+        """Fallback path: one transaction per item so the bad row is isolated and reported."""
+        for pending in batch:
+            url = pending["url"]
+            try:
+                await self.write_batch(session, [pending])
+                await session.commit()
+                spider_logger = self.spider.logger if self.spider is not None else logger
+                spider_logger.info("DB OK: %s", pending.get("name"))
+                self._inc_stat("db/touched_items" if pending["kind"] == "touch" else "db/saved_items")
+                self._count_blob_bytes([pending])
+                self._announce_stored([pending])
+            except (IntegrityError, DataError) as exc:  # NOT NULL, FK, UUID, etc.
+                await session.rollback()
+                logger.exception("DB constraint error for %s: %s", url, exc)
+                self._inc_stat("db/save_errors")
+                await self._dead_letter(pending, exc)
+            except SQLAlchemyError as exc:
+                await session.rollback()
+                logger.exception("SQLAlchemy insert failed for %s: %s", url, exc)
+                self._inc_stat("db/save_errors")
+                await self._dead_letter(pending, exc)
+            except Exception as exc:  # last resort
+                await session.rollback()
+                logger.exception("Unexpected DB error for %s: %s", url, exc)
+                self._inc_stat("db/save_errors")
+                await self._dead_letter(pending, exc)
+
+    async def _dead_letter(self, pending: Dict[str, Any], exc: Exception) -> None:
+        """Keep a failed item (and its file) in the dead-letter spool instead of dropping it."""
+        if self.deadletter is None:
+            return
+        try:
+            nbytes = await asyncio.to_thread(self.deadletter.append, pending, f"{type(exc).__name__}: {exc}")
+        except Exception as spool_exc:
+            logger.exception("Dead-letter spool write failed for %s: %s", pending.get("url"), spool_exc)
+            return
+        self._inc_stat("db/deadlettered")
+        self._inc_stat("db/deadletter_bytes", nbytes)
+
+    async def write_batch(self, session, batch: List[Dict[str, Any]]) -> None:
+        """Upsert documents then blobs for ``batch`` inside the session's transaction (also replay_deadletter)."""
+        touches = [p for p in batch if p["kind"] == "touch"]
+        if touches:
+            # ORM bulk UPDATE by primary key (one executemany)
+            await session.execute(
+                update(Document),
+                [{"document_id": p["document_id"], "timestamp": p["timestamp"]} for p in touches],
+            )
+        batch = [p for p in batch if p["kind"] == "upsert"]
+        if not batch:
+            return
+
+        # Application-level dedupe by URL: if URL exists, reuse its document_id
+        urls = {p["url"] for p in batch}
+        existing = dict(
+            (
+                await session.execute(
+                    select(Document.url, Document.document_id).where(Document.url.in_(urls))
+                )
+            ).all()
+        )
+
+        # Postgres rejects a multi-row upsert touching the same key twice, so keep
+        # the last row per document_id (same outcome as sequential upserts).
+        rows: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        for pending in batch:
+            url = pending["doc"]["url"]
+            effective_doc_id = str(existing[url]) if url in existing else pending["candidate_id"]
+            existing.setdefault(url, effective_doc_id)
+            pending["document_id"] = effective_doc_id
+            doc_row = dict(pending["doc"], document_id=effective_doc_id)
+            blob_row = dict(pending["blob"], document_id=effective_doc_id)
+            # spool read + compression (or the file write) off the event loop
+            encoded, seconds = await asyncio.to_thread(self._encode_blob, pending)
+            blob_row.update(encoded)
+            if self.blob_store is not None:
+                if self.crawler is not None:
+                    observe_stage(self.crawler, "blob_file", seconds, encoded["original_size"])
+                if pending["blob_file_created"]:
+                    self._inc_stat("blobstore/files_written")
+                    self._inc_stat("blobstore/bytes_written", encoded["original_size"])
+                else:
+                    self._inc_stat("blobstore/files_deduplicated")
+            elif self.crawler is not None and encoded["codec"] != "identity":
+                observe_stage(self.crawler, "compress", seconds, encoded["original_size"])
+            pending["stored_sizes"] = (encoded["original_size"], len(encoded["source_file"] or b""))
+            rows[effective_doc_id] = (doc_row, blob_row)
+
+        doc_rows = [doc for doc, _ in rows.values()]
+        blob_rows = [blob for _, blob in rows.values()]
+
+        upsert_doc = insert(Document).values(doc_rows)
+        upsert_doc = upsert_doc.on_conflict_do_update(
+            index_elements=[Document.document_id],
+            set_={col: upsert_doc.excluded[col] for col in DOCUMENT_UPDATE_COLUMNS},
+        )
+        await session.execute(upsert_doc)
+
+        upsert_blob = insert(ScraperBlobStore).values(blob_rows)
+        upsert_blob = upsert_blob.on_conflict_do_update(
+            index_elements=[ScraperBlobStore.document_id],
+            set_={col: upsert_blob.excluded[col] for col in BLOB_UPDATE_COLUMNS},
+        )
+        await session.execute(upsert_blob)
+
+
+class TextExtractionPipeline:
+    """
+    Extracts PDF text into document_texts (full-text indexed) after WtoPipeline
+    has committed the document.
+
+    Documents arrive through the documents_stored signal, so the text row can
+    reference the committed document_id. Extraction runs in a process pool of
+    WTO_TEXT_WORKERS (pypdf is CPU-bound and would block the reactor); spool
+    files are retained until their worker has read them. process_item waits
+    while WTO_TEXT_QUEUE_SIZE documents are queued or extracting, which slows
+    the item flow (and, through Scrapy's scraper limits, downloads) instead
+    of letting the backlog grow without bound.
+
+    Scrapy closes pipelines concurrently, so close_spider waits for
+    WtoPipeline's writes_drained before draining the queue; documents stored
+    after that (none, normally) are counted as text/skipped_closed.
+    """
+
+    def __init__(self, crawler, workers: int = 2, queue_size: int = 32, max_chars: int = 0):
+        self.crawler = crawler
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+        self.max_chars = int(max_chars)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumers: List[asyncio.Task] = []
+        self._backlog = 0
+        self._room = asyncio.Event()
+        self._writes_drained = asyncio.Event()
+        self._closed = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("WTO_TEXT_EXTRACTION_ENABLED"):
+            raise NotConfigured
+        if textextract.pypdf is None:
+            raise NotConfigured("pypdf is not installed; PDF text extraction disabled")
+        pipe = cls(
+            crawler,
+            workers=crawler.settings.getint("WTO_TEXT_WORKERS", 2),
+            queue_size=crawler.settings.getint("WTO_TEXT_QUEUE_SIZE", 32),
+            max_chars=crawler.settings.getint("WTO_TEXT_MAX_CHARS", 0),
+        )
+        crawler.signals.connect(pipe.documents_stored, signal=wto_signals.documents_stored)
+        crawler.signals.connect(pipe._writes_drained.set, signal=wto_signals.writes_drained)
+        return pipe
+
+    async def open_spider(self, spider):
+        # spawn: forking a process that runs the reactor and DB pool threads is unsafe
+        self._pool = self._new_pool()
+        self._queue = asyncio.Queue()
+        self._room.set()
+        self._consumers = [asyncio.ensure_future(self._consume()) for _ in range(self.workers)]
+        spider.logger.info(
+            "Text extraction ready (%d worker process(es), queue of %d).", self.workers, self.queue_size
+        )
+
+    async def close_spider(self, spider):
+        if self._has_writer():
+            await self._writes_drained.wait()
+        if self._queue is not None:
+            await self._queue.join()
+        self._closed = True
+        for task in self._consumers:
+            task.cancel()
+        if self._pool is not None:
+            await asyncio.to_thread(self._pool.shutdown)
+        spider.logger.info("Text extraction closed.")
+
+    async def process_item(self, item, spider):
+        while self._backlog >= self.queue_size:
+            self.crawler.stats.inc_value("text/backpressure_waits")
+            self._room.clear()
+            await self._room.wait()
         return item
+
+    def documents_stored(self, documents):
+        if self._queue is None:
+            return
+        for doc in documents:
+            if not textextract.is_pdf(doc.get("file_content_type"), doc.get("url")):
+                continue
+            if self._closed:
+                # consumers are gone; the next run's extraction can pick these up
+                self.crawler.stats.inc_value("text/skipped_closed")
+                logger.warning("Text extraction already closed; skipping %s", doc.get("url"))
+                continue
+            if doc.get("source_path"):
+                retain_spooled(doc["source_path"])
+            self._queue.put_nowait(doc)
+            self._backlog += 1
+        self.crawler.stats.max_value("text/max_backlog", self._backlog)
+
+    def _has_writer(self) -> bool:
+        engine = getattr(self.crawler, "engine", None)
+        itemproc = getattr(getattr(engine, "scraper", None), "itemproc", None)
+        return any(isinstance(pipe, WtoPipeline) for pipe in getattr(itemproc, "middlewares", ()))
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def _consume(self) -> None:
+        while True:
+            doc = await self._queue.get()
+            try:
+                await self._extract(doc)
+            except Exception as exc:  # keep the consumer alive
+                logger.exception("Text extraction failed for %s: %s", doc.get("url"), exc)
+            finally:
+                self._queue.task_done()
+                self._backlog -= 1
+                self._room.set()
+
+    async def _extract(self, doc: Dict[str, Any]) -> None:
+        source = doc.get("source_path") or doc.get("body")
+        text, pages, error = None, None, None
+        started = time.perf_counter()
+        pool = self._pool
+        try:
+            text, pages = await asyncio.get_running_loop().run_in_executor(
+                pool, textextract.extract_pdf_text, source, self.max_chars
+            )
+        except BrokenProcessPool as exc:
+            # a worker died (e.g. a pathological PDF); start a fresh pool for the rest,
+            # once: every consumer waiting on the broken pool lands here
+            error = f"worker crashed: {exc}"
+            if self._pool is pool:
+                pool.shutdown(wait=False)
+                self._pool = self._new_pool()
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        finally:
+            discard_spooled(doc.get("source_path"))
+
+        if error is None:
+            observe_stage(self.crawler, "extract_text", time.perf_counter() - started, len(text))
+            self.crawler.stats.inc_value("text/extracted")
+            self.crawler.stats.inc_value("text/chars", len(text))
+        else:
+            self.crawler.stats.inc_value("text/failed")
+            logger.warning("Could not extract text from %s: %s", doc.get("url"), error)
+
+        stmt = insert(DocumentText).values(
+            document_id=doc["document_id"],
+            text=text,
+            pages=pages,
+            extractor=textextract.EXTRACTOR,
+            error=error,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DocumentText.document_id],
+            set_={
+                "text": stmt.excluded.text,
+                "pages": stmt.excluded.pages,
+                "extractor": stmt.excluded.extractor,
+                "error": stmt.excluded.error,
+                "extracted_at": func.now(),
+            },
+        )
+        try:
+            async with get_async_sessionmaker()() as session:
+                await session.execute(stmt)
+                await session.commit()
+        except SQLAlchemyError as exc:
+            logger.exception("Saving extracted text failed for %s: %s", doc.get("url"), exc)
+            self.crawler.stats.inc_value("text/save_errors")
@@ -7,10 +7,11 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-from scrapy_playwright.page import PageMethod
 BOT_NAME = "wto"
 SPIDER_MODULES = ["wto.spiders"]
 NEWSPIDER_MODULE = "wto.spiders"
+# Project maintenance commands (scrapy recompress_blobs, ...)
+COMMANDS_MODULE = "wto.commands"
 
 #ITEM_PIPELINES = {
 #    "wto.pipelines.PostgresPipeline": 300,
@@ -45,26 +46,55 @@ DOWNLOAD_DELAY = 0.5
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "wto.middlewares.WtoSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    "wto.middlewares.WtoSpiderMiddleware": 543,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "wto.middlewares.WtoDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    "wto.middlewares.ItemByteBudgetMiddleware": 930,
+    "wto.middlewares.AdaptiveConcurrencyMiddleware": 940,
+    "wto.middlewares.FileSpoolMiddleware": 950,
+    "wto.middlewares.WtoDownloaderMiddleware": 960,
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+EXTENSIONS = {
+    "wto.extensions.StageMetrics": 500,
+    "wto.extensions.CallbackProfiler": 510,
+}
+
+# Per-stage latency histograms (render, download, sha256, db_upsert, db_commit,
+# callbacks) and queue depths, dumped every WTO_METRICS_INTERVAL seconds as a
+# Prometheus textfile or JSON snapshot; enable with -s WTO_METRICS_ENABLED=1
+WTO_METRICS_ENABLED = False
+WTO_METRICS_FILE = None  # default: wto_metrics.prom / wto_metrics.json
+WTO_METRICS_FORMAT = "prometheus"
+WTO_METRICS_INTERVAL = 15.0
+
+# Profiling hooks: wall/CPU time of every spider callback and pipeline
+# process_item/write_batch call, cProfile of every WTO_PROFILE_EVERY-th call
+# (`kill -USR2 <pid>` pauses/resumes it and dumps what was collected), optional
+# tracemalloc top allocations every WTO_PROFILE_TRACEMALLOC_INTERVAL seconds.
+# Written to WTO_PROFILE_DIR/<start time>-<spider>/ (.prof files, report.txt).
+WTO_PROFILE_ENABLED = False
+WTO_PROFILE_DIR = "profiles"
+WTO_PROFILE_CPROFILE = True  # False = only timings until the toggle signal
+WTO_PROFILE_EVERY = 10
+WTO_PROFILE_TOGGLE_SIGNAL = "SIGUSR2"
+WTO_PROFILE_TRACEMALLOC_INTERVAL = 0  # seconds; 0 = off (tracing slows the crawl)
+WTO_PROFILE_TRACEMALLOC_FRAMES = 1  # traceback depth; deeper is much slower
+WTO_PROFILE_TOP_N = 30
+WTO_PROFILE_CALLBACKS = None  # None = every parse* method of the spider
+WTO_PROFILE_PIPELINE_METHODS = ["process_item", "write_batch"]
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
     "wto.pipelines.WtoPipeline": 300,
+    "wto.pipelines.TextExtractionPipeline": 400,
 }
 
 # Enable and configure the AutoThrottle extension (disabled by default)
@@ -80,30 +110,70 @@ ITEM_PIPELINES = {
 # Enable showing throttling stats for every response received:
 #AUTOTHROTTLE_DEBUG = False
 
-# Enable and configure HTTP caching (disabled by default)
+# Replay cache for Playwright-rendered search pages (wto.httpcache); document
+# files and in-page pagination are never cached. Enable per run while tuning
+# or reprocessing: -s HTTPCACHE_ENABLED=1 (add HTTPCACHE_IGNORE_MISSING=1 to
+# replay offline, without a browser).
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+HTTPCACHE_ENABLED = False
+HTTPCACHE_EXPIRATION_SECS = 7 * 24 * 3600  # 0 = never expire
+HTTPCACHE_DIR = "httpcache"
+HTTPCACHE_POLICY = "wto.httpcache.SearchPageCachePolicy"
+HTTPCACHE_STORAGE = "wto.httpcache.CompressedSearchCacheStorage"
+WTO_SEARCH_CACHE_CODEC = "zstd"  # falls back to zlib without zstandard
+WTO_SEARCH_CACHE_MAX_BYTES = 512 * 1024 * 1024  # least recently used entries go first; 0 = no limit
 
 # Set settings whose default value is deprecated to a future-proof value
 FEED_EXPORT_ENCODING = "utf-8"
 
 # Playwright integration
+# The handler only drives Chromium for requests with meta["playwright"] = True
+# (search pages); everything else falls through to Scrapy's HTTP/1.1 downloader.
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 DOWNLOAD_HANDLERS = {
-    "http": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
-    "https": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
+    "http": "wto.browser.WtoPlaywrightDownloadHandler",
+    "https": "wto.browser.WtoPlaywrightDownloadHandler",
 }
 PLAYWRIGHT_BROWSER_TYPE = "chromium"
 PLAYWRIGHT_LAUNCH_OPTIONS = {"headless": True}
+# Created together with the browser, which WtoPlaywrightDownloadHandler only
+# launches when the first playwright request is downloaded.
 PLAYWRIGHT_CONTEXTS = {"default": {"java_script_enabled": True}}
+# Browser sub-requests aborted while rendering (resource types and URL regexes);
+# scripts stay allowed because the ASP.NET pager runs on __doPostBack.
+WTO_BLOCKED_RESOURCE_TYPES = ["image", "media", "font", "stylesheet"]
+WTO_BLOCKED_URL_PATTERNS = [
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+]
+# Keep one browser page per sequential pagination chain and click "next" in it
+# (per run: -a reuse_page=1)
+WTO_REUSE_SEARCH_PAGE = False
 
 # Concurrency
-CONCURRENT_REQUESTS = 8
+# Search pages share CONCURRENT_REQUESTS_PER_DOMAIN and the browser page cap;
+# document files get their own downloader slot so they never wait on rendering.
+# The values below are starting points: AdaptiveConcurrencyMiddleware tunes
+# each slot between the WTO_ADAPTIVE_CONCURRENCY bounds at runtime.
+CONCURRENT_REQUESTS = 20  # >= search max + files max
 PLAYWRIGHT_MAX_PAGES_PER_CONTEXT = 4
+WTO_FILES_DOWNLOAD_SLOT = "wto-files"
+DOWNLOAD_SLOTS = {
+    "wto-files": {"concurrency": 6, "delay": 0.25, "randomize_delay": True},
+}
+# Per request class: concurrency grows while responses stay under
+# target_latency and halves (delay doubles) on WTO_BACKOFF_HTTP_CODES,
+# timeouts or latency over twice the target. Search max should not exceed
+# PLAYWRIGHT_MAX_PAGES_PER_CONTEXT.
+WTO_ADAPTIVE_CONCURRENCY_ENABLED = True
+WTO_ADAPTIVE_CONCURRENCY = {
+    "search": {"min_concurrency": 1, "max_concurrency": 4, "target_latency": 15.0,
+               "min_delay": 0.5, "max_delay": 30.0},
+    "files": {"min_concurrency": 2, "max_concurrency": 16, "target_latency": 5.0,
+              "min_delay": 0.0, "max_delay": 10.0},
+}
+WTO_BACKOFF_HTTP_CODES = [408, 429, 500, 502, 503, 504, 522, 524]
 PLAYWRIGHT_DEFAULT_NAVIGATION_TIMEOUT = 60_000
 DOWNLOAD_TIMEOUT = 180
 RETRY_ENABLED = True
@@ -112,7 +182,91 @@ RETRY_TIMES = 3
 # Postgres DSN (override via env/CLI)
 PG_DSN = None
 
-FEED_EXPORT_FIELDS = ["name", "url", "symbol", "date", "scraper", "version", "file_urls", "files", "data"]
+# Search entry point (defaults to the spider's start_urls; per run: -a start_url=...)
+# and whether search pages are rendered in Chromium (off for static test servers)
+WTO_START_URL = None
+WTO_RENDER_SEARCH_PAGES = True
+
+# Documents already in the DB: "skip" (default), "revalidate" (conditional
+# GET, 304 only bumps the timestamp) or "full"; per run: -a refresh=revalidate
+WTO_REFRESH_MODE = "skip"
+
+# Search pagination: "sequential" (follow lnkNext), "fanout" (jump to every
+# page concurrently once page 1 reports the total) or "sharded" (page ranges
+# claimed from Postgres, see below); per run: -a pagination=fanout.
+# The page-jump postback is learned from numbered pager links; these are the fallback.
+WTO_PAGINATION_MODE = "sequential"
+WTO_PAGE_JUMP_EVENTTARGET = None
+WTO_PAGE_JUMP_ARGUMENT = "{page}"
+# Sequential pagination checkpoint: page number, range and form state of the
+# last completed page, rewritten after every page, so a restarted crawl jumps
+# back there instead of replaying every postback (-a resume=0 starts over).
+# None = <JOBDIR>/wto_pagination.json when JOBDIR is set, otherwise off.
+WTO_PAGINATION_CHECKPOINT = None
+# Pages before the checkpoint read again on resume (their stored documents are
+# skipped by the URL index), covering downloads lost with the crashed process.
+WTO_RESUME_LOOKBACK_PAGES = 1
+
+# Sharded pagination (-a pagination=sharded): workers share the crawl_shards
+# queue in Postgres. Processes passing the same crawl id (-a crawl=... or
+# WTO_CRAWL_ID; default "wto_docs-<UTC date>") split one crawl; see
+# `scrapy shards -h` for planning/requeueing.
+WTO_CRAWL_ID = None
+WTO_SHARD_PAGES = 10  # result pages per shard
+WTO_SHARDS_IN_FLIGHT = 2  # shards one process works on at once
+WTO_SHARD_LEASE = 300  # seconds; renewed per page, expired leases are reclaimed
+WTO_SHARD_MAX_ATTEMPTS = 3
+WTO_SHARD_POLL_INTERVAL = 30  # seconds between claims while other workers hold shards
+
+# WtoPipeline write batching: flush after N items, T seconds or B body bytes,
+# whichever comes first
+WTO_DB_BATCH_SIZE = 50
+WTO_DB_BATCH_INTERVAL = 2.0
+WTO_DB_BATCH_MAX_BYTES = 64 * 1024 * 1024
+# Batches written concurrently (async engine); keep <= pool_size in wto/db/session.py
+WTO_DB_WRITE_CONCURRENCY = 2
+# Apply pending schema migrations when a crawl opens (a version check once the
+# database is current); False only warns, for roles without DDL rights, and
+# leaves migrating to `scrapy migrate`.
+WTO_DB_MIGRATE = True
+# Items WtoPipeline still cannot write after the per-item fallback (constraint
+# errors, DB outage) are kept here with their files instead of being dropped;
+# load them back with `scrapy replay_deadletter` (None = drop them).
+WTO_DEADLETTER_DIR = "deadletter"
+
+# Document bodies are spooled to disk (FileSpoolMiddleware) instead of riding
+# in the item; new file downloads wait while this many bytes are in flight.
+WTO_SPOOL_DIR = None  # None = system temp dir
+WTO_MAX_INFLIGHT_BYTES = 256 * 1024 * 1024
+# Downloaded documents not yet written by WtoPipeline (buffered, queued for a
+# write slot or being written); new document downloads pause at this many bytes
+# and resume as batches commit (ItemByteBudgetMiddleware, 0 = no limit).
+WTO_ITEM_BYTES_BUDGET = 512 * 1024 * 1024
+
+# Blob compression for scraper_blob_store.source_file: "zstd" (needs the
+# zstandard package, falls back to zlib), "zlib" or "none". Rows that don't
+# shrink by 5% are stored raw. Recompress older rows with
+# `scrapy recompress_blobs`.
+WTO_BLOB_CODEC = "zstd"
+WTO_BLOB_COMPRESSION_LEVEL = None  # None = codec default (zstd 3, zlib 6)
+# Filesystem blob tier (wto.blobstore): files go to <dir>/<sha256[:2]>/<sha256[2:4]>/<sha256>,
+# written once per content (atomic rename) and read through mmap, and
+# scraper_blob_store keeps only sha256, size and content type. None = files
+# inline in Postgres (compressed with WTO_BLOB_CODEC).
+WTO_BLOB_STORE_DIR = None
+
+# PDF text extraction into document_texts (tsvector + GIN index) after the
+# document is stored. Needs the pypdf package; disabled automatically without it.
+WTO_TEXT_EXTRACTION_ENABLED = True
+WTO_TEXT_WORKERS = 2  # extraction processes
+WTO_TEXT_QUEUE_SIZE = 32  # documents queued/extracting before items wait
+WTO_TEXT_MAX_CHARS = 500_000  # keeps to_tsvector() under its 1 MB limit
+
+# Top-level WtoDocumentItem fields for -o feeds (bodies stay out). Bulk exports of stored documents: `scrapy export_documents`.
+FEED_EXPORT_FIELDS = [
+    "doc_uuid", "name", "url", "symbol", "doc_date", "doc_type", "scraper", "version",
+    "timestamp", "file_content_type", "source_size", "data",
+]
 
 custom_settings = {
         # Gentle defaults help with Cloudflare-y sites
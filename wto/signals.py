@@ -0,0 +1,28 @@
+# file: wto/signals.py
+"""Project-specific crawler signals (sent with crawler.signals.send_catch_log)."""
+
+# WtoPipeline finished writing one batch.
+# Arguments: items (int), nbytes (int, blob bytes), seconds (float, execute + commit),
+# ok (bool, False when the batch had to fall back to per-item writes)
+db_batch_written = object()
+
+# One timed unit of work in a crawl stage (render, download, sha256, db_upsert, ...).
+# Arguments: stage (str), seconds (float), nbytes (int, 0 when not applicable)
+stage_observed = object()
+
+# WtoPipeline committed new/updated documents (not sent for not-modified touches).
+# Arguments: documents (list of dicts: document_id, url, file_content_type,
+# source_path (spool file or None), body (raw bytes when not spooled, else None)).
+# Spool files are deleted right after the handlers return; a handler that reads
+# one later must wto.spool.retain_spooled() it first.
+documents_stored = object()
+
+# WtoPipeline.close_spider finished: the final flush and every in-flight batch
+# have completed, so no more documents_stored will be sent.
+# Arguments: none
+writes_drained = object()
+
+# WtoPipeline is done with these items: written, failed or skipped. Lets
+# ItemByteBudgetMiddleware release the bytes it counted for them.
+# Arguments: urls (list of str, item["url"])
+items_released = object()
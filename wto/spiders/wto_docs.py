@@ -1,8 +1,18 @@
 import scrapy
+import asyncio
 import hashlib
+import math
+import time
 import uuid
+from datetime import datetime, timezone
+from scrapy import signals
+from scrapy.exceptions import CloseSpider, DontCloseSpider, NotSupported
+from scrapy.http import HtmlResponse
 from scrapy_playwright.page import PageMethod
-from typing import Optional, Tuple
+from typing import Dict, Optional, Set, Tuple
+from wto.checkpoint import PaginationCheckpoint, checkpoint_path, hidden_form_fields
+from wto.middlewares import observe_stage
+from wto.utils.normalize import clean_symbol, doc_type, parse_doc_date
 import re
 
 class WTODecisionsSpider(scrapy.Spider):
@@ -15,23 +25,105 @@ class WTODecisionsSpider(scrapy.Spider):
     _last_page_sig: Optional[Tuple[int, int]] = None
     _repeat_guard: int = 0
     _consecutive_no_items: int = 0
+    _known = None
+    _mode = "skip"
+
+    # Refresh modes: "skip" never re-downloads a URL already in `documents`,
+    # "revalidate" sends conditional requests (ETag / Last-Modified) for them,
+    # "full" downloads everything again. Set with `-a refresh=...` or WTO_REFRESH_MODE.
+    REFRESH_MODES = ("skip", "revalidate", "full")
+
+    # Pagination modes: "sequential" follows lnkNext one page at a time, "fanout"
+    # reads the total from page 1 and posts page-index jumps for every other page
+    # concurrently. "sharded" claims page-range shards from the crawl_shards
+    # table (wto.db.shards) so several processes/machines can split one crawl.
+    # Set with `-a pagination=fanout` or WTO_PAGINATION_MODE. Sequential crawls
+    # checkpoint each page (wto.checkpoint) and resume from it; `-a resume=0` ignores it.
+    PAGINATION_MODES = ("sequential", "fanout", "sharded")
+
+    NEXT_EVENTTARGET = "ctl00$MainPlaceHolder$lnkNext"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pagination = "sequential"
+        self._page_size: Optional[int] = None
+        self._expected_pages: Optional[int] = None
+        self._pages_seen: Set[int] = set()
+        self._ranges_seen: Dict[Tuple[int, int], int] = {}
+        self._shards = None
+        self._active_shards: Dict[int, dict] = {}
+        self._shard_poll: Optional[asyncio.Future] = None
+        self._shard_poll_at = 0.0
+        self._shards_exhausted = False
+        self._checkpoint: Optional[PaginationCheckpoint] = None
+        self._resumed_from: Optional[dict] = None
+        # Tags this run's search requests, to tell them from ones JOBDIR restored
+        self._run_id = uuid.uuid4().hex
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider._on_idle, signal=signals.spider_idle)
+        return spider
+
+    async def start(self):
+        # Scrapy >= 2.13 entry point; older versions call start_requests() directly
+        if self._pagination_mode() == "sharded":
+            async for request in self._start_sharded():
+                yield request
+            return
+        for request in self.start_requests():
+            yield request
 
     def start_requests(self):
         """
         Initializes the first request to the start URL with Playwright enabled.
         """
+        self._mode = self._refresh_mode()
+        self._pagination = self._pagination_mode()
+        if self._pagination == "sharded":
+            # Only start() claims shards; Scrapy < 2.13 calls start_requests() instead
+            raise NotSupported("sharded pagination needs Scrapy >= 2.13 (async Spider.start())")
+        self._load_known_documents()
+        start_url = self._start_url()
+        if self._pagination == "sequential":
+            resume = self._open_checkpoint(start_url)
+            if resume is not None:
+                yield resume
+                return
+        if self._pagination == "sequential" and self._reuse_page() and self._render_search_pages():
+            # One browser page for the whole chain: parse_in_page clicks "next" in it
+            meta = self._search_meta(1)
+            meta["playwright_include_page"] = True
+            yield scrapy.Request(
+                start_url,
+                meta=meta,
+                callback=self.parse_in_page,
+                errback=self._close_page_on_error,
+            )
+            return
         yield scrapy.Request(
-            self.start_urls[0],
-            meta={
-                "playwright": True,
-                "playwright_page_methods": [
-                    PageMethod("wait_for_selector", ".hitContainer"),
-                ],
-                "page_number": 1,
-            },
+            start_url,
+            meta=self._search_meta(1),
             callback=self.parse,
         )
 
+    def _search_meta(self, page_number: int) -> dict:
+        """Request meta for a browser-rendered search results page."""
+        if not self._render_search_pages():
+            return {"page_number": page_number, "playwright": False, "wto_run": self._run_id}
+        return {
+            "page_number": page_number,
+            "wto_run": self._run_id,
+            "playwright": True,
+            "playwright_page_methods": [
+                PageMethod("wait_for_selector", ".hitContainer"),
+            ],
+        }
+
+    def _render_search_pages(self) -> bool:
+        return self.settings.getbool("WTO_RENDER_SEARCH_PAGES", True)
+
     def parse(self, response):
         """
         Parses the search results page, extracts document links,
@@ -39,11 +131,26 @@ class WTODecisionsSpider(scrapy.Spider):
         """
         page_number = response.meta.get("page_number", 1)
         self.logger.info(f"📄 Scraping page {page_number}")
+        self.crawler.stats.inc_value("wto/search_pages")
 
         # Check for infinite loop by monitoring the "Displaying X-Y of Z" text
         start_end = self._extract_displaying_range(response)
         total_count = self._extract_total_count(response)
-        if start_end:
+        if self._resumed_from is not None and response.meta.get("wto_run", self._run_id) != self._run_id:
+            # Next-page postback of the crashed run, restored from JOBDIR's queue:
+            # the checkpoint resume already continues that chain.
+            self.crawler.stats.inc_value("pagination/stale_pages")
+            self.logger.info(f"Ignoring page {page_number} requested by an earlier run")
+            return
+        if response.meta.get("wto_resumed"):
+            page_number = self._check_resumed_page(page_number, start_end)
+        if self._pagination == "sharded":
+            pass  # ranges are checked per shard in parse_shard_page
+        elif self._pagination == "fanout":
+            # Pages arrive out of order, so check each one against the ranges seen so far
+            if not self._record_fanout_page(page_number, start_end):
+                return
+        elif start_end:
             if start_end == self._last_page_sig:
                 self._repeat_guard += 1
             else:
@@ -68,12 +175,11 @@ class WTODecisionsSpider(scrapy.Spider):
         for document in documents:
             # Title
             title = document.xpath(".//div[contains(@class,'hitTitle')]//span[@title='Document title']/text()").get()
-            # Symbol
-            symbol = document.xpath(".//div[@class='hitContainer']/div[@class='hitSymbol']").get()
-            # Date (grab any detail text containing a year-like date)
-            date = document.xpath(
-                ".//div[@class='hitDetail']//text()[contains(., '/20') or contains(., '/19')]"
-            ).get()
+            # Symbol (text of the hitSymbol block, not its HTML)
+            symbol = clean_symbol(" ".join(document.xpath(".//div[contains(@class,'hitSymbol')]//text()").getall()))
+            # Date: the detail line, parsed for its first dd/mm/yyyy date
+            detail = " ".join(document.xpath(".//div[contains(@class,'hitDetail')]//text()").getall())
+            doc_date = parse_doc_date(detail)
             # English link
             english_link = document.xpath(
                 ".//div[contains(@class, 'hitEnFileLink')]//a[contains(@class, 'FEFileNameLinkResultsCss')]/@href"
@@ -81,20 +187,60 @@ class WTODecisionsSpider(scrapy.Spider):
 
             if english_link:
                 full_url = response.urljoin(english_link)
+                known_id = self._known.document_id(full_url) if self._known is not None else None
+                if known_id and self._mode == "skip":
+                    self.crawler.stats.inc_value("wto/documents_skipped_known")
+                    self.logger.debug(f"Already stored, skipping download: {full_url}")
+                    continue
                 item = {
                     "name": (title or "").strip(),
                     "url": full_url,
-                    "data": {"symbol": (symbol or "").strip(), "date": (date or "").strip()},
+                    "symbol": symbol,
+                    "doc_date": doc_date,
+                    "doc_type": doc_type(symbol),
+                    "data": {"symbol": symbol or "", "date": doc_date.isoformat() if doc_date else ""},
                     "scraper": self.name,
                     "version": "1.0",
                 }
-                yield scrapy.Request(full_url, meta={"item": item}, callback=self.parse_document, dont_filter=True)
+                meta = {
+                    "item": item,
+                    # Static file: plain HTTP download, own slot, no browser page
+                    "playwright": False,
+                    "download_slot": self.settings.get("WTO_FILES_DOWNLOAD_SLOT", "wto-files"),
+                    # Stream the body to a spool file when FileSpoolMiddleware is enabled
+                    "spool": True,
+                }
+                headers = {}
+                if known_id:
+                    headers = self._conditional_headers(full_url)
+                    meta["known_document_id"] = known_id
+                    meta["handle_httpstatus_list"] = [304]
+                yield scrapy.Request(
+                    full_url,
+                    headers=headers,
+                    meta=meta,
+                    callback=self.parse_document,
+                    dont_filter=True,
+                )
                 yielded_this_page += 1
             else:
                 self.logger.warning(f"No English link found for document with title: {title}")
 
         self.logger.info(f"Yielded {yielded_this_page} items from page {page_number}")
 
+        if self._pagination == "sharded":
+            return  # the shard's page jumps were scheduled when it was claimed
+        if self._pagination == "fanout":
+            if page_number == 1:
+                requests = self._fan_out(response, start_end, total_count)
+                if requests is not None:
+                    yield from requests
+                    return
+                self.logger.warning("Cannot fan out from page 1; falling back to sequential pagination.")
+                self._pagination = "sequential"
+            else:
+                return
+
         # Pagination Logic
         next_btn_xpath = "//a[@id='ctl00_MainPlaceHolder_lnkNext']"
         next_btn = response.xpath(next_btn_xpath)
@@ -107,7 +253,9 @@ class WTODecisionsSpider(scrapy.Spider):
         self.logger.info(f"Results label: '{info_text}' (parsed={start_end}, total={total_count})")
 
         should_paginate = has_next or (start_end is not None and total_count is not None and start_end[1] < total_count)
-        
+        if self._checkpoint is not None and self._pagination == "sequential":
+            self._save_checkpoint(response, page_number, start_end, total_count, finished=not should_paginate)
+
         if should_paginate:
             next_page_num = page_number + 1
             self.logger.info(
@@ -118,32 +266,546 @@ class WTODecisionsSpider(scrapy.Spider):
                 response,
                 formxpath="//form",
                 formdata={
-                    "__EVENTTARGET": "ctl00$MainPlaceHolder$lnkNext",
+                    "__EVENTTARGET": self.NEXT_EVENTTARGET,
                     "__EVENTARGUMENT": "",
                 },
                 dont_filter=True,
                 callback=self.parse,
-                meta={
-                    "page_number": next_page_num,
-                    "playwright": True,
-                    "playwright_page_methods": [
-                        PageMethod("wait_for_selector", ".hitContainer"),
-                    ],
-                },
+                meta=self._search_meta(next_page_num),
             )
         else:
             self.logger.info("✅ No more pages — finished.")
 
+    def parse_resume(self, response):
+        """
+        Page 1 of a resumed crawl, fetched only for fresh form state: jumps to
+        the resume page by page index, or posts the checkpoint's saved form
+        state ("next" from the last completed page, so without lookback) when
+        the pager has no numbered links. Its documents are not parsed again.
+        """
+        state = self._resumed_from
+        resume_page = response.meta["resume_page"]
+        jump = self._page_jump_template(response)
+        if jump is not None:
+            target, argument = jump
+            meta = self._search_meta(resume_page)
+            meta["wto_resumed"] = True
+            yield scrapy.FormRequest.from_response(
+                response,
+                formxpath="//form",
+                formdata={"__EVENTTARGET": target, "__EVENTARGUMENT": argument.format(page=resume_page)},
+                dont_filter=True,
+                callback=self.parse,
+                meta=meta,
+            )
+        elif state.get("form"):
+            meta = self._search_meta(state["page_number"] + 1)
+            meta["wto_resumed"] = True
+            yield scrapy.FormRequest(
+                state["url"],
+                formdata={**state["form"], "__EVENTTARGET": self.NEXT_EVENTTARGET, "__EVENTARGUMENT": ""},
+                dont_filter=True,
+                callback=self.parse,
+                meta=meta,
+            )
+        else:
+            self.logger.warning("Cannot jump to the checkpoint page; paginating from page 1 again.")
+            self._resumed_from = None
+            yield from self.parse(response)
+
+    async def parse_in_page(self, response):
+        """
+        Sequential pagination inside one persistent Playwright page: parses the
+        current page, then clicks lnkNext in the same page instead of posting the
+        form into a fresh one, until parse() stops asking for a next page.
+        """
+        page = response.meta["playwright_page"]
+        try:
+            while True:
+                wants_next = False
+                for result in self.parse(response):
+                    if isinstance(result, scrapy.Request) and result.callback == self.parse:
+                        wants_next = True  # replaced by the in-page click below
+                        continue
+                    yield result
+                if not wants_next:
+                    break
+
+                label = await page.text_content("#ctl00_MainPlaceHolder_lblInfo")
+                await page.click("#ctl00_MainPlaceHolder_lnkNext")
+                await page.wait_for_function(
+                    "prev => { const el = document.querySelector('#ctl00_MainPlaceHolder_lblInfo');"
+                    " return el && el.textContent !== prev; }",
+                    arg=label,
+                )
+                await page.wait_for_selector(".hitContainer")
+                request = response.request.replace(
+                    meta={**response.meta, "page_number": response.meta.get("page_number", 1) + 1}
+                )
+                response = HtmlResponse(
+                    url=page.url, body=await page.content(), encoding="utf-8", request=request
+                )
+        except Exception as exc:
+            self.logger.error(f"In-page pagination stopped at page {response.meta.get('page_number')}: {exc}")
+        finally:
+            await page.close()
+
+    async def _close_page_on_error(self, failure):
+        page = failure.request.meta.get("playwright_page")
+        if page is not None:
+            await page.close()
+        self.logger.error(f"Search page request failed: {failure.value!r}")
+
+    def _fan_out(self, response, start_end, total_count):
+        """
+        Builds page-index postbacks for pages 2..N from page 1's form state,
+        or returns None when the total or the jump target is unknown.
+        """
+        if not start_end or not total_count:
+            return None
+        jump = self._page_jump_template(response)
+        if jump is None:
+            return None
+        self._page_size = start_end[1] - start_end[0] + 1
+        self._expected_pages = math.ceil(total_count / self._page_size)
+        self.crawler.stats.set_value("pagination/expected_pages", self._expected_pages)
+        self.logger.info(
+            f"Fanning out {self._expected_pages - 1} page requests ({self._page_size} hits/page, total={total_count})"
+        )
+        target, argument = jump
+        return [
+            scrapy.FormRequest.from_response(
+                response,
+                formxpath="//form",
+                formdata={"__EVENTTARGET": target, "__EVENTARGUMENT": argument.format(page=n)},
+                dont_filter=True,
+                callback=self.parse,
+                meta=self._search_meta(n),
+            )
+            for n in range(2, self._expected_pages + 1)
+        ]
+
+    def _page_jump_template(self, response) -> Optional[Tuple[str, str]]:
+        """
+        Learns the pager's postback (target, argument template) from a numbered
+        pager link, e.g. __doPostBack('ctl00$...$pager','Page$3') -> 'Page${page}'.
+        Falls back to WTO_PAGE_JUMP_EVENTTARGET / WTO_PAGE_JUMP_ARGUMENT.
+        """
+        for link in response.xpath("//a[contains(@href, '__doPostBack')]"):
+            label = "".join(link.xpath(".//text()").getall()).strip()
+            match = re.search(r"__doPostBack\('([^']+)','([^']*)'\)", link.xpath("@href").get() or "")
+            if not label.isdigit() or not match:
+                continue
+            number = re.match(r"^(.*?)(\d+)$", match.group(2))
+            if number and int(number.group(2)) == int(label):
+                return match.group(1), number.group(1).replace("{", "{{").replace("}", "}}") + "{page}"
+        target = self.settings.get("WTO_PAGE_JUMP_EVENTTARGET")
+        if target:
+            return target, self.settings.get("WTO_PAGE_JUMP_ARGUMENT", "{page}")
+        return None
+
+    def _open_checkpoint(self, start_url: str) -> Optional[scrapy.Request]:
+        """
+        Enables the pagination checkpoint (WTO_PAGINATION_CHECKPOINT or JOBDIR)
+        and, when an unfinished one exists for this start URL, returns the
+        request that resumes from it. Pages before the resume page are never
+        requested; documents of the WTO_RESUME_LOOKBACK_PAGES re-read pages that
+        were already stored are skipped by the URL index.
+        """
+        path = checkpoint_path(self.settings)
+        if not path:
+            return None
+        self._checkpoint = PaginationCheckpoint(path)
+        state = self._checkpoint.load()
+        if not state or state.get("finished") or state.get("start_url") != start_url:
+            return None
+        if str(getattr(self, "resume", "1")).lower() in ("0", "false", "no"):
+            self.logger.info(f"Ignoring pagination checkpoint {path} (resume=0)")
+            return None
+        lookback = max(0, self.settings.getint("WTO_RESUME_LOOKBACK_PAGES", 1))
+        resume_page = max(1, state["page_number"] + 1 - lookback)
+        if resume_page <= 1:
+            return None
+        self._resumed_from = state
+        self.crawler.stats.set_value("pagination/resumed_at_page", resume_page)
+        self.logger.info(
+            f"Resuming from {path}: page {state['page_number']} (range {state.get('start_end')} of "
+            f"{state.get('total_count')}) was done, continuing at page {resume_page}"
+        )
+        meta = self._search_meta(1)
+        meta["resume_page"] = resume_page
+        return scrapy.Request(start_url, meta=meta, callback=self.parse_resume, dont_filter=True)
+
+    def _check_resumed_page(self, page_number: int, start_end) -> int:
+        """Page number the resumed page really is, judged by its range and the checkpoint's page size."""
+        page_size = (self._resumed_from or {}).get("page_size")
+        if not page_size or not start_end:
+            return page_number
+        expected = (page_number - 1) * page_size + 1
+        if start_end[0] == expected:
+            self.crawler.stats.inc_value("pagination/resumed")
+            return page_number
+        self.crawler.stats.inc_value("pagination/resume_mismatch")
+        actual = (start_end[0] - 1) // page_size + 1
+        self.logger.warning(
+            f"Resumed at page {page_number} but it shows {start_end}, expected it to start at {expected}; "
+            f"continuing as page {actual}"
+        )
+        return actual
+
+    def _save_checkpoint(self, response, page_number: int, start_end, total_count, finished: bool) -> None:
+        page_size = None
+        if start_end:
+            page_size = (start_end[0] - 1) // (page_number - 1) if page_number > 1 else start_end[1] - start_end[0] + 1
+        try:
+            self._checkpoint.save({
+                "start_url": self._start_url(),
+                "page_number": page_number,
+                "start_end": list(start_end) if start_end else None,
+                "page_size": page_size,
+                "total_count": total_count,
+                "url": response.url,
+                "form": hidden_form_fields(response),
+                "finished": finished,
+            })
+        except OSError as exc:
+            self.logger.warning(f"Could not write pagination checkpoint: {exc}")
+            return
+        self.crawler.stats.set_value("pagination/checkpoint_page", page_number)
+
+    def _record_fanout_page(self, page_number: int, start_end) -> bool:
+        """
+        Fan-out bookkeeping: flags pages whose range was already served for
+        another page (duplicates) or doesn't match the page index. Returns
+        False when the page's documents should be ignored.
+        """
+        if start_end is None:
+            return True
+        first_page = self._ranges_seen.get(start_end)
+        if first_page is not None and first_page != page_number:
+            self.crawler.stats.inc_value("pagination/duplicate_pages")
+            self.logger.warning(f"Page {page_number} repeats the range {start_end} of page {first_page}")
+            self._repeat_guard += 1
+            if self._repeat_guard >= 3:
+                self.logger.error("Stuck on the same page segment repeatedly; stopping to prevent a crawl loop.")
+                raise CloseSpider("pagination_loop")
+            return False
+        self._ranges_seen[start_end] = page_number
+        self._pages_seen.add(page_number)
+        if self._page_size and start_end[0] != (page_number - 1) * self._page_size + 1:
+            self.crawler.stats.inc_value("pagination/unexpected_range")
+            self.logger.warning(f"Page {page_number} shows range {start_end}, expected it to start at "
+                                f"{(page_number - 1) * self._page_size + 1}")
+        return True
+
+    async def _start_sharded(self):
+        """
+        Sharded crawl: seeds the crawl's unplanned shard for the start URL
+        (no-op when another worker already did) and claims the first shards.
+        """
+        from wto.db.session import get_sessionmaker
+        from wto.db.shards import ShardQueue
+
+        self._mode = self._refresh_mode()
+        self._pagination = "sharded"
+        self._load_known_documents()
+        start_url = self._start_url()
+        crawl = getattr(self, "crawl", None) or self.settings.get("WTO_CRAWL_ID") or (
+            f"{self.name}-{datetime.now(timezone.utc):%Y-%m-%d}"
+        )
+        self._shards = ShardQueue(
+            get_sessionmaker(),
+            crawl=crawl,
+            lease_seconds=self.settings.getfloat("WTO_SHARD_LEASE", 300),
+            max_attempts=self.settings.getint("WTO_SHARD_MAX_ATTEMPTS", 3),
+        )
+        if await asyncio.to_thread(self._shards.seed, start_url):
+            self.logger.info(f"Seeded crawl {crawl!r} with {start_url}")
+        self.logger.info(f"Sharded crawl {crawl!r} as worker {self._shards.worker}")
+        for request in await self._claim_shards():
+            yield request
+
+    async def _claim_shards(self) -> list:
+        """Claims shards up to WTO_SHARDS_IN_FLIGHT and returns their seed requests."""
+        requests = []
+        limit = max(1, self.settings.getint("WTO_SHARDS_IN_FLIGHT", 2))
+        while len(self._active_shards) < limit:
+            shard = await asyncio.to_thread(self._shards.claim)
+            if shard is None:
+                break
+            self.crawler.stats.inc_value("shards/claimed")
+            self.logger.info(
+                f"Claimed shard {shard['id']} pages {shard['first_page']}-{shard['last_page'] or '?'} "
+                f"(attempt {shard['attempts']})"
+            )
+            self._active_shards[shard["id"]] = {"shard": shard, "pending": set(), "failed": set(), "ranges": {}}
+            # Page 1 of the shard's search URL carries the form state for the page jumps
+            meta = self._search_meta(1)
+            meta.update(wto_shard=shard["id"], wto_shard_seed=True)
+            requests.append(scrapy.Request(
+                shard["start_url"],
+                meta=meta,
+                callback=self.parse_shard_page,
+                errback=self._shard_page_failed,
+                dont_filter=True,
+            ))
+        return requests
+
+    async def parse_shard_page(self, response):
+        """
+        Callback for shard pages: the seed (page 1) plans the shard's page jumps,
+        every page in the shard's range is parsed like a fan-out page, and the
+        shard is completed (and the next one claimed) once all its pages are in.
+        """
+        shard_id = response.meta["wto_shard"]
+        state = self._active_shards.get(shard_id)
+        if state is None:
+            return
+        page_number = response.meta.get("page_number", 1)
+        if response.meta.get("wto_shard_seed"):
+            requests = await self._plan_shard(response, state)
+            if requests is None:
+                for request in await self._finish_shard(shard_id, failed=True):
+                    yield request
+                return
+            for request in requests:
+                yield request
+            if page_number not in state["pending"]:
+                return
+
+        ok = True
+        start_end = self._extract_displaying_range(response)
+        if start_end is not None:
+            first_page = state["ranges"].setdefault(start_end, page_number)
+            if first_page != page_number:
+                self.crawler.stats.inc_value("pagination/duplicate_pages")
+                self.logger.warning(f"Page {page_number} repeats the range {start_end} of page {first_page}")
+                ok = False
+        if ok:
+            for result in self.parse(response):
+                yield result
+        for request in await self._shard_page_done(shard_id, page_number, ok):
+            yield request
+
+    async def _shard_page_failed(self, failure):
+        request = failure.request
+        shard_id = request.meta.get("wto_shard")
+        self.logger.error(f"Shard {shard_id} page {request.meta.get('page_number')} failed: {failure.value!r}")
+        if shard_id not in self._active_shards:
+            return
+        if request.meta.get("wto_shard_seed") and not self._active_shards[shard_id]["pending"]:
+            requests = await self._finish_shard(shard_id, failed=True)
+        else:
+            requests = await self._shard_page_done(shard_id, request.meta.get("page_number"), ok=False)
+        for request in requests:
+            yield request
+
+    async def _plan_shard(self, response, state) -> Optional[list]:
+        """Page-jump requests for the shard's range (splitting an unplanned shard first), or None."""
+        shard = state["shard"]
+        start_end = self._extract_displaying_range(response)
+        total_count = self._extract_total_count(response)
+        if start_end:
+            self._page_size = start_end[1] - start_end[0] + 1
+        more = []
+        if shard["last_page"] is None:
+            if not start_end or not total_count:
+                self.logger.error(f"Cannot plan shard {shard['id']}: no result count on page 1")
+                return None
+            total_pages = math.ceil(total_count / self._page_size)
+            shard["last_page"] = await asyncio.to_thread(
+                self._shards.split, shard["id"], total_pages, self.settings.getint("WTO_SHARD_PAGES", 10)
+            )
+            self.crawler.stats.set_value("pagination/expected_pages", total_pages)
+            self.logger.info(f"Planned {total_pages} pages of {shard['start_url']} into shards")
+            more = await self._claim_shards()  # the new ranges can be claimed right away
+
+        pages = set(range(shard["first_page"], shard["last_page"] + 1))
+        jumps = sorted(pages - {1})
+        jump = self._page_jump_template(response) if jumps else None
+        if jumps and jump is None:
+            self.logger.error(f"Cannot jump to pages of shard {shard['id']}: no pager postback found")
+            return None
+        state["pending"] = pages
+        target, argument = jump or (None, None)
+        requests = [
+            scrapy.FormRequest.from_response(
+                response,
+                formxpath="//form",
+                formdata={"__EVENTTARGET": target, "__EVENTARGUMENT": argument.format(page=n)},
+                dont_filter=True,
+                callback=self.parse_shard_page,
+                errback=self._shard_page_failed,
+                meta={**self._search_meta(n), "wto_shard": shard["id"]},
+            )
+            for n in jumps
+        ]
+        return requests + more
+
+    async def _shard_page_done(self, shard_id: int, page_number, ok: bool) -> list:
+        state = self._active_shards[shard_id]
+        state["pending"].discard(page_number)
+        if not ok:
+            state["failed"].add(page_number)
+        await asyncio.to_thread(self._shards.renew, shard_id, 1 if ok else 0)
+        if state["pending"]:
+            return []
+        return await self._finish_shard(shard_id, failed=bool(state["failed"]))
+
+    async def _finish_shard(self, shard_id: int, failed: bool) -> list:
+        """Completes (or gives back, when pages failed) the shard and claims the next ones."""
+        state = self._active_shards.pop(shard_id)
+        if failed:
+            await asyncio.to_thread(self._shards.release, shard_id)
+            self.crawler.stats.inc_value("shards/released")
+            self.logger.warning(f"Released shard {shard_id} for retry (failed pages: {sorted(state['failed'])})")
+        else:
+            await asyncio.to_thread(self._shards.complete, shard_id)
+            self.crawler.stats.inc_value("shards/completed")
+            self.logger.info(f"Completed shard {shard_id}")
+        return await self._claim_shards()
+
+    def _on_idle(self, spider):
+        """
+        Sharded crawls stay open while other workers still hold shards: their
+        leases may expire (crashed worker) and the shard becomes claimable.
+        """
+        if self._shards is None or self._shards_exhausted:
+            return
+        poll_interval = self.settings.getfloat("WTO_SHARD_POLL_INTERVAL", 30)
+        if (self._shard_poll is None or self._shard_poll.done()) and (
+            time.monotonic() - self._shard_poll_at >= poll_interval or not self._shard_poll_at
+        ):
+            self._shard_poll_at = time.monotonic()
+            self._shard_poll = asyncio.ensure_future(self._poll_shards())
+        raise DontCloseSpider
+
+    async def _poll_shards(self):
+        try:
+            requests = await self._claim_shards()
+            for request in requests:
+                self.crawler.engine.crawl(request)
+            if not requests and not self._active_shards:
+                unfinished = await asyncio.to_thread(self._shards.unfinished)
+                if unfinished:
+                    self.logger.info(f"Waiting for {unfinished} shard(s) held by other workers")
+                else:
+                    self._shards_exhausted = True
+        except Exception as exc:
+            self.logger.error(f"Shard poll failed, finishing: {exc}")
+            self._shards_exhausted = True
+
+    def closed(self, reason):
+        if self._shards is not None:
+            for shard_id in list(self._active_shards):
+                try:
+                    self._shards.release(shard_id)  # next worker resumes it without waiting out the lease
+                except Exception as exc:
+                    self.logger.warning(f"Could not release shard {shard_id}: {exc}")
+        if self._pagination == "fanout" and self._expected_pages:
+            missing = sorted(set(range(1, self._expected_pages + 1)) - self._pages_seen)
+            self.crawler.stats.set_value("pagination/missing_pages", len(missing))
+            if missing:
+                self.logger.error(f"{len(missing)} result page(s) never arrived: {missing[:50]}")
+
     def parse_document(self, response):
         """
         Downloads the document and adds it to the item.
         """
         item = response.meta["item"]
-        item["source_file"] = response.body
+        item["timestamp"] = datetime.now(timezone.utc)
+        spool = response.meta.get("spool_file")
+        if response.status == 304:
+            if spool is not None:
+                spool.discard()
+            # Unchanged since the stored copy: the pipeline only refreshes the timestamp
+            item["doc_uuid"] = response.meta["known_document_id"]
+            item["not_modified"] = True
+            self.crawler.stats.inc_value("wto/documents_not_modified")
+            yield item
+            return
         item["file_content_type"] = response.headers.get("Content-Type").decode("utf-8")
-        item["doc_uuid"] = hashlib.sha256(item["source_file"]).hexdigest()
+        if spool is not None:
+            # Body is already on disk and was hashed while it streamed in
+            item["source_path"] = spool.path
+            item["source_size"] = spool.size
+            item["doc_uuid"] = spool.sha256
+        else:
+            item["source_file"] = response.body
+            item["source_size"] = len(response.body)
+            started = time.perf_counter()
+            item["doc_uuid"] = hashlib.sha256(item["source_file"]).hexdigest()
+            observe_stage(self.crawler, "sha256", time.perf_counter() - started, len(response.body))
+        item["data"]["sha256"] = item["doc_uuid"]
+        item["data"]["http"] = self._http_validators(response)
         yield item
 
+    def _refresh_mode(self) -> str:
+        mode = str(getattr(self, "refresh", "") or self.settings.get("WTO_REFRESH_MODE", "skip")).lower()
+        if mode in ("1", "true", "yes"):
+            mode = "full"
+        if mode not in self.REFRESH_MODES:
+            self.logger.warning(f"Unknown refresh mode {mode!r}; using 'skip'.")
+            mode = "skip"
+        return mode
+
+    def _pagination_mode(self) -> str:
+        mode = str(getattr(self, "pagination", "") or self.settings.get("WTO_PAGINATION_MODE", "sequential")).lower()
+        if mode not in self.PAGINATION_MODES:
+            self.logger.warning(f"Unknown pagination mode {mode!r}; using 'sequential'.")
+            mode = "sequential"
+        return mode
+
+    def _start_url(self) -> str:
+        return getattr(self, "start_url", None) or self.settings.get("WTO_START_URL") or self.start_urls[0]
+
+    def _reuse_page(self) -> bool:
+        value = getattr(self, "reuse_page", None)
+        if value is None:
+            return self.settings.getbool("WTO_REUSE_SEARCH_PAGE", False)
+        return str(value).lower() in ("1", "true", "yes")
+
+    def _load_known_documents(self):
+        """
+        Loads the url index of stored documents unless running a full refresh.
+        """
+        if self._refresh_mode() == "full":
+            self.logger.info("Full refresh: every document will be downloaded again.")
+            return
+        try:
+            from wto.db.index import KnownDocuments
+            from wto.db.session import get_sessionmaker
+
+            with get_sessionmaker()() as session:
+                self._known = KnownDocuments.load(session, with_validators=self._mode == "revalidate")
+        except Exception as exc:  # why: a crawl without the index still works, just slower
+            self.logger.warning(f"Could not load known documents index, downloading everything: {exc}")
+            return
+        self.crawler.stats.set_value("wto/known_documents", len(self._known))
+        self.logger.info(f"Loaded {len(self._known)} known document URLs.")
+
+    def _conditional_headers(self, url: str) -> dict:
+        """Build If-None-Match / If-Modified-Since from the stored validators."""
+        validators = self._known.validators(url) or {}
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    def _http_validators(self, response) -> dict:
+        """HTTP validators stored with the document for later revalidation."""
+        def header(name):
+            value = response.headers.get(name)
+            return value.decode("latin-1") if value else None
+
+        return {
+            "etag": header("ETag"),
+            "last_modified": header("Last-Modified"),
+            "content_length": int(header("Content-Length") or len(response.body)),
+        }
+
     def _extract_displaying_range(self, response):
         """
         Helper method to extract the "Displaying X-Y of Z" numbers for the repeat guard.
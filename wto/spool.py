@@ -0,0 +1,74 @@
+# file: wto/spool.py
+"""
+Spool files for downloaded document bodies.
+
+FileSpoolMiddleware tees each file download into a SpoolFile chunk by chunk
+(via the bytes_received signal), hashing as the data arrives. The item then
+carries the spool path instead of the body, and WtoPipeline reads it once
+when the batch is written. Later stages (text extraction) retain a file to
+keep it past the batch write.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+# path -> holders (owner + retain_spooled() callers) of retained files (event-loop thread only)
+_holds: Dict[str, int] = {}
+
+
+class SpoolFile:
+    """Append-only temp file that keeps a running SHA-256 of what was written."""
+
+    def __init__(self, directory: str):
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix="doc-", suffix=".part")
+        self._fh = os.fdopen(fd, "wb")
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.sha256: Optional[str] = None
+        self.hash_seconds = 0.0
+
+    def write(self, data: bytes) -> None:
+        self._fh.write(data)
+        started = time.perf_counter()
+        self._hash.update(data)
+        self.hash_seconds += time.perf_counter() - started
+        self.size += len(data)
+
+    def close(self) -> None:
+        if not self._fh.closed:
+            self._fh.close()
+            self.sha256 = self._hash.hexdigest()
+
+    def discard(self) -> None:
+        self.close()
+        discard_spooled(self.path)
+
+
+def read_spooled(path: str) -> bytes:
+    return Path(path).read_bytes()
+
+
+def retain_spooled(path: str) -> None:
+    """Keep ``path`` alive past its owner's discard_spooled(); pair with discard_spooled()."""
+    _holds[path] = _holds.get(path, 1) + 1  # the owner counts as the first holder
+
+
+def discard_spooled(path: Optional[str]) -> None:
+    """Delete the spool file once every holder (owner + retain_spooled callers) let go."""
+    if not path:
+        return
+    if path in _holds:
+        _holds[path] -= 1
+        if _holds[path] > 0:
+            return
+        del _holds[path]
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,48 @@
+# file: wto/textextract.py
+"""
+PDF text extraction, run in TextExtractionPipeline's process pool.
+
+Kept free of Scrapy/Twisted imports so spawned workers start fast; the
+optional ``pypdf`` dependency is only needed when extraction is enabled.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+from typing import Optional, Tuple, Union
+
+try:
+    import pypdf
+except ImportError:  # optional dependency
+    pypdf = None
+
+EXTRACTOR = "pypdf"
+
+
+def is_pdf(content_type: Optional[str], url: Optional[str] = None) -> bool:
+    if content_type and "pdf" in content_type.lower():
+        return True
+    return bool(url) and url.lower().split("?", 1)[0].endswith(".pdf")
+
+
+def extract_pdf_text(source: Union[str, bytes], max_chars: int = 0) -> Tuple[str, int]:
+    """(text, page count) of a PDF given as a file path or bytes."""
+    logging.getLogger("pypdf").setLevel(logging.ERROR)  # malformed-PDF chatter
+    stream = open(source, "rb") if isinstance(source, str) else io.BytesIO(source)
+    with stream:
+        reader = pypdf.PdfReader(stream)
+        parts = []
+        size = 0
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            parts.append(text)
+            size += len(text)
+            if max_chars and size >= max_chars:
+                break
+        pages = len(reader.pages)
+    # Postgres text cannot hold NUL characters
+    text = "\n".join(parts).replace("\x00", "")
+    if max_chars:
+        text = text[:max_chars]
+    return text, pages
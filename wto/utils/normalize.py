@@ -0,0 +1,65 @@
+# wto/utils/normalize.py
+"""Normalisation of search-hit metadata (symbol, document date, document type)."""
+
+import html
+import re
+from datetime import date
+from typing import Optional
+
+_TAGS = re.compile(r"<[^>]+>")
+_SPACES = re.compile(r"\s+")
+_DMY = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b")
+_ISO = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_DAY_MONTH_YEAR = re.compile(r"\b(\d{1,2})\s+([A-Za-z]+)\.?\s+(\d{4})\b")
+_MONTHS = {
+    name: number
+    for number, names in enumerate(
+        (("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"),
+         ("may",), ("june", "jun"), ("july", "jul"), ("august", "aug"),
+         ("september", "sep", "sept"), ("october", "oct"), ("november", "nov"), ("december", "dec")),
+        start=1,
+    )
+    for name in names
+}
+# Revision suffixes and trailing serial number of a symbol: WT/L/1234/Rev.1 -> WT/L
+_REVISION = re.compile(r"(/(Rev|Add|Corr|Suppl)\.\d+)+$", re.IGNORECASE)
+_SERIAL = re.compile(r"(/\d+[A-Z]?)+$")
+# Dispute number inside a symbol: WT/DS58/AB/R -> WT/DS/AB/R
+_DISPUTE = re.compile(r"/DS\d+\b")
+
+
+def clean_symbol(value: Optional[str]) -> Optional[str]:
+    """Document symbol as plain text (accepts the raw hitSymbol HTML fragment)."""
+    if not value:
+        return None
+    text = _SPACES.sub(" ", html.unescape(_TAGS.sub(" ", value))).strip()
+    return text or None
+
+
+def parse_doc_date(value: Optional[str]) -> Optional[date]:
+    """First date in ``value``: dd/mm/yyyy (docs.wto.org), yyyy-mm-dd or "12 March 2021"."""
+    if not value:
+        return None
+    for pattern in (_DMY, _ISO, _DAY_MONTH_YEAR):
+        for match in pattern.finditer(value):
+            a, b, c = match.groups()
+            try:
+                if pattern is _DMY:
+                    return date(int(c), int(b), int(a))
+                if pattern is _ISO:
+                    return date(int(a), int(b), int(c))
+                month = _MONTHS.get(b.lower())
+                if month:
+                    return date(int(c), month, int(a))
+            except ValueError:  # 31/02/2020 and the like
+                continue
+    return None
+
+
+def doc_type(symbol: Optional[str]) -> Optional[str]:
+    """Document type as the symbol series, e.g. WT/L/1234 -> WT/L, WT/DS58/AB/R -> WT/DS/AB/R."""
+    if not symbol:
+        return None
+    series = _SERIAL.sub("", _REVISION.sub("", symbol.split()[0]))
+    series = _DISPUTE.sub("/DS", series)
+    return series or None